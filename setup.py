@@ -17,21 +17,32 @@ setup(
         "pandas>=2.2.3",
         "yfinance>=0.2.0",
         "numpy>=1.24.0",
+        "scipy>=1.10.0",
         "scikit-learn>=1.0.0",
         "statsmodels>=0.14.0",
         "matplotlib>=3.7.0",
         "tensorflow>=2.11.0",
         "streamlit>=1.24.0",
-        "plotly>=5.15.0"
+        "plotly>=6.0.0"
     ],
 
+    # Dependencias opcionales: almacenamiento columnar Parquet/Feather
+    extras_require={
+        "parquet": ["pyarrow>=14.0.0"]
+    },
+
     # Scripts de consola al instalar los paquetes
     entry_points={  
         "console_scripts": [
             "msft-collector=msft_analytics.collector:run",
             "msft-enricher=msft_analytics.enricher:run",
             "msft-modeller=msft_analytics.modeller:run",
-            "msft-predict=msft_analytics.predict_lstm:run"
+            "msft-predict=msft_analytics.predict_lstm:run",
+            "msft-synthetic=msft_analytics.sources:run",
+            "msft-export-weights=msft_analytics.numpy_lstm:run",
+            "msft-registry=msft_analytics.registry:run",
+            "msft-backtest=msft_analytics.backtest:run",
+            "msft-holidays=msft_analytics.trading_calendar:run"
         ],
     },
 
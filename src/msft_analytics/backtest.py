@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from msft_analytics.logger import get_logger
+from msft_analytics.registry import data_fingerprint
+from msft_analytics.storage import write_table
+
+# Logger del modelado
+default_logger = get_logger("msft_model")
+
+# Caché de pliegues ya evaluados: un JSON por huella de datos + configuración
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "static", "models", "backtest")
+# Orígenes (pliegues) y días de test de cada uno
+PLIEGUES = 5
+DIAS_TEST = 90
+# Hilos de TensorFlow por proceso
+HILOS_POR_WORKER = 1
+METRICAS = ["rmse", "mae", "mape", "r2"]
+
+def fold_plan(df, pliegues=PLIEGUES, dias_test=DIAS_TEST, paso=None, ventana=30,
+              max_dias_entrenamiento=None):
+    """
+    Orígenes del walk-forward sobre la serie diaria `df` (índice de fechas, columna
+    'cerrar'), del más antiguo al más reciente. Cada pliegue entrena con todo lo anterior a
+    su origen (o los últimos `max_dias_entrenamiento` días) y evalúa los `dias_test` días
+    siguientes; los orígenes se separan `paso` días (por defecto, `dias_test`) contando
+    desde el final de la serie.
+    Devolvemos una lista de (inicio, corte, fin): posiciones de la primera fila de
+    entrenamiento, del primer día de test y del final (exclusivo) del test.
+    """
+    paso = paso or dias_test
+    n = len(df)
+    plan = []
+    for k in range(pliegues):
+        fin = n - (pliegues - 1 - k) * paso
+        corte = fin - dias_test
+        inicio = 0 if max_dias_entrenamiento is None else max(0, corte - max_dias_entrenamiento)
+        # Margen mínimo para que haya muestras de entrenamiento y de validación
+        if corte - inicio < 3 * ventana:
+            raise ValueError(
+                f"Histórico insuficiente para {pliegues} pliegues de {dias_test} días "
+                f"cada {paso} días con ventana {ventana}"
+            )
+        plan.append((inicio, corte, fin))
+    return plan
+
+def fold_key(huella, corte, config):
+    """Clave de caché de un pliegue: huella de sus datos, origen y configuración."""
+    contenido = json.dumps({'huella': huella, 'corte': corte, 'config': config}, sort_keys=True)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:32]
+
+def walk_forward(df, pliegues=PLIEGUES, dias_test=DIAS_TEST, paso=None, ventana=30,
+                 horizonte=1, epocas=None, unidades=None, batch_size=None, entrada=None,
+                 max_dias_entrenamiento=None, workers=None, hilos=HILOS_POR_WORKER, semilla=0,
+                 ruta_cache=CACHE_DIR, logger=default_logger):
+    """
+    Evaluamos el LSTM con walk-forward: un modelo por origen, entrenado desde cero solo con
+    datos anteriores al origen (escalador incluido) y evaluado en los días siguientes.
+    Los pliegues se ejecutan en paralelo en un pool de procesos, cada uno con `hilos` hilos
+    de TensorFlow. Los pliegues ya evaluados con los mismos datos y configuración se leen
+    de `ruta_cache` (None desactiva la caché).
+    epocas, unidades, batch_size, entrada: los de msft-modeller si son None.
+    Devolvemos un DataFrame con las métricas de cada pliegue, del más antiguo al más
+    reciente.
+    """
+    # La configuración es la clave de caché: lleva todo lo que llega a ajustar(), con los
+    # valores por defecto de msft-modeller ya resueltos, para que cambiar cualquiera de
+    # ellos no reutilice pliegues evaluados con otros (importa TensorFlow)
+    from msft_analytics.modeller import BATCH_SIZE, ENTRADA, EPOCAS, FRACCION_VALIDACION, UNIDADES
+
+    config = {
+        'ventana': ventana, 'horizonte': horizonte, 'epocas': epocas or EPOCAS,
+        'unidades': unidades or UNIDADES, 'batch_size': batch_size or BATCH_SIZE,
+        'entrada': entrada or ENTRADA, 'fraccion_validacion': FRACCION_VALIDACION,
+        'semilla': semilla, 'dias_test': dias_test
+    }
+    serie = df['cerrar'].to_numpy(dtype=float)
+    resultados, pendientes = [], []
+    for numero, (inicio, corte, fin) in enumerate(fold_plan(
+        df, pliegues, dias_test, paso, ventana, max_dias_entrenamiento
+    )):
+        huella = data_fingerprint(df.iloc[inicio:fin])
+        clave = fold_key(huella, corte - inicio, config)
+        ruta = None if ruta_cache is None else os.path.join(ruta_cache, f"{clave}.json")
+        if ruta is not None and os.path.exists(ruta):
+            with open(ruta, encoding="utf-8") as f:
+                resultados.append({**json.load(f), 'pliegue': numero, 'cache': True})
+            continue
+        pendientes.append({
+            'pliegue': numero,
+            'serie': serie[inicio:fin],
+            'corte': corte - inicio,
+            'fechas': tuple(str(df.index[i].date()) for i in (inicio, corte, fin - 1)),
+            'ruta_cache': ruta,
+            **config
+        })
+
+    logger.info(
+        f"Walk-Forward: {pliegues} Pliegues, {len(resultados)} En Caché, {len(pendientes)} Por Evaluar"
+    )
+    if pendientes:
+        workers = min(workers or default_workers(hilos), len(pendientes))
+        if ruta_cache is not None:
+            os.makedirs(ruta_cache, exist_ok=True)
+        with process_pool(workers, hilos) as pool:
+            futuros = {pool.submit(_evaluar_pliegue, pliegue): pliegue['pliegue'] for pliegue in pendientes}
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                logger.info(
+                    f"Pliegue {futuros[futuro]} ({resultado['origen']}): "
+                    f"RMSE {resultado['rmse']:.4f} En {resultado['segundos']:.1f}s"
+                )
+                resultados.append({**resultado, 'pliegue': futuros[futuro], 'cache': False})
+
+    return pd.DataFrame(resultados).sort_values('pliegue').reset_index(drop=True)
+
+def summarize(resultados):
+    """Media, desviación, mínimo y máximo de cada métrica entre pliegues."""
+    return resultados[METRICAS].agg(['mean', 'std', 'min', 'max'])
+
+def default_workers(hilos=HILOS_POR_WORKER):
+    """Procesos para ocupar todos los núcleos con `hilos` hilos de TensorFlow cada uno."""
+    return max(1, (os.cpu_count() or 1) // hilos)
+
+def process_pool(workers, hilos=HILOS_POR_WORKER):
+    """
+    Pool de procesos para entrenar modelos en paralelo, con los hilos de TensorFlow de
+    cada proceso fijados a `hilos`. Usa spawn: TensorFlow no admite fork con su runtime
+    ya iniciado.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_iniciar_worker,
+        initargs=(hilos,)
+    )
+
+def _iniciar_worker(hilos):
+    """
+    Fijamos los hilos de TensorFlow del proceso antes de importarlo, para que varios
+    entrenamientos en paralelo no compitan por todos los núcleos.
+    """
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(hilos)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ["OMP_NUM_THREADS"] = str(hilos)
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(hilos)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+def _evaluar_pliegue(pliegue):
+    """
+    Entrenamos y evaluamos un pliegue en un proceso del pool. El resultado se guarda en la
+    caché en cuanto termina, así que una ejecución interrumpida conserva lo ya evaluado.
+    """
+    from sklearn.preprocessing import MinMaxScaler
+    from tensorflow.keras.utils import set_random_seed
+    from msft_analytics.modeller import Modeller
+
+    inicio_reloj = time.perf_counter()
+    set_random_seed(pliegue['semilla'])
+    modeller = Modeller()
+    ventana, horizonte, corte = pliegue['ventana'], pliegue['horizonte'], pliegue['corte']
+    serie = pliegue['serie'].reshape(-1, 1)
+
+    # El escalador solo ve el entrenamiento: nada del test se filtra al modelo
+    scaler = MinMaxScaler().fit(serie[:corte])
+    escalada = scaler.transform(serie)
+    X_test, y_test = modeller.crear_secuencias(escalada[corte - ventana:], ventana, horizonte)
+
+    model = modeller.ajustar(
+        escalada[:corte], ventana, horizonte, pliegue['epocas'], pliegue['unidades'],
+        pliegue['batch_size'], entrada=pliegue['entrada']
+    )
+    metricas = modeller.evaluar(model, scaler, X_test, y_test)
+
+    desde, origen, hasta = pliegue['fechas']
+    resultado = {
+        'desde': desde,
+        'origen': origen,
+        'hasta': hasta,
+        'muestras_entrenamiento': corte - ventana - horizonte + 1,
+        'muestras_test': int(len(X_test)),
+        **{nombre: float(metricas[nombre]) for nombre in METRICAS},
+        'segundos': time.perf_counter() - inicio_reloj
+    }
+    if pliegue['ruta_cache'] is not None:
+        temporal = f"{pliegue['ruta_cache']}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2)
+        os.replace(temporal, pliegue['ruta_cache'])
+    return resultado
+
+def run():
+    from msft_analytics.predict_lstm import CSV_PATH, cargar_datos
+    from msft_analytics.trading_calendar import CALENDARIO, CALENDARIOS
+
+    parser = argparse.ArgumentParser(
+        description="Evaluación walk-forward del LSTM sobre varios orígenes, en paralelo"
+    )
+    parser.add_argument("--pliegues", type=int, default=PLIEGUES, help=f"Orígenes a evaluar (default: {PLIEGUES})")
+    parser.add_argument("--dias-test", type=int, default=DIAS_TEST, help=f"Días de test por pliegue (default: {DIAS_TEST})")
+    parser.add_argument("--paso", type=int, help="Días entre orígenes (default: --dias-test)")
+    parser.add_argument("--ventana", type=int, default=30, help="Ventana del LSTM (default: 30)")
+    parser.add_argument("--horizonte", type=int, default=1, help="Salidas del modelo (default: 1)")
+    parser.add_argument("--epocas", type=int, help="Épocas máximas por pliegue (default: las de msft-modeller)")
+    parser.add_argument("--unidades", type=int, help="Unidades LSTM (default: las de msft-modeller)")
+    parser.add_argument("--batch-size", type=int, help="Tamaño de lote (default: el de msft-modeller)")
+    parser.add_argument(
+        "--entrada", choices=["tf.data", "sequence"], help="Entrada del entrenamiento (default: la de msft-modeller)"
+    )
+    parser.add_argument(
+        "--max-dias-entrenamiento", type=int,
+        help="Entrena cada pliegue solo con los últimos N días (default: todo el pasado)"
+    )
+    parser.add_argument("--workers", type=int, help="Procesos en paralelo (default: núcleos / --hilos)")
+    parser.add_argument(
+        "--hilos", type=int, default=HILOS_POR_WORKER,
+        help=f"Hilos de TensorFlow por proceso (default: {HILOS_POR_WORKER})"
+    )
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de cada pliegue (default: 0)")
+    parser.add_argument(
+        "--calendario", choices=CALENDARIOS, default=CALENDARIO,
+        help=f"Serie en sesiones de bolsa (habiles) o en días naturales interpolados (diario) (default: {CALENDARIO})"
+    )
+    parser.add_argument("--sin-cache", action="store_true", help="Evalúa todos los pliegues sin usar la caché")
+    parser.add_argument("--out", help="Guarda las métricas por pliegue (CSV, Parquet o Feather)")
+    args = parser.parse_args()
+
+    df = cargar_datos(CSV_PATH, args.calendario)
+    resultados = walk_forward(
+        df, pliegues=args.pliegues, dias_test=args.dias_test, paso=args.paso,
+        ventana=args.ventana, horizonte=args.horizonte, epocas=args.epocas, unidades=args.unidades,
+        batch_size=args.batch_size, entrada=args.entrada, max_dias_entrenamiento=args.max_dias_entrenamiento, workers=args.workers,
+        hilos=args.hilos, semilla=args.semilla, ruta_cache=None if args.sin_cache else CACHE_DIR
+    )
+
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print("\n📊 Walk-Forward Por Pliegue:")
+        print(resultados.drop(columns="segundos").round(4).to_string(index=False))
+        print("\n📈 Resumen Entre Pliegues:")
+        print(summarize(resultados).round(4))
+    if args.out:
+        write_table(resultados, args.out)
+        print(f"\n✅ Métricas Guardadas En {args.out}")
+
+if __name__ == "__main__":
+    run()
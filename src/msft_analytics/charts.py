@@ -0,0 +1,137 @@
+import argparse
+import json
+import time
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Por encima de estos puntos por serie el modo automático dibuja con WebGL
+UMBRAL_WEBGL = 1000
+# Puntos máximos por serie en modo WebGL (el histórico diario completo cabe de sobra)
+PUNTOS_MAXIMOS_WEBGL = 500_000
+MODOS = ("auto", "webgl", "svg")
+
+def use_webgl(puntos, modo="auto"):
+    """Dibujamos con WebGL si se pide o si, en modo automático, hay más de UMBRAL_WEBGL puntos."""
+    if modo not in MODOS:
+        raise ValueError(f"Modo de gráfico desconocido: {modo}")
+    return modo == "webgl" or (modo == "auto" and puntos > UMBRAL_WEBGL)
+
+def compact_x(index):
+    """
+    Fechas como milisegundos desde 1970 (float64): Plotly las envía como array tipado en
+    lugar de una cadena ISO por punto y el eje con type="date" las muestra como fechas.
+    """
+    return pd.DatetimeIndex(index).as_unit("ms").asi8.astype(np.float64)
+
+def compact_y(valores):
+    """Valores en float32: la mitad de bytes que float64, de sobra para precios e indicadores."""
+    return np.asarray(valores, dtype=np.float32)
+
+def scatter(x, y, webgl=False, **kwargs):
+    """
+    Serie de líneas o marcadores: go.Scatter (SVG) o, con `webgl`, go.Scattergl con
+    arrays tipados compactos. Usar con date_axes() en la figura.
+    """
+    if not webgl:
+        return go.Scatter(x=x, y=y, **kwargs)
+    return go.Scattergl(x=compact_x(x), y=compact_y(y), **kwargs)
+
+def bars(x, y, webgl=False, marker_color=None, opacity=None, **kwargs):
+    """
+    Barras: go.Bar (SVG) o, con `webgl`, un área escalonada go.Scattergl hasta cero, ya que
+    WebGL no tiene barras.
+    """
+    if not webgl:
+        return go.Bar(x=x, y=y, marker_color=marker_color, opacity=opacity, **kwargs)
+    return go.Scattergl(
+        x=compact_x(x), y=compact_y(y), mode="lines", fill="tozeroy",
+        line=dict(color=marker_color, width=1, shape="hv"), opacity=opacity, **kwargs
+    )
+
+def date_axes(fig, webgl=False):
+    """Con `webgl` las fechas van en milisegundos: forzamos ejes de tipo fecha."""
+    if webgl:
+        fig.update_xaxes(type="date")
+    return fig
+
+def payload_stats(fig):
+    """
+    Tamaño (bytes) del JSON que se envía al navegador y tiempo (ms) en serializarlo.
+    """
+    inicio = time.perf_counter()
+    contenido = fig.to_json()
+    return len(contenido.encode("utf-8")), (time.perf_counter() - inicio) * 1000
+
+def render_benchmark_html(figuras):
+    """
+    Página HTML autónoma (plotly.js incluido) que mide en el navegador el tiempo de
+    Plotly.newPlot de cada figura de `figuras` ({nombre: figura}) y lo muestra en una tabla
+    junto al tamaño de su JSON.
+    """
+    from plotly.offline import get_plotlyjs
+
+    datos = {nombre: fig.to_json() for nombre, fig in figuras.items()}
+    divs = "\n".join(f'<div id="fig-{i}" style="height:420px"></div>' for i in range(len(datos)))
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Rendimiento De Gráficos</title>
+<script>{get_plotlyjs()}</script></head>
+<body style="font-family:sans-serif">
+<h2>Rendimiento De Gráficos</h2>
+<table border="1" cellpadding="6" id="resultados">
+<tr><th>Figura</th><th>JSON (KB)</th><th>Plotly.newPlot (ms)</th></tr></table>
+{divs}
+<script>
+const figuras = {json.dumps(datos)};
+(async () => {{
+  const tabla = document.getElementById("resultados");
+  let i = 0;
+  for (const [nombre, contenido] of Object.entries(figuras)) {{
+    const fig = JSON.parse(contenido);
+    const inicio = performance.now();
+    await Plotly.newPlot("fig-" + i, fig.data, fig.layout);
+    // Esperamos al siguiente cuadro para incluir el pintado
+    await new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)));
+    const ms = performance.now() - inicio;
+    tabla.insertAdjacentHTML("beforeend",
+      `<tr><td>${{nombre}}</td><td>${{(contenido.length / 1024).toFixed(1)}}</td><td>${{ms.toFixed(1)}}</td></tr>`);
+    i++;
+  }}
+}})();
+</script></body></html>"""
+
+def run():
+    """
+    Comparamos SVG y WebGL con una serie sintética de precio y volumen: tamaño del JSON y
+    tiempo de serialización en Python, y una página HTML que mide el render en el
+    navegador.
+    """
+    from msft_analytics.sources import generate_ohlcv
+
+    parser = argparse.ArgumentParser(description="Benchmark de los gráficos SVG frente a WebGL")
+    parser.add_argument("--rows", type=int, default=100_000, help="Puntos por serie (default: 100000)")
+    parser.add_argument("--out", default="chart_benchmark.html", help="Página HTML con el render en el navegador")
+    args = parser.parse_args()
+
+    df = generate_ohlcv(args.rows, freq="1min", seed=0)
+    df = df.set_index(pd.to_datetime(df["Fecha"]))
+
+    figuras = {}
+    for nombre, webgl in (("SVG", False), ("WebGL", True)):
+        fig = go.Figure()
+        fig.add_trace(scatter(df.index, df["cerrar"], webgl, mode="lines", name="Cierre"))
+        fig.add_trace(bars(df.index, df["volumen"], webgl, marker_color="#0078d4", name="Volumen", yaxis="y2"))
+        fig.update_layout(
+            title=f"{nombre}: {args.rows:,} Puntos Por Serie",
+            yaxis2=dict(overlaying="y", side="right", showgrid=False)
+        )
+        figuras[nombre] = date_axes(fig, webgl)
+        tamano, ms = payload_stats(fig)
+        print(f"{nombre:>6}: JSON {tamano / 1024:,.0f} KB, Serializado En {ms:,.0f} ms")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(render_benchmark_html(figuras))
+    print(f"✅ Abre {args.out} En El Navegador Para Ver El Tiempo De Render")
+
+if __name__ == "__main__":
+    run()
@@ -1,10 +1,14 @@
 import os
+import time
+import random
 import sqlite3
 import argparse
 import pandas as pd
-import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from msft_analytics.logger import get_logger # Importamos nuestro logger personalizado
+from msft_analytics.sources import YahooSource, make_source
+from msft_analytics.storage import default_path, read_table, write_table, storage_format
 
 logger = get_logger() # Inicializamos el logger
 
@@ -12,99 +16,257 @@ logger = get_logger() # Inicializamos el logger
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 # Directorio data dentro de static
 DEFAULT_DATA_DIR = os.path.join(BASE_DIR, "static", "data")
+# Primera fecha disponible de MSFT en Yahoo Finanzas
+FECHA_INICIO = "1986-03-13"
+# Días que volvemos a pedir antes de la última fecha guardada para corregir revisiones tardías
+DIAS_SOLAPAMIENTO = 5
+# Columnas de la tabla SQLite, con clave primaria (simbolo, fecha)
+COLUMNAS_DB = ["simbolo", "fecha", "año", "mes", "día", "abrir", "max", "min", "cerrar", "volumen"]
+# Columnas exportadas al CSV
+COLUMNAS_CSV = ["año", "mes", "día", "abrir", "max", "min", "cerrar", "volumen"]
+# Descargas concurrentes y reintentos por símbolo
+MAX_WORKERS = 8
+REINTENTOS = 3
+# Espera base (segundos) del backoff exponencial entre reintentos
+BACKOFF_SEG = 1.0
 
 class MSFTCollector:
-    def __init__(self, db_path, csv_path):
+    def __init__(
+        self,
+        db_path,
+        csv_path,
+        incremental=True,
+        symbols=None,
+        source=None,
+        max_workers=MAX_WORKERS,
+        retries=REINTENTOS
+    ):
         """
         Inicializamos la clase con la ruta de la base de datos y el archivo CSV.
+        incremental: si es True solo se descarga el rango posterior a la última fecha guardada
+        (más unos días de solapamiento); si es False se descarga el histórico completo.
+        symbols: lista de tickers a recolectar (por defecto solo MSFT). Todos se guardan en la
+        misma tabla; el CSV exporta el primero de la lista.
+        source: fuente de datos (DataSource); por defecto Yahoo Finanzas.
+        max_workers / retries: tamaño del pool de descarga y reintentos por símbolo.
         """
         self.db_path = db_path
         self.csv_path = csv_path
         self.table_name = "msft_data"
+        self.symbols = [s.strip().upper() for s in symbols] if symbols else ["MSFT"]
+        self.symbol = self.symbols[0]
+        self.source = source or YahooSource()
+        self.max_workers = max(1, max_workers)
+        self.retries = max(0, retries)
+        self.incremental = incremental
 
         # Aseguramos la existencia de los directorios
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         os.makedirs(os.path.dirname(self.csv_path), exist_ok=True)
 
-    def fetch_data(self):
+    def fetch_data(self, start=None, symbol=None):
         """
-        Descargamos los datos históricos desde Yahoo Finanzas,
-        solicitando hasta mañana para garantizar el cierre de hoy.
+        Descargamos los datos históricos de `symbol` (por defecto el principal) a partir
+        de `start` (por defecto desde el inicio del histórico), solicitando hasta mañana
+        para garantizar el cierre de hoy.
         """
-        logger.info("Descargando Datos Desde Yahoo Finanzas...")
+        symbol = symbol or self.symbol
+        start = start or FECHA_INICIO
+        logger.info(f"Descargando {symbol} Desde {self.source.name} (Desde {start})...")
         tomorrow = (datetime.today() + timedelta(days=1)).strftime("%Y-%m-%d")
 
-        df = yf.download(
-            "MSFT",
-            start="1986-03-13",
-            end=tomorrow,
-            auto_adjust=False,
-            progress=False
-        )
+        df = self.source.download(symbol, start, tomorrow)
+
+        if df.empty:
+            logger.info(f"{symbol}: La Fuente No Devolvió Registros Para El Rango Solicitado.")
+            return pd.DataFrame(columns=COLUMNAS_CSV)
 
-        df = df.reset_index().rename(columns={
-            "Date": "Fecha", "Open": "Abrir", "High": "Máx.",
-            "Low": "Mín.", "Close": "Cerrar", "Volume": "Volumen"
-        })[["Fecha", "Abrir", "Máx.", "Mín.", "Cerrar", "Volumen"]]
-        
-        df["Fecha"] = pd.to_datetime(df["Fecha"]).dt.date
+        df = df.copy()
+        df["Fecha"] = pd.to_datetime(df["Fecha"])
 
         # Agregamos columnas año, mes, día
-        df["año"] = df["Fecha"].apply(lambda x: x.year)
-        df["mes"] = df["Fecha"].apply(lambda x: x.month)
-        df["día"] = df["Fecha"].apply(lambda x: x.day)
+        df["año"] = df["Fecha"].dt.year
+        df["mes"] = df["Fecha"].dt.month
+        df["día"] = df["Fecha"].dt.day
 
-        # Reorganizamos las columnas y renombramos a minúsculas
-        df = df[["año", "mes", "día", "Abrir", "Máx.", "Mín.", "Cerrar", "Volumen"]]
-        df.columns = ["año", "mes", "día", "abrir", "max", "min", "cerrar", "volumen"]
+        return df[COLUMNAS_CSV].reset_index(drop=True)
 
-        return df
+    def fetch_with_retries(self, symbol, start=None):
+        """
+        Descargamos un símbolo reintentando con espera exponencial (más un pequeño
+        desfase aleatorio) ante errores de red o límites de peticiones.
+        """
+        for intento in range(self.retries + 1):
+            try:
+                return self.fetch_data(start, symbol)
+            except Exception as e:
+                if intento == self.retries:
+                    raise
+                espera = BACKOFF_SEG * (2 ** intento) + random.uniform(0, BACKOFF_SEG)
+                logger.warning(
+                    f"{symbol}: Error Descargando ({e}). Reintento {intento + 1}/{self.retries} "
+                    f"En {espera:.1f}s."
+                )
+                time.sleep(espera)
 
-    def save_to_db(self, df):
+    def fetch_all(self, starts):
         """
-        Guardamos datos en SQLite, insertando solo nuevos registros.
+        Descargamos todos los símbolos en paralelo con un pool acotado de hilos.
+        starts: diccionario símbolo -> fecha de inicio (None = histórico completo).
+        Devolvemos un generador de (símbolo, DataFrame | excepción) según van terminando,
+        para que cada resultado se guarde sin esperar al resto.
         """
-        logger.info("Guardando Datos En SQLite...")
-        conn = sqlite3.connect(self.db_path)
+        workers = min(self.max_workers, len(self.symbols))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="collector") as pool:
+            futuros = {
+                pool.submit(self.fetch_with_retries, simbolo, starts.get(simbolo)): simbolo
+                for simbolo in self.symbols
+            }
+            for futuro in as_completed(futuros):
+                simbolo = futuros[futuro]
+                try:
+                    yield simbolo, futuro.result()
+                except Exception as e:
+                    yield simbolo, e
 
+    def ensure_schema(self, conn):
+        """
+        Creamos la tabla con clave primaria (simbolo, fecha) si no existe y migramos
+        en el mismo archivo las tablas antiguas sin clave (solo año, mes, día).
+        """
         if self.table_exists(conn):
-            df_existing = pd.read_sql(f"SELECT * FROM {self.table_name}", conn)
-            # Validamos la existencia de columna año, mes y día
-            if all(col in df_existing.columns for col in ["año", "mes", "día"]):
-                # Renombramos temporalmente para usar pd.to_datetime por mapping
-                cols_exist = df_existing[["año", "mes", "día"]].rename(
-                    columns={"año": "year", "mes": "month", "día": "day"}
-                )
-                df_existing["Fecha"] = pd.to_datetime(cols_exist)
+            columnas = [fila[1] for fila in conn.execute(f"PRAGMA table_info({self.table_name})")]
+            if "fecha" not in columnas:
+                self.migrate_legacy_table(conn)
+            return
 
-                cols_new = df[["año", "mes", "día"]].rename(
-                    columns={"año": "year", "mes": "month", "día": "day"}
-                )
-                df["Fecha"] = pd.to_datetime(cols_new)
-            else:
-                logger.warning("Columnas de Fecha No Existen En La Tabla. Realizando Carga Completa.")
-                df_existing = pd.DataFrame()
-        else:
-            df_existing = pd.DataFrame()
+        conn.execute(self._create_table_sql(self.table_name))
+        conn.commit()
 
-        if df_existing.empty:
-            df.to_sql(self.table_name, conn, if_exists="replace", index=False)
-            logger.info(f"Tabla {self.table_name} Creada Con {len(df)} Registros.")
-        else:
-            nuevos = df[~df["Fecha"].isin(df_existing["Fecha"])].copy()
-            if not nuevos.empty:
-                df_combined = pd.concat(
-                    [df_existing.drop(columns="Fecha"), nuevos.drop(columns="Fecha")],
-                    ignore_index=True
-                )
-                df_combined = df_combined.sort_values(["año", "mes", "día"])
-                df_combined.to_sql(self.table_name, conn, if_exists="replace", index=False)
-                logger.info(f"Insertados {len(nuevos)} Nuevos Registros. Total: {len(df_combined)}.")
-            else:
-                logger.info("No Hay Datos Nuevos Para Insertar.")
+    def migrate_legacy_table(self, conn):
+        """
+        Convertimos la tabla antigua al esquema con clave primaria dentro de una única
+        transacción: si el proceso se interrumpe, la tabla original queda intacta.
+        """
+        logger.info(f"Migrando Tabla {self.table_name} Al Esquema Con Clave Primaria...")
+        tabla_nueva = f"{self.table_name}_migracion"
+        try:
+            conn.execute("BEGIN")
+            conn.execute(f"DROP TABLE IF EXISTS {tabla_nueva}")
+            conn.execute(self._create_table_sql(tabla_nueva))
+            conn.execute(
+                f"INSERT OR REPLACE INTO {tabla_nueva} "
+                f"({', '.join(COLUMNAS_DB)}) "
+                f"SELECT ?, printf('%04d-%02d-%02d', año, mes, día), "
+                f"año, mes, día, abrir, max, min, cerrar, volumen FROM {self.table_name}",
+                (self.symbol,)
+            )
+            conn.execute(f"DROP TABLE {self.table_name}")
+            conn.execute(f"ALTER TABLE {tabla_nueva} RENAME TO {self.table_name}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
-        conn.close()
-        logger.info(f"Base De Datos SQLite Generada En: {os.path.abspath(self.db_path)}")
+        total = conn.execute(f"SELECT COUNT(*) FROM {self.table_name}").fetchone()[0]
+        logger.info(f"Migración Completada: {total} Registros.")
+
+    def _create_table_sql(self, nombre):
+        return (
+            f"CREATE TABLE IF NOT EXISTS {nombre} ("
+            "simbolo TEXT NOT NULL, "
+            "fecha TEXT NOT NULL, "
+            "año INTEGER NOT NULL, "
+            "mes INTEGER NOT NULL, "
+            "día INTEGER NOT NULL, "
+            "abrir REAL, "
+            "max REAL, "
+            "min REAL, "
+            "cerrar REAL, "
+            "volumen INTEGER, "
+            "PRIMARY KEY (simbolo, fecha)"
+            ") WITHOUT ROWID"
+        )
+
+    def last_stored_dates(self):
+        """
+        Devolvemos un diccionario símbolo -> última fecha guardada (solo símbolos con histórico).
+        Si el símbolo principal no tiene histórico pero existe el CSV (p. ej. en el workflow,
+        que solo versiona el CSV), sembramos la tabla desde el CSV para no descargar todo de nuevo.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.ensure_schema(conn)
+            ultimas = dict(conn.execute(
+                f"SELECT simbolo, MAX(fecha) FROM {self.table_name} GROUP BY simbolo"
+            ).fetchall())
+
+            if self.symbol not in ultimas and os.path.exists(self.csv_path):
+                df_csv = read_table(self.csv_path)
+                if not df_csv.empty:
+                    self._upsert(conn, df_csv, self.symbol)
+                    logger.info(f"Tabla {self.table_name} Sembrada Desde CSV Con {len(df_csv)} Registros.")
+                    ultimas[self.symbol] = conn.execute(
+                        f"SELECT MAX(fecha) FROM {self.table_name} WHERE simbolo = ?",
+                        (self.symbol,)
+                    ).fetchone()[0]
+        finally:
+            conn.close()
+
+        return {
+            simbolo: datetime.strptime(fecha, "%Y-%m-%d").date()
+            for simbolo, fecha in ultimas.items()
+        }
+
+    def save_to_db(self, df, symbol=None):
+        """
+        Guardamos datos de `symbol` en SQLite con un upsert por (simbolo, fecha): los registros
+        nuevos se insertan y los ya existentes (revisiones del solapamiento) se actualizan.
+        El coste es proporcional a las filas recibidas, no al tamaño de la tabla.
+        """
+        symbol = symbol or self.symbol
+        logger.info(f"Guardando Datos De {symbol} En SQLite...")
+        if df.empty:
+            logger.info(f"{symbol}: No Hay Datos Nuevos Para Insertar.")
+            return
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.ensure_schema(conn)
+            nuevos = self._upsert(conn, df, symbol)
+        finally:
+            conn.close()
+
+        logger.info(
+            f"{symbol}: Insertados {nuevos} Nuevos Registros Y Actualizados {len(df) - nuevos}."
+        )
+
+    def _upsert(self, conn, df, symbol):
+        """
+        Insertamos o actualizamos en bloque las filas de `df` en una única transacción.
+        Devolvemos cuántas fechas eran nuevas: las filas del símbolo después menos antes
+        (el conteo usa el índice de la clave primaria).
+        """
+        fechas = pd.to_datetime(
+            df[["año", "mes", "día"]].rename(columns={"año": "year", "mes": "month", "día": "day"})
+        ).dt.strftime("%Y-%m-%d")
+        registros = zip(
+            [symbol] * len(df),
+            fechas.tolist(),
+            *(df[col].tolist() for col in COLUMNAS_DB[2:])
+        )
+        actualizaciones = ", ".join(f"{col} = excluded.{col}" for col in COLUMNAS_DB[2:])
+        contar = f"SELECT COUNT(*) FROM {self.table_name} WHERE simbolo = ?"
+        with conn:
+            antes = conn.execute(contar, (symbol,)).fetchone()[0]
+            conn.executemany(
+                f"INSERT INTO {self.table_name} ({', '.join(COLUMNAS_DB)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNAS_DB))}) "
+                f"ON CONFLICT (simbolo, fecha) DO UPDATE SET {actualizaciones}",
+                registros
+            )
+            despues = conn.execute(contar, (symbol,)).fetchone()[0]
+        return despues - antes
 
     def table_exists(self, conn):
         cursor = conn.cursor()
@@ -115,30 +277,72 @@ class MSFTCollector:
 
     def save_to_csv(self, df):
         """
-        Guardamos los datos en CSV.
+        Guardamos los datos en CSV (o en Parquet/Feather si la ruta tiene esa extensión),
+        con los precios redondeados a 2 decimales.
         """
-        logger.info("Guardando Datos En CSV...")
-        df.to_csv(self.csv_path, index=False, encoding="utf-8-sig", float_format="%.2f")
-        logger.info(f"Archivo CSV Generado En: {os.path.abspath(self.csv_path)}")
+        formato = storage_format(self.csv_path).upper()
+        logger.info(f"Guardando Datos En {formato}...")
+        write_table(df, self.csv_path, decimals=2)
+        logger.info(f"Archivo {formato} Generado En: {os.path.abspath(self.csv_path)}")
 
     def run(self):
         """
-        Flujo completo: descarga, guarda en DB y CSV.
+        Flujo completo: descarga concurrente de todos los símbolos, guarda en DB y
+        exporta el símbolo principal a CSV.
+        En modo incremental solo se piden los días posteriores a la última fecha guardada.
         """
-        df = self.fetch_data()
-        self.save_to_db(df)
+        starts = {}
+        if self.incremental:
+            ultimas = self.last_stored_dates()
+            for simbolo in self.symbols:
+                ultima = ultimas.get(simbolo)
+                if ultima is not None:
+                    starts[simbolo] = (ultima - timedelta(days=DIAS_SOLAPAMIENTO)).strftime("%Y-%m-%d")
+            logger.info(
+                f"Modo Incremental: {len(starts)} De {len(self.symbols)} Símbolos Con Histórico Previo."
+            )
+        else:
+            logger.info("Modo Completo: Descargando Todo El Histórico.")
+
+        fallidos = []
+        for simbolo, resultado in self.fetch_all(starts):
+            if isinstance(resultado, Exception):
+                logger.error(f"{simbolo}: Descarga Fallida Tras {self.retries} Reintentos -> {resultado}")
+                fallidos.append(simbolo)
+                continue
+            self.save_to_db(resultado, simbolo)
+        logger.info(f"Base De Datos SQLite Generada En: {os.path.abspath(self.db_path)}")
 
-        # Leemos histórico completo para exportar a CSV
+        # Leemos histórico completo del símbolo principal para exportar a CSV
         conn = sqlite3.connect(self.db_path)
-        df_all = pd.read_sql(f"SELECT * FROM {self.table_name}", conn)
+        df_all = pd.read_sql(
+            f"SELECT {', '.join(COLUMNAS_CSV)} FROM {self.table_name} "
+            "WHERE simbolo = ? ORDER BY fecha",
+            conn,
+            params=(self.symbol,)
+        )
         conn.close()
 
-        self.save_to_csv(df_all)
+        if df_all.empty:
+            logger.warning(f"{self.symbol}: Sin Registros En La Base, No Se Sobrescribe El CSV.")
+        else:
+            self.save_to_csv(df_all)
+
+        if fallidos:
+            logger.warning(f"Símbolos Sin Actualizar ({len(fallidos)}): {', '.join(sorted(fallidos))}")
         logger.info("Proceso Completado Con Éxito.")
 
+def read_symbols_file(path):
+    """
+    Leemos una lista de símbolos (uno por línea; se ignoran líneas vacías y comentarios #).
+    """
+    with open(path, encoding="utf-8") as f:
+        lineas = (linea.split("#", 1)[0].strip() for linea in f)
+        return [linea for linea in lineas if linea]
+
 def run():
     parser = argparse.ArgumentParser(
-        description="Descarga MSFT y guarda en static/data"
+        description="Descarga MSFT (u otros símbolos) y guarda en static/data"
     )
     parser.add_argument(
         "--db",
@@ -147,12 +351,69 @@ def run():
     )
     parser.add_argument(
         "--csv",
-        default=os.getenv("MSFT_CSV_PATH", os.path.join(DEFAULT_DATA_DIR, "historical.csv")),
-        help="Ruta al CSV (default: static/data/historical.csv)"
+        default=os.getenv("MSFT_CSV_PATH", default_path("historical")),
+        help="Ruta al CSV, o .parquet/.feather para formato columnar (default: static/data/historical.csv)"
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Descarga todo el histórico en lugar de solo los días nuevos"
+    )
+    parser.add_argument(
+        "--symbols",
+        nargs="+",
+        default=[s for s in os.getenv("MSFT_SYMBOLS", "MSFT").split(",") if s.strip()],
+        help="Símbolos a recolectar; el primero se exporta al CSV (default: MSFT)"
+    )
+    parser.add_argument(
+        "--symbols-file",
+        help="Archivo con un símbolo por línea que se añade a --symbols"
+    )
+    parser.add_argument(
+        "--source",
+        choices=["yahoo", "replay", "synthetic"],
+        default=os.getenv("MSFT_SOURCE", "yahoo"),
+        help="Fuente de datos: yahoo, replay (CSV/SQLite local) o synthetic (default: yahoo)"
+    )
+    parser.add_argument(
+        "--replay-path",
+        help="CSV o SQLite local que reproduce la fuente replay"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Semilla de la fuente synthetic (default: 0)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MAX_WORKERS,
+        help=f"Descargas concurrentes (default: {MAX_WORKERS})"
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=REINTENTOS,
+        help=f"Reintentos por símbolo con backoff exponencial (default: {REINTENTOS})"
     )
     args = parser.parse_args()
 
-    collector = MSFTCollector(db_path=args.db, csv_path=args.csv)
+    symbols = list(args.symbols)
+    if args.symbols_file:
+        symbols += read_symbols_file(args.symbols_file)
+    # Quitamos duplicados conservando el orden (el primero es el principal)
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols))
+
+    collector = MSFTCollector(
+        db_path=args.db,
+        csv_path=args.csv,
+        incremental=not args.full_refresh,
+        symbols=symbols,
+        source=make_source(args.source, path=args.replay_path, seed=args.seed),
+        max_workers=args.workers,
+        retries=args.retries
+    )
     collector.run()
 
 if __name__ == "__main__":
@@ -1,14 +1,33 @@
 import os
+import sys
+import hashlib
 import pandas as pd
 import numpy as np
 import streamlit as st
+import streamlit.components.v1 as components
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from datetime import datetime, timedelta
+from datetime import datetime
 import pickle
 from sklearn.preprocessing import MinMaxScaler
 
+# Con `streamlit run src/msft_analytics/dashboard.py` sin `pip install -e .` el paquete no
+# está en el path: añadimos src (una sola vez, aquí, en el punto de entrada)
+DIRECTORIO_SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIRECTORIO_SRC not in sys.path:
+    sys.path.insert(0, DIRECTORIO_SRC)
+
+from msft_analytics.storage import default_path, read_table
+from msft_analytics.indicators import COLUMNAS_TECNICAS, technical_indicators
+from msft_analytics.registry import ARCHIVO_PESOS, ModelRegistry
+from msft_analytics.predict_lstm import RUTA_HISTORICO, cargar_datos, predecir_lstm
+from msft_analytics.downsampling import PUNTOS_MAXIMOS, DownsamplePyramid
+from msft_analytics.range_index import RangeStatsIndex
+from msft_analytics.charts import (
+    PUNTOS_MAXIMOS_WEBGL, bars, date_axes, payload_stats, render_benchmark_html, scatter, use_webgl
+)
+
 st.set_page_config(
     page_title="Microsoft Analytics Dashboard - MSFT Insight 360",
     page_icon="🔷",
@@ -206,111 +225,153 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Ruta al CSV enriquecido
-CSV_PATH = os.path.join(os.path.dirname(__file__), "static", "data", "historical_enriched.csv")
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "static", "models", "model.pkl")
+# Ruta al CSV enriquecido (o Parquet/Feather según MSFT_DATA_FORMAT)
+CSV_PATH = os.getenv("MSFT_ENRICHED_CSV", default_path("historical_enriched"))
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "static", "models", "registry")
+# Días que pronostica el dashboard
+PASOS_PREDICCION = 7
+# Modos de dibujo de los gráficos: WebGL por encima de UMBRAL_WEBGL puntos, siempre o nunca
+MODOS_GRAFICOS = {"auto": "Automático", "webgl": "WebGL (alta densidad)", "svg": "SVG"}
 
-@st.cache_data(ttl=300)
-def load_data(path):
-    """Carga y prepara los datos enriquecidos"""
+@st.cache_data(max_entries=16, show_spinner=False)
+def file_hash(path, tamano, modificado):
+    """
+    SHA-256 del contenido del archivo, leído por bloques. `tamano` y `modificado` solo
+    forman la clave: el archivo se vuelve a leer únicamente cuando cambia su stat.
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+def data_version(path):
+    """
+    Versión de los datos: ruta y SHA-256 del contenido. En cada recarga solo se hace un
+    stat; el hash se recalcula si cambian el tamaño o la fecha de modificación, y una
+    reescritura con el mismo contenido conserva la versión (y las cachés).
+    """
+    estado = os.stat(path)
+    return path, file_hash(path, estado.st_size, estado.st_mtime_ns)
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def load_data(path, version_datos):
+    """
+    Carga y prepara los datos enriquecidos. La caché se indexa por la versión de los
+    datos (data_version): se recarga exactamente cuando cambia el archivo.
+    """
     with st.spinner('🔄 Cargando datos de Microsoft...'):
-        df = pd.read_csv(path)
+        df = read_table(path)
         if "Fecha" in df.columns:
             df.rename(columns={"Fecha": "fecha"}, inplace=True)
         df['fecha'] = pd.to_datetime(df['fecha'])
         df.set_index('fecha', inplace=True)
         df = df.sort_index()
         
-        # Calculamos indicadores técnicos
-        df = calculate_technical_indicators(df)
+        # Los indicadores técnicos vienen precalculados por el enriquecimiento; solo los
+        # calculamos si el archivo es de una versión anterior que no los tiene
+        if not set(COLUMNAS_TECNICAS).issubset(df.columns):
+            df = calculate_technical_indicators(df, version_datos)
+        
+        # Rellenamos NaN con valores por defecto
+        df.ffill(inplace=True)
+        df.fillna(0, inplace=True)
         
     return df
 
-@st.cache_data(ttl=600)
-def calculate_technical_indicators(df):
-    """Calcula indicadores técnicos avanzados"""
-    df = df.copy()
-    
-    # RSI (Relative Strength Index) 
-    delta = df['cerrar'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14, min_periods=1).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean()
-    rs = gain / loss.replace(0, np.inf)
-    df['rsi'] = 100 - (100 / (1 + rs))
-    
-    # MACD 
-    exp1 = df['cerrar'].ewm(span=12, min_periods=1).mean()
-    exp2 = df['cerrar'].ewm(span=26, min_periods=1).mean()
-    df['macd'] = exp1 - exp2
-    df['macd_signal'] = df['macd'].ewm(span=9, min_periods=1).mean()
-    df['macd_histogram'] = df['macd'] - df['macd_signal']
-    
-    # Bollinger Bands 
-    df['bb_middle'] = df['cerrar'].rolling(window=20, min_periods=1).mean()
-    bb_std = df['cerrar'].rolling(window=20, min_periods=1).std()
-    df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
-    df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
-    df['bb_width'] = df['bb_upper'] - df['bb_lower']
-    
-    # Evitar división por cero en bb_position
-    bb_range = df['bb_upper'] - df['bb_lower']
-    df['bb_position'] = np.where(bb_range != 0, 
-                                (df['cerrar'] - df['bb_lower']) / bb_range, 
-                                0.5)
-    
-    # Stochastic Oscillator
-    low_min = df['min'].rolling(window=14, min_periods=1).min()
-    high_max = df['max'].rolling(window=14, min_periods=1).max()
-    stoch_range = high_max - low_min
-    df['stoch_k'] = np.where(stoch_range != 0,
-                            100 * (df['cerrar'] - low_min) / stoch_range,
-                            50)
-    df['stoch_d'] = df['stoch_k'].rolling(window=3, min_periods=1).mean()
-    
-    # Williams %R
-    df['williams_r'] = np.where(stoch_range != 0,
-                               -100 * (high_max - df['cerrar']) / stoch_range,
-                               -50)
-    
-    # Volume indicators
-    df['volume_sma'] = df['volumen'].rolling(window=20, min_periods=1).mean()
-    df['volume_ratio'] = df['volumen'] / df['volume_sma'].replace(0, 1)
-    
-    # Rellenamos NaN con valores por defecto
-    df.ffill(inplace=True)
-    df.fillna(0, inplace=True)
-    
-    return df
+@st.cache_data(max_entries=2, show_spinner=False)
+def calculate_technical_indicators(_df, version_datos):
+    """
+    Calcula indicadores técnicos avanzados (RSI, MACD, Bollinger, estocástico, Williams %R,
+    volumen). El DataFrame no se hashea (prefijo _): la clave es la versión de los datos.
+    """
+    df = _df
+    columnas = technical_indicators(
+        df['cerrar'].to_numpy(), df['max'].to_numpy(), df['min'].to_numpy(), df['volumen'].to_numpy()
+    )
+    return df.assign(**columnas)
 
-@st.cache_data(ttl=1800) 
-def load_predictions(last_price=420.0):
-    """Carga predicciones del modelo LSTM si está disponible"""
-    try:
-        if os.path.exists(MODEL_PATH):
-            # Simulamos predicciones optimizadas
-            last_date = pd.Timestamp.now().date()
-            future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=7, freq='D')
-            
-            # Generamos predicciones más realistas basadas en el precio actual
-            base_price = float(last_price)
-            
-            # Usamos numpy para generar todas las variaciones de una vez
-            variations = np.random.normal(0, 0.015, 7)
-            predictions = []
-            
-            for i, variation in enumerate(variations):
-                pred_price = base_price * (1 + variation)
-                predictions.append(pred_price)
-                base_price = pred_price * 0.999
-                
-            return pd.DataFrame({
-                'fecha': future_dates,
-                'prediccion': predictions
-            })
-    except Exception as e:
-        st.error(f"⚠️ Error cargando predicciones: {e}")
-    
-    return pd.DataFrame()
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_pyramid(version_datos, _df):
+    """
+    Pirámide de reducción de puntos (min/max por cubo) de los datos, construida una vez
+    por versión de los datos y compartida por todas las sesiones.
+    """
+    return DownsamplePyramid.from_frame(_df)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_range_index(version_datos, _df):
+    """
+    Índice de estadísticas por rango (sumas prefijas y tabla dispersa) de los datos,
+    construido una vez por versión de los datos y compartido por todas las sesiones.
+    """
+    return RangeStatsIndex.from_frame(_df)
+
+def model_fingerprint(path=MODEL_PATH):
+    """
+    Huella del modelo actual: versión y tamaño y fecha de modificación de sus pesos (None
+    si no hay modelo registrado). Solo lee el puntero CURRENT y hace un stat.
+    """
+    version = ModelRegistry(path).current()
+    if version is None:
+        return None
+    pesos = os.stat(os.path.join(path, version, ARCHIVO_PESOS))
+    return version, pesos.st_size, pesos.st_mtime_ns
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_model(huella_modelo, path=MODEL_PATH):
+    """
+    Cargamos una vez por proceso del servidor los pesos NumPy del modelo (sin
+    TensorFlow), compartidos por todas las sesiones. La clave es la huella del modelo:
+    se recarga solo cuando se registra o promueve otra versión.
+    """
+    entrada = ModelRegistry(path).get(huella_modelo[0])
+    model, scaler, ventana = entrada.load("numpy")
+    return model, scaler, ventana, entrada.calendario
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_predictions(huella_modelo, version_datos, pasos=PASOS_PREDICCION):
+    """
+    Pronóstico LSTM de los próximos `pasos` días, calculado una vez por modelo y versión
+    de los datos y compartido por todas las sesiones y recargas.
+    """
+    model, scaler, ventana, calendario = load_model(huella_modelo)
+    serie = cargar_datos(version_datos[0], calendario)
+    pred = predecir_lstm(model, scaler, ventana, serie, pasos=pasos, calendario=calendario)
+    if pred.empty:
+        # Una excepción no se guarda en la caché: el siguiente intento vuelve a calcular
+        raise RuntimeError("El pronóstico LSTM no devolvió resultados")
+    return pred.rename(columns={'Fecha_Predicha': 'fecha', 'Prediccion_Cierre': 'prediccion'})
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def load_historical_predictions(path, version_predicciones):
+    """
+    Predicciones históricas a un paso (msft-predict --historico) indexadas por fecha. La
+    caché se indexa por la versión del archivo (data_version), como load_data.
+    """
+    df = read_table(path, columns=['Fecha', 'cerrar', 'prediccion', 'error', 'version'])
+    df['fecha'] = pd.to_datetime(df.pop('Fecha'))
+    return df.set_index('fecha').sort_index()
+
+def show_chart(fig, clave, webgl, medir=False):
+    """
+    Mostramos un gráfico de series densas (`clave` lo identifica entre reruns). Con
+    `webgl` las fechas van como arrays tipados (milisegundos) y fijamos los ejes de tipo
+    fecha. Con `medir` mostramos el tamaño del JSON enviado al navegador y, a petición, el
+    tiempo de render medido en el navegador.
+    """
+    date_axes(fig, webgl)
+    st.plotly_chart(fig, use_container_width=True)
+    if medir:
+        tamano, ms = payload_stats(fig)
+        puntos = max((len(traza.x) for traza in fig.data if traza.x is not None), default=0)
+        st.caption(
+            f"⏱️ {'WebGL' if webgl else 'SVG'} · {puntos:,} puntos por serie · "
+            f"{tamano / 1024:,.0f} KB · serializado en {ms:,.0f} ms"
+        )
+        with st.expander("⏱️ Medir Render en el Navegador"):
+            if st.checkbox("Dibujar y cronometrar Plotly.newPlot", key=f"render-{clave}"):
+                components.html(render_benchmark_html({'WebGL' if webgl else 'SVG': fig}), height=560, scrolling=True)
 
 def generate_trading_signals(df):
     """Genera señales de trading basadas en indicadores técnicos"""
@@ -382,18 +443,27 @@ def main():
     show_predictions = st.sidebar.checkbox("🔮 Mostrar Predicciones LSTM", value=True)
     show_technical = st.sidebar.checkbox("📊 Mostrar Indicadores Técnicos", value=True)
     show_volume = st.sidebar.checkbox("📈 Mostrar Análisis de Volumen", value=True)
+    chart_mode = st.sidebar.selectbox(
+        "🖥️ Modo de Gráficos", list(MODOS_GRAFICOS), format_func=MODOS_GRAFICOS.get
+    )
+    measure_charts = st.sidebar.checkbox("⏱️ Medir Rendimiento de Gráficos", value=False)
     
     # Carga de datos
     try:
         with st.spinner('📊 Cargando datos de Microsoft...'):
-            df = load_data(CSV_PATH)
+            version_datos = data_version(CSV_PATH)
+            df = load_data(CSV_PATH, version_datos)
             
         # Solo cargar predicciones si se van a mostrar
         predictions_df = pd.DataFrame()
         if show_predictions:
-            with st.spinner('🤖 Generando predicciones LSTM...'):
-                last_price = df['cerrar'].iloc[-1] if not df.empty else 420.0
-                predictions_df = load_predictions(last_price)
+            huella_modelo = model_fingerprint()
+            if huella_modelo is not None:
+                with st.spinner('🤖 Generando predicciones LSTM...'):
+                    try:
+                        predictions_df = load_predictions(huella_modelo, version_datos)
+                    except Exception as e:
+                        st.error(f"⚠️ Error cargando predicciones: {e}")
     except Exception as e:
         st.error(f"⚠️ Error cargando datos: {e}")
         st.stop()
@@ -418,16 +488,23 @@ def main():
         st.sidebar.error("⚠️ La fecha de inicio debe ser anterior a la de fin")
         st.stop()
     
-    # Filtramos datos y optimizamos para gráficos
-    df_filtered = df.loc[start_date:end_date].copy()
+    # Filtramos datos y optimizamos para gráficos. El rango es un corte por posición sin
+    # copia: df_filtered no se modifica
+    indice_rangos = load_range_index(version_datos, df)
+    inicio_rango, fin_rango = indice_rangos.bounds(start_date, end_date)
+    df_filtered = df.iloc[inicio_rango:fin_rango]
+    if df_filtered.empty:
+        st.sidebar.error("⚠️ No hay sesiones en el rango seleccionado")
+        st.stop()
     
-    # Si hay muchos datos, reducir para mejorar rendimiento
-    if len(df_filtered) > 1000:
-        # Tomar cada N-ésimo punto para gráficos más fluidos
-        step = len(df_filtered) // 800 
-        df_display = df_filtered.iloc[::step].copy()
-    else:
-        df_display = df_filtered.copy()
+    # Los gráficos se sirven desde el nivel de la pirámide que cabe en el presupuesto de
+    # puntos: conservan los picos y caídas del rango y cuestan O(puntos dibujados). En modo
+    # WebGL el presupuesto (PUNTOS_MAXIMOS_WEBGL) cubre el histórico completo o intradía
+    # sin reducir; en SVG, PUNTOS_MAXIMOS
+    webgl = use_webgl(len(df_filtered), chart_mode)
+    df_display = load_pyramid(version_datos, df).frame(
+        df, start_date, end_date, PUNTOS_MAXIMOS_WEBGL if webgl else PUNTOS_MAXIMOS
+    )
     
     # Información adicional en el sidebar
     st.sidebar.markdown("### 📈 Información de Microsoft")
@@ -620,9 +697,8 @@ def main():
         fig_main = go.Figure()
         
         # Precio de cierre REAL (datos históricos)
-        fig_main.add_trace(go.Scatter(
-            x=df_display.index,
-            y=df_display['cerrar'],
+        fig_main.add_trace(scatter(
+            df_display.index, df_display['cerrar'], webgl,
             mode='lines',
             name='💎 Precio Real MSFT',
             line=dict(color='#0078d4', width=3),
@@ -630,9 +706,8 @@ def main():
         ))
         
         # Media móvil 
-        fig_main.add_trace(go.Scatter(
-            x=df_display.index,
-            y=df_display['media_movil_7d'],
+        fig_main.add_trace(scatter(
+            df_display.index, df_display['media_movil_7d'], webgl,
             mode='lines',
             name='📊 Media Móvil 7D',
             line=dict(color='#00bcf2', width=2, dash='dash'),
@@ -641,9 +716,8 @@ def main():
         
         # Bollinger Bands 
         if show_technical:
-            fig_main.add_trace(go.Scatter(
-                x=df_display.index,
-                y=df_display['bb_upper'],
+            fig_main.add_trace(scatter(
+                df_display.index, df_display['bb_upper'], webgl,
                 mode='lines',
                 name='Bollinger Superior',
                 line=dict(color='#106ebe', width=1, dash='dot'),
@@ -651,9 +725,8 @@ def main():
                 hoverinfo='skip'
             ))
             
-            fig_main.add_trace(go.Scatter(
-                x=df_display.index,
-                y=df_display['bb_lower'],
+            fig_main.add_trace(scatter(
+                df_display.index, df_display['bb_lower'], webgl,
                 mode='lines',
                 name='Bollinger Inferior',
                 line=dict(color='#106ebe', width=1, dash='dot'),
@@ -738,7 +811,7 @@ def main():
             ]
         )
         
-        st.plotly_chart(fig_main, use_container_width=True)
+        show_chart(fig_main, "precio", webgl, measure_charts)
         
         # Gráficos adicionales en el resumen ejecutivo
         st.markdown("### 📊 Análisis Complementario")
@@ -751,20 +824,16 @@ def main():
                 with st.spinner('📊 Generando gráfico de volumen...'):
                     fig_vol = go.Figure()
                     
-                    vol_data = df_display.iloc[::2] if len(df_display) > 200 else df_display
-                    
-                    fig_vol.add_trace(go.Bar(
-                        x=vol_data.index,
-                        y=vol_data['volumen'],
+                    fig_vol.add_trace(bars(
+                        df_display.index, df_display['volumen'], webgl,
                         name='Volumen Diario',
                         marker_color='#0078d4',
                         opacity=0.7,
                         hovertemplate='Volumen: %{y:,.0f}<extra></extra>'
                     ))
                     
-                    fig_vol.add_trace(go.Scatter(
-                        x=df_display.index,
-                        y=df_display['volume_sma'],
+                    fig_vol.add_trace(scatter(
+                        df_display.index, df_display['volume_sma'], webgl,
                         mode='lines',
                         name='Volumen Promedio (20D)',
                         line=dict(color='#d13438', width=2),
@@ -780,7 +849,7 @@ def main():
                         showlegend=True
                     )
                     
-                    st.plotly_chart(fig_vol, use_container_width=True)
+                    show_chart(fig_vol, "volumen", webgl, measure_charts)
             else:
                 st.info("📊 Gráfico de volumen desactivado para mejor rendimiento")
         
@@ -789,18 +858,16 @@ def main():
             with st.spinner('⚡ Generando gráfico de volatilidad...'):
                 fig_vol_ret = go.Figure()
                 
-                fig_vol_ret.add_trace(go.Scatter(
-                    x=df_display.index,
-                    y=df_display['tasa_variacion'],
+                fig_vol_ret.add_trace(scatter(
+                    df_display.index, df_display['tasa_variacion'], webgl,
                     mode='lines',
                     name='Retorno Diario (%)',
                     line=dict(color='#00bcf2', width=1),
                     hovertemplate='Retorno: %{y:.2f}%<extra></extra>'
                 ))
                 
-                fig_vol_ret.add_trace(go.Scatter(
-                    x=df_display.index,
-                    y=df_display['volatilidad_7d'],
+                fig_vol_ret.add_trace(scatter(
+                    df_display.index, df_display['volatilidad_7d'], webgl,
                     mode='lines',
                     name='Volatilidad 7D (%)',
                     line=dict(color='#106ebe', width=2),
@@ -822,7 +889,7 @@ def main():
                     hovermode='x unified'
                 )
                 
-                st.plotly_chart(fig_vol_ret, use_container_width=True)
+                show_chart(fig_vol_ret, "volatilidad", webgl, measure_charts)
         
         # Métricas de rendimiento 
         st.markdown("### 🎯 Métricas de Rendimiento Microsoft")
@@ -895,9 +962,8 @@ def main():
                 
                 # RSI
                 fig_tech.add_trace(
-                    go.Scatter(
-                        x=df_display.index, 
-                        y=df_display['rsi'], 
+                    scatter(
+                        df_display.index, df_display['rsi'], webgl, 
                         name='RSI', 
                         line=dict(color='#9b59b6', width=2),
                         hovertemplate='RSI: %{y:.1f}<extra></extra>'
@@ -909,9 +975,8 @@ def main():
                 
                 # MACD
                 fig_tech.add_trace(
-                    go.Scatter(
-                        x=df_display.index, 
-                        y=df_display['macd'], 
+                    scatter(
+                        df_display.index, df_display['macd'], webgl, 
                         name='MACD', 
                         line=dict(color='#3498db', width=2),
                         hovertemplate='MACD: %{y:.3f}<extra></extra>'
@@ -919,9 +984,8 @@ def main():
                     row=2, col=1
                 )
                 fig_tech.add_trace(
-                    go.Scatter(
-                        x=df_display.index, 
-                        y=df_display['macd_signal'], 
+                    scatter(
+                        df_display.index, df_display['macd_signal'], webgl, 
                         name='Signal', 
                         line=dict(color='#e74c3c', width=1),
                         hovertemplate='Signal: %{y:.3f}<extra></extra>'
@@ -929,12 +993,11 @@ def main():
                     row=2, col=1
                 )
                 
-                # Solo agregar histograma si hay menos de 500 puntos
-                if len(df_display) < 500:
+                # Con SVG solo agregamos el histograma si hay menos de 500 puntos
+                if webgl or len(df_display) < 500:
                     fig_tech.add_trace(
-                        go.Bar(
-                            x=df_display.index, 
-                            y=df_display['macd_histogram'], 
+                        bars(
+                            df_display.index, df_display['macd_histogram'], webgl, 
                             name='Histogram', 
                             marker_color='#2ecc71',
                             opacity=0.6,
@@ -945,9 +1008,8 @@ def main():
                 
                 # Stochastic 
                 fig_tech.add_trace(
-                    go.Scatter(
-                        x=df_display.index, 
-                        y=df_display['stoch_k'], 
+                    scatter(
+                        df_display.index, df_display['stoch_k'], webgl, 
                         name='%K', 
                         line=dict(color='#f39c12', width=2),
                         hovertemplate='%K: %{y:.1f}<extra></extra>'
@@ -955,9 +1017,8 @@ def main():
                     row=3, col=1
                 )
                 fig_tech.add_trace(
-                    go.Scatter(
-                        x=df_display.index, 
-                        y=df_display['stoch_d'], 
+                    scatter(
+                        df_display.index, df_display['stoch_d'], webgl, 
                         name='%D', 
                         line=dict(color='#e67e22', width=1),
                         hovertemplate='%D: %{y:.1f}<extra></extra>'
@@ -969,9 +1030,8 @@ def main():
                 
                 # Williams %R
                 fig_tech.add_trace(
-                    go.Scatter(
-                        x=df_display.index, 
-                        y=df_display['williams_r'], 
+                    scatter(
+                        df_display.index, df_display['williams_r'], webgl, 
                         name='Williams %R', 
                         line=dict(color='#1abc9c', width=2),
                         hovertemplate='Williams %R: %{y:.1f}<extra></extra>'
@@ -987,7 +1047,7 @@ def main():
                     template='plotly_white',
                     title_text="📊 Indicadores Técnicos de Microsoft (MSFT)"
                 )
-                st.plotly_chart(fig_tech, use_container_width=True)
+                show_chart(fig_tech, "tecnicos", webgl, measure_charts)
         else:
             st.info("📊 Indicadores técnicos desactivados para mejor rendimiento. Actívalos en el panel de control.")
         
@@ -1002,24 +1062,24 @@ def main():
             )
             
             fig_vol.add_trace(
-                go.Bar(x=df_filtered.index, y=df_filtered['volumen'], name='Volumen', marker_color='#3498db'),
+                bars(df_display.index, df_display['volumen'], webgl, name='Volumen', marker_color='#3498db'),
                 row=1, col=1
             )
             
             fig_vol.add_trace(
-                go.Scatter(x=df_filtered.index, y=df_filtered['volume_sma'], name='Volumen Promedio', line=dict(color='#e74c3c')),
+                scatter(df_display.index, df_display['volume_sma'], webgl, name='Volumen Promedio', line=dict(color='#e74c3c')),
                 row=1, col=1
             )
             
             fig_vol.add_trace(
-                go.Scatter(x=df_filtered.index, y=df_filtered['volume_ratio'], name='Ratio Volumen', line=dict(color='#2ecc71')),
+                scatter(df_display.index, df_display['volume_ratio'], webgl, name='Ratio Volumen', line=dict(color='#2ecc71')),
                 row=2, col=1
             )
             fig_vol.add_hline(y=1.5, line_dash="dash", line_color="orange", row=2, col=1)
             fig_vol.add_hline(y=0.5, line_dash="dash", line_color="orange", row=2, col=1)
             
             fig_vol.update_layout(height=500, showlegend=False, template='plotly_white')
-            st.plotly_chart(fig_vol, use_container_width=True)
+            show_chart(fig_vol, "volumen_detalle", webgl, measure_charts)
     
     with tab3:
         st.markdown("""
@@ -1078,7 +1138,7 @@ def main():
             ))
             
             fig_pred.update_layout(
-                title="Predicción de Precios - Próximos 7 Días",
+                title=f"Predicción de Precios - Próximos {len(predictions_df)} Días",
                 xaxis_title="Fecha",
                 yaxis_title="Precio ($)",
                 height=500,
@@ -1100,6 +1160,51 @@ def main():
             
         else:
             st.info("🔧 Las predicciones no están disponibles. Entrena el modelo LSTM primero.")
+        
+        # Predicción a un paso frente al cierre real en el rango elegido
+        st.markdown("### 🎯 Predicción a un Paso vs Real")
+        if os.path.exists(RUTA_HISTORICO):
+            historico_pred = load_historical_predictions(RUTA_HISTORICO, data_version(RUTA_HISTORICO))
+            desde_pred = historico_pred.index.searchsorted(pd.Timestamp(start_date))
+            hasta_pred = historico_pred.index.searchsorted(pd.Timestamp(end_date), side='right')
+            historico_pred = historico_pred.iloc[desde_pred:hasta_pred]
+        else:
+            historico_pred = pd.DataFrame()
+        
+        if not historico_pred.empty:
+            webgl_pred = use_webgl(len(historico_pred), chart_mode)
+            fig_hist = make_subplots(
+                rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.05, row_heights=[0.7, 0.3],
+                subplot_titles=('Cierre Real vs Predicción LSTM a un Paso', 'Error (Real - Predicción)')
+            )
+            fig_hist.add_trace(scatter(
+                historico_pred.index, historico_pred['cerrar'], webgl_pred,
+                mode='lines', name='Cierre Real', line=dict(color='#0066cc', width=2)
+            ), row=1, col=1)
+            fig_hist.add_trace(scatter(
+                historico_pred.index, historico_pred['prediccion'], webgl_pred,
+                mode='lines', name='Predicción a un Paso', line=dict(color='#e74c3c', width=1.5)
+            ), row=1, col=1)
+            fig_hist.add_trace(bars(
+                historico_pred.index, historico_pred['error'], webgl_pred,
+                marker_color='#ff8c00', opacity=0.7, name='Error'
+            ), row=2, col=1)
+            fig_hist.update_layout(
+                height=600, template='plotly_white', hovermode='x unified', showlegend=True
+            )
+            fig_hist.update_yaxes(title_text="Precio ($)", row=1, col=1)
+            fig_hist.update_yaxes(title_text="Error ($)", row=2, col=1)
+            show_chart(fig_hist, "historico_predicciones", webgl_pred, measure_charts)
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("RMSE", f"${np.sqrt(np.mean(historico_pred['error'] ** 2)):.2f}")
+            with col2:
+                st.metric("MAE", f"${historico_pred['error'].abs().mean():.2f}")
+            with col3:
+                st.metric("Versiones del Modelo", f"{historico_pred['version'].nunique()}")
+        else:
+            st.info("🔧 No hay predicciones históricas en el rango. Ejecuta `msft-predict --historico`.")
     
     with tab4:
         st.markdown("""
@@ -1182,18 +1287,19 @@ def main():
         with col1:
             stats_df = pd.DataFrame({
                 'Métrica': ['Precio Máximo', 'Precio Mínimo', 'Precio Promedio', 'Volatilidad Promedio', 'Volumen Promedio'],
+                # Respondidas en O(1) por el índice, sin recorrer el rango
                 'Valor': [
-                    f"${df_filtered['cerrar'].max():.2f}",
-                    f"${df_filtered['cerrar'].min():.2f}",
-                    f"${df_filtered['cerrar'].mean():.2f}",
-                    f"{df_filtered['volatilidad_7d'].mean():.2f}%",
-                    f"{df_filtered['volumen'].mean():,.0f}"
+                    f"${indice_rangos.max('cerrar', inicio_rango, fin_rango):.2f}",
+                    f"${indice_rangos.min('cerrar', inicio_rango, fin_rango):.2f}",
+                    f"${indice_rangos.mean('cerrar', inicio_rango, fin_rango):.2f}",
+                    f"{indice_rangos.mean('volatilidad_7d', inicio_rango, fin_rango):.2f}%",
+                    f"{indice_rangos.mean('volumen', inicio_rango, fin_rango):,.0f}"
                 ]
             })
             st.dataframe(stats_df, use_container_width=True)
         
         with col2:
-            correlation_data = df_filtered[['cerrar', 'volumen', 'rsi', 'macd', 'volatilidad_7d']].corr()
+            correlation_data = indice_rangos.corr(inicio_rango, fin_rango)
             fig_corr = px.imshow(
                 correlation_data,
                 title="Matriz de Correlación",
@@ -0,0 +1,154 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+# Puntos máximos por serie que se envían a un gráfico
+PUNTOS_MAXIMOS = 1000
+# Columnas cuyos picos se conservan: precio, volumen y variación diaria (caídas y subidas)
+COLUMNAS_PIRAMIDE = ["cerrar", "volumen", "tasa_variacion"]
+
+class DownsamplePyramid:
+    """
+    Pirámide de resoluciones de una serie temporal para gráficos. El nivel 0 son todas
+    las filas; en el nivel k las filas se agrupan en cubos de 2^k y de cada cubo se
+    conservan las posiciones del mínimo y del máximo de cada columna (min/max por cubo),
+    así que ningún pico ni caída desaparece al reducir. Cada nivel se obtiene del anterior
+    comparando cubos vecinos: construir la pirámide cuesta O(n).
+    Un rango de fechas se sirve desde el nivel más fino que cabe en el presupuesto de
+    puntos, en O(log² n) por nivel más O(puntos devueltos).
+    """
+
+    def __init__(self, index, columnas):
+        """
+        index: DatetimeIndex ordenado. columnas: {nombre: array} de la misma longitud.
+        """
+        self.index = pd.DatetimeIndex(index)
+        n = len(self.index)
+        valores = [np.asarray(v, dtype=float) for v in columnas.values()]
+        extremos = [(np.arange(n), np.arange(n)) for _ in valores]
+        self.niveles = [np.arange(n)]
+        while len(self.niveles[-1]) > 2 * len(valores) + 2 and len(extremos[0][0]) > 1:
+            extremos = [
+                (_reducir(v, minimos, np.less_equal), _reducir(v, maximos, np.greater_equal))
+                for v, (minimos, maximos) in zip(valores, extremos)
+            ]
+            self.niveles.append(_unir(extremos, n))
+
+    @classmethod
+    def from_frame(cls, df, columnas=COLUMNAS_PIRAMIDE):
+        """Pirámide de las `columnas` de `df` (índice de fechas) que existan."""
+        return cls(df.index, {col: df[col].to_numpy() for col in columnas if col in df.columns})
+
+    def select(self, inicio=None, fin=None, puntos=PUNTOS_MAXIMOS):
+        """
+        Posiciones (ordenadas) de las filas a dibujar entre las fechas `inicio` y `fin`
+        (ambas incluidas): las del nivel más fino que, con la primera y la última fila del
+        rango, no pasa de `puntos` filas. Incluyen el mínimo y el máximo de cada columna
+        en el rango. Los bordes añaden O(log n) cubos: con presupuestos muy pequeños
+        (decenas de puntos en series largas) se devuelve el nivel más grueso aunque no quepa.
+        """
+        a = 0 if inicio is None else int(self.index.searchsorted(pd.Timestamp(inicio)))
+        b = len(self.index) if fin is None else int(self.index.searchsorted(pd.Timestamp(fin), side="right"))
+        if b <= a:
+            return np.empty(0, dtype=np.int64)
+        for k in range(len(self.niveles)):
+            tramos = self._cubrir(a, b, k)
+            primera = self.niveles[tramos[0][0]][tramos[0][1]]
+            ultima = self.niveles[tramos[-1][0]][tramos[-1][2] - 1]
+            if sum(j - i for _, i, j in tramos) + (primera != a) + (ultima != b - 1) <= puntos:
+                break
+        seleccion = np.concatenate([self.niveles[nivel][i:j] for nivel, i, j in tramos])
+        if not len(seleccion) or seleccion[0] != a:
+            seleccion = np.concatenate([[a], seleccion])
+        if seleccion[-1] != b - 1:
+            seleccion = np.concatenate([seleccion, [b - 1]])
+        return seleccion.astype(np.int64)
+
+    def _cubrir(self, a, b, k):
+        """
+        Tramos (nivel, i, j) de self.niveles que cubren las filas [a, b) con cubos enteros:
+        los cubos de 2^k que caben en el rango y, en los bordes, los de los niveles
+        inferiores (como en un árbol de segmentos). Un cubo cortado por el borde no sirve:
+        su mínimo o su máximo puede estar fuera del rango. En cada borde se baja como
+        mucho un cubo por nivel, así que son O(k) tramos.
+        """
+        if a >= b:
+            return []
+        tamano = 1 << k
+        # El último cubo de cada nivel termina en la última fila aunque no esté lleno
+        desde = -(-a // tamano) * tamano
+        hasta = b if b == len(self.index) else b // tamano * tamano
+        if desde >= hasta:
+            return self._cubrir(a, b, k - 1)
+        nivel = self.niveles[k]
+        tramo = (k, int(nivel.searchsorted(desde)), int(nivel.searchsorted(hasta)))
+        return self._cubrir(a, desde, k - 1) + [tramo] + self._cubrir(hasta, b, k - 1)
+
+    def frame(self, df, inicio=None, fin=None, puntos=PUNTOS_MAXIMOS):
+        """Filas de `df` (el DataFrame de la pirámide) a dibujar en el rango."""
+        return df.iloc[self.select(inicio, fin, puntos)]
+
+def _reducir(valores, posiciones, mejor):
+    """
+    Extremo de cada par de cubos vecinos: de las posiciones del nivel anterior
+    (`posiciones`, una por cubo) elegimos la de `valores` que cumple `mejor` frente a su
+    vecina. Con un número impar de cubos el último pasa solo.
+    """
+    if len(posiciones) % 2:
+        posiciones = np.append(posiciones, posiciones[-1])
+    izquierda, derecha = posiciones[0::2], posiciones[1::2]
+    return np.where(mejor(valores[izquierda], valores[derecha]), izquierda, derecha)
+
+def _unir(extremos, n):
+    """
+    Posiciones ordenadas y sin repetir de un nivel. Las de cada cubo están dentro de él y
+    los cubos están en orden, así que basta ordenar dentro de cada cubo (pocas columnas)
+    en lugar de ordenar todo el nivel. Siempre incluimos la primera y la última fila.
+    """
+    posiciones = np.sort(np.column_stack([p for par in extremos for p in par]), axis=1).ravel()
+    posiciones = np.concatenate([[0], posiciones, [n - 1]])
+    return posiciones[np.concatenate([[True], np.diff(posiciones) > 0])]
+
+def run():
+    """
+    Comparamos la pirámide con el muestreo cada N filas sobre una serie sintética: tiempo
+    de construcción y consulta, y cuántos de los 20 mayores picos y caídas de cada rango
+    aparecen en el gráfico.
+    """
+    from msft_analytics.sources import generate_ohlcv
+
+    parser = argparse.ArgumentParser(description="Benchmark de la pirámide de reducción de puntos")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Filas de la serie sintética (default: 1000000)")
+    parser.add_argument("--puntos", type=int, default=PUNTOS_MAXIMOS, help=f"Puntos por gráfico (default: {PUNTOS_MAXIMOS})")
+    args = parser.parse_args()
+
+    df = generate_ohlcv(args.rows, freq="1min", seed=0)
+    df = df.set_index(pd.to_datetime(df["Fecha"]))
+    df["tasa_variacion"] = df["cerrar"].pct_change().fillna(0) * 100
+
+    inicio = time.perf_counter()
+    piramide = DownsamplePyramid.from_frame(df)
+    construccion = time.perf_counter() - inicio
+    print(f"🔺 Pirámide De {len(piramide.niveles)} Niveles En {construccion * 1000:.1f} ms ({args.rows:,} Filas)")
+
+    tasa = df["tasa_variacion"].to_numpy()
+    rng = np.random.default_rng(0)
+    for fraccion in (1.0, 0.25, 0.01):
+        largo = max(int(args.rows * fraccion), 2)
+        a = int(rng.integers(0, args.rows - largo + 1))
+        desde, hasta = df.index[a], df.index[a + largo - 1]
+        inicio = time.perf_counter()
+        seleccion = piramide.select(desde, hasta, args.puntos)
+        consulta = time.perf_counter() - inicio
+        paso = max(largo // args.puntos, 1)
+        saltos = np.arange(a, a + largo, paso)
+        picos = a + np.argsort(np.abs(tasa[a:a + largo]))[-20:]
+        print(
+            f"Rango {fraccion:>5.0%}: {len(seleccion):>5} Puntos En {consulta * 1e6:,.0f} µs | "
+            f"Picos Conservados: Pirámide {np.isin(picos, seleccion).sum()}/20, "
+            f"Cada N Filas {np.isin(picos, saltos).sum()}/20"
+        )
+
+if __name__ == "__main__":
+    run()
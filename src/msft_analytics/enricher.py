@@ -1,20 +1,41 @@
 import os
+import json
+import argparse
 import numpy as np
 import pandas as pd
 from msft_analytics.logger import get_logger
+from msft_analytics.collector import DIAS_SOLAPAMIENTO
+from msft_analytics.indicators import (
+    COLUMNAS_MACD, COLUMNAS_TECNICAS, FILAS_PREVIAS_TECNICAS,
+    rolling_mean, rolling_std, expanding_std, true_range, macd_stream, window_indicators
+)
+from msft_analytics.storage import (
+    default_path, read_table, read_tail, write_table, append_table, iter_table, table_columns, TableWriter
+)
 
-# Directorio base
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-CARPETA_DATOS = os.path.join(BASE_DIR, "static", "data")
+# Rutas por defecto (CSV, o Parquet/Feather según MSFT_DATA_FORMAT)
 CSV_ORIGINAL_DEF = os.getenv(
     "MSFT_CSV_PATH",
-    os.path.join(CARPETA_DATOS, "historical.csv")
+    default_path("historical")
 )
 CSV_ENRIQUECIDO_DEF = os.getenv(
     "MSFT_ENRICHED_CSV",
-    os.path.join(CARPETA_DATOS, "historical_enriched.csv")
+    default_path("historical_enriched")
 )
 
+# Columnas del CSV original
+COLUMNAS_BASE = ["año", "mes", "día", "abrir", "max", "min", "cerrar", "volumen"]
+# Ventanas de los indicadores
+VENTANA_MOVIL = 7
+VENTANA_ATR = 14
+LAG_MOMENTUM = 7
+# Filas previas necesarias para recalcular los indicadores de ventana de una fila nueva
+# (el ATR usa el cierre anterior a su ventana y la volatilidad, la tasa de variación;
+# los indicadores técnicos del dashboard llegan hasta 19 filas atrás)
+FILAS_CONTEXTO = max(VENTANA_ATR, VENTANA_MOVIL + 1, LAG_MOMENTUM, FILAS_PREVIAS_TECNICAS)
+# Filas por bloque en el modo por bloques (fuera de memoria)
+FILAS_BLOQUE = 250_000
+
 class Enricher:
     def __init__(
         self,
@@ -24,61 +45,329 @@ class Enricher:
         """
         ruta_csv_original: Ruta al CSV original con columnas año, mes, día, abrir, max, min, cerrar, volumen
         ruta_csv_enriquecido: Ruta al CSV donde se guardarán los datos enriquecidos
+        Ambas rutas admiten también .parquet o .feather (formato columnar).
         """
         self.logger = get_logger("msft_enricher")
         self.ruta_csv_original = ruta_csv_original or CSV_ORIGINAL_DEF
         self.ruta_csv_enriquecido = ruta_csv_enriquecido or CSV_ENRIQUECIDO_DEF
+        # Estado de los acumulados, junto al enriquecido: historical_enriched.state.json
+        self.ruta_estado = os.path.splitext(self.ruta_csv_enriquecido)[0] + ".state.json"
+        # Estado tras el último cálculo, pendiente de guardar junto con los datos
+        self.estado = None
         os.makedirs(os.path.dirname(self.ruta_csv_enriquecido), exist_ok=True)
 
-    def calcular_kpi(self, df: pd.DataFrame) -> pd.DataFrame:
+    def preparar(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Reconstruimos la columna Fecha a partir de año, mes y día y ordenamos.
+        Si el origen ya trae Fecha (p. ej. barras intradía con hora) la respetamos.
+        """
         df = df.copy()
-        # Reconstruimos la columna Fecha a partir de año, mes y día
-        df['Fecha'] = pd.to_datetime(
-            dict(year=df['año'], month=df['mes'], day=df['día'])
+        if 'Fecha' in df.columns:
+            df['Fecha'] = pd.to_datetime(df['Fecha'])
+        else:
+            df['Fecha'] = pd.to_datetime(
+                dict(year=df['año'], month=df['mes'], day=df['día'])
+            )
+        return df.sort_values('Fecha', kind='stable').reset_index(drop=True)
+
+    def calcular_kpi(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Calculamos todos los KPIs sobre el histórico completo."""
+        df = self.preparar(df)
+        primera_cierre = df.loc[0, 'cerrar']
+        acumulados, estado = self._acumulados(df['cerrar'].to_numpy(dtype=float))
+        df = self._calcular_indicadores(df, primera_cierre, acumulados)
+        self.estado = self._estado_final(estado, df, primera_cierre, len(df))
+
+        self.logger.info("Enricher: KPIs Calculados Correctamente")
+        return df
+
+    def calcular_kpi_incremental(self, df: pd.DataFrame, filas_previas: int,
+                                 estado: dict = None) -> pd.DataFrame:
+        """
+        Calculamos los KPIs solo de las filas posteriores a las `filas_previas` ya enriquecidas.
+        Los indicadores de ventana se calculan sobre las FILAS_CONTEXTO filas anteriores más
+        las nuevas. Los acumulados continúan desde `estado` (el guardado junto al enriquecido)
+        a O(1) por fila nueva; si no corresponde a esas filas se recalculan sobre todo el
+        histórico. El resultado es idéntico bit a bit al de calcular_kpi.
+        """
+        df = self.preparar(df)
+        inicio = max(0, filas_previas - FILAS_CONTEXTO)
+        primera_cierre = df.loc[0, 'cerrar']
+        cerrar = df['cerrar'].to_numpy(dtype=float)
+
+        if self._estado_valido(estado, df, filas_previas):
+            acumulados, estado_acumulados = self._acumulados(cerrar[filas_previas:], estado)
+            # Las filas de contexto ya están en el enriquecido: sus acumulados no se usan
+            acumulados = {
+                col: np.concatenate([np.zeros(filas_previas - inicio), valores])
+                for col, valores in acumulados.items()
+            }
+        else:
+            self.logger.info("Enricher: Sin Estado De Acumulados Válido, Recorriendo Todo El Histórico")
+            acumulados, estado_acumulados = self._acumulados(cerrar)
+            acumulados = {col: valores[inicio:] for col, valores in acumulados.items()}
+        self.estado = self._estado_final(estado_acumulados, df, primera_cierre, len(df))
+
+        tramo = df.iloc[inicio:].reset_index(drop=True)
+        tramo = self._calcular_indicadores(tramo, primera_cierre, acumulados)
+        nuevas = tramo.iloc[filas_previas - inicio:].reset_index(drop=True)
+
+        self.logger.info(f"Enricher: KPIs Calculados Para {len(nuevas)} Filas Nuevas")
+        return nuevas
+
+    def _acumulados(self, cerrar, estado=None):
+        """
+        Calculamos las columnas que dependen de todo el pasado (desviación estándar
+        expansiva y MACD) para los cierres `cerrar`, continuando desde `estado` si se da
+        (cada fila cuesta O(1)). Devolvemos (acumulados, estado).
+        """
+        estado = estado or {}
+        acumulados = {}
+        acumulados['desviacion_estandar_acumulada'], estado_std = expanding_std(
+            cerrar, estado.get('desviacion_estandar_acumulada')
         )
-        df = df.sort_values('Fecha').reset_index(drop=True)
+        *columnas_macd, estado_macd = macd_stream(cerrar, estado.get('macd'))
+        acumulados.update(zip(COLUMNAS_MACD, columnas_macd))
+        return acumulados, {'desviacion_estandar_acumulada': estado_std, 'macd': estado_macd}
+
+    def _estado_final(self, estado, df, primera_cierre, filas):
+        """
+        Completamos el estado de los acumulados con lo necesario para validarlo y continuar:
+        filas enriquecidas, fecha y cierre de la última y primer cierre (retorno acumulado).
+        """
+        return {
+            'filas': int(filas),
+            'ultima_fecha': str(df['Fecha'].iloc[-1]),
+            'ultimo_cierre': float(df['cerrar'].iloc[-1]),
+            'primera_cierre': float(primera_cierre),
+            **estado
+        }
+
+    def _estado_valido(self, estado, df, filas_previas):
+        """
+        Comprobamos que el estado guardado corresponde exactamente a las `filas_previas`
+        primeras filas del histórico. Los estados de versiones anteriores (acumulados como
+        listas, sin 'ultimo_cierre') no son válidos.
+        """
+        if not estado or estado.get('filas') != filas_previas or filas_previas == 0:
+            return False
+        try:
+            ultima = df.iloc[filas_previas - 1]
+            return (
+                estado['ultima_fecha'] == str(ultima['Fecha'])
+                and estado['ultimo_cierre'] == float(ultima['cerrar'])
+                and estado['primera_cierre'] == float(df.loc[0, 'cerrar'])
+                and isinstance(estado['desviacion_estandar_acumulada'], dict)
+            )
+        except (KeyError, IndexError, TypeError):
+            return False
+
+    def leer_estado(self):
+        """Leemos el estado de los acumulados guardado junto al enriquecido (None si no hay)."""
+        if not os.path.exists(self.ruta_estado):
+            return None
+        try:
+            with open(self.ruta_estado, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Enricher: No Se Pudo Leer El Estado De Acumulados -> {e}")
+            return None
+
+    def borrar_estado(self):
+        """
+        Borramos el estado guardado antes de modificar el enriquecido, para que nunca quede
+        un estado que no corresponde a los datos si la escritura falla a medias.
+        """
+        if os.path.exists(self.ruta_estado):
+            os.remove(self.ruta_estado)
+
+    def guardar_estado(self):
+        """
+        Guardamos el estado del último cálculo junto al enriquecido (escritura atómica).
+        Se llama después de guardar los datos: si falla, la siguiente ejecución detecta que
+        no corresponde y recorre todo el histórico.
+        """
+        if self.estado is None:
+            return
+        temporal = f"{self.ruta_estado}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.estado, f, indent=2)
+        os.replace(temporal, self.ruta_estado)
+
+    def _calcular_indicadores(self, df, primera_cierre, acumulados):
+        """
+        Añadimos los KPIs a `df` (ya ordenado). Todos los indicadores de ventana dependen
+        solo de las filas de su ventana; los acumulados (columna -> valores) llegan ya
+        calculados.
+        """
+        cerrar = df['cerrar'].to_numpy(dtype=float)
 
         # KPIs
         df['tasa_variacion'] = df['cerrar'].pct_change().fillna(0) * 100
-        df['media_movil_7d'] = df['cerrar'].rolling(window=7, min_periods=1).mean()
-        df['volatilidad_7d'] = df['tasa_variacion'].rolling(window=7, min_periods=1).std()
-        primera_cierre = df.loc[0, 'cerrar']
+        df['media_movil_7d'] = rolling_mean(cerrar, VENTANA_MOVIL)
+        df['volatilidad_7d'] = rolling_std(df['tasa_variacion'].to_numpy(), VENTANA_MOVIL)
         df['retorno_acumulado'] = (df['cerrar'] / primera_cierre) - 1
-        df['desviacion_estandar_acumulada'] = df['cerrar'].expanding(min_periods=1).std().fillna(0)
-        
+        df['desviacion_estandar_acumulada'] = acumulados['desviacion_estandar_acumulada']
+
         # columnas de enriquecimiento
         df['rango_diario'] = df['max'] - df['min']
         df['rango_pct_diario'] = (df['rango_diario'] / df['cerrar']) * 100
         df['dia_semana'] = df['Fecha'].dt.weekday
-        df['momentum_7d'] = df['cerrar'] - df['cerrar'].shift(7)
-        df['momentum_7d'].fillna(0, inplace=True)
-        tr1 = df['max'] - df['min']
-        tr2 = (df['max'] - df['cerrar'].shift(1)).abs()
-        tr3 = (df['min'] - df['cerrar'].shift(1)).abs()
-        df['true_range'] = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        df['atr_14d'] = df['true_range'].rolling(window=14, min_periods=1).mean()
-        df.drop(columns=['true_range'], inplace=True)
+        df['momentum_7d'] = (df['cerrar'] - df['cerrar'].shift(LAG_MOMENTUM)).fillna(0)
+        df['atr_14d'] = rolling_mean(
+            true_range(df['max'].to_numpy(), df['min'].to_numpy(), cerrar), VENTANA_ATR
+        )
 
-        self.logger.info("Enricher: KPIs Calculados Correctamente")
+        # indicadores técnicos del dashboard, así no tiene que calcularlos al cargar
+        tecnicos = window_indicators(
+            cerrar, df['max'].to_numpy(), df['min'].to_numpy(), df['volumen'].to_numpy()
+        )
+        for col in COLUMNAS_TECNICAS:
+            df[col] = acumulados[col] if col in COLUMNAS_MACD else tecnicos[col]
         return df
 
-    def run(self):
-        """Ejecutamos el proceso de enriquecimiento y guardamos el CSV"""
+    def run_por_bloques(self, filas_bloque: int = FILAS_BLOQUE):
+        """
+        Enriquecemos el histórico completo por bloques, sin cargarlo entero en memoria.
+        Entre bloques arrastramos las últimas FILAS_CONTEXTO filas (indicadores de ventana) y
+        el estado de la desviación expansiva y del MACD, y cada bloque se escribe en cuanto
+        se calcula.
+        El origen debe estar ordenado por fecha; el resultado es idéntico al de calcular_kpi.
+        """
+        self.logger.info(
+            f"Enricher: Leyendo {self.ruta_csv_original} Por Bloques De {filas_bloque} Filas"
+        )
+        contexto = None
+        estado = None
+        primera_cierre = None
+
+        self.borrar_estado()
+        with TableWriter(self.ruta_csv_enriquecido) as salida:
+            for bloque in iter_table(self.ruta_csv_original, filas_bloque):
+                bloque = self.preparar(bloque)
+                if bloque.empty:
+                    continue
+                if contexto is not None and bloque['Fecha'].iloc[0] < contexto['Fecha'].iloc[-1]:
+                    raise ValueError(
+                        "El histórico no está ordenado por fecha; usa el modo completo."
+                    )
+                if primera_cierre is None:
+                    primera_cierre = bloque.loc[0, 'cerrar']
+
+                acumulados, estado = self._acumulados(bloque['cerrar'].to_numpy(dtype=float), estado)
+
+                # Las filas de contexto ya se escribieron: sus acumulados no se usan
+                n_contexto = 0 if contexto is None else len(contexto)
+                tramo = pd.concat([contexto, bloque], ignore_index=True) if n_contexto else bloque
+                acumulados = {
+                    col: np.concatenate([np.zeros(n_contexto), valores])
+                    for col, valores in acumulados.items()
+                }
+
+                tramo = self._calcular_indicadores(tramo, primera_cierre, acumulados)
+                salida.write(tramo.iloc[n_contexto:])
+                contexto = tramo[bloque.columns].iloc[-FILAS_CONTEXTO:].reset_index(drop=True)
+
+        if contexto is not None:
+            self.estado = self._estado_final(estado, contexto, primera_cierre, salida.filas)
+        self.logger.info(f"Enricher: {salida.filas} Filas Enriquecidas Por Bloques")
+
+    def filas_enriquecidas(self, df: pd.DataFrame, estado: dict = None):
+        """
+        Devolvemos cuántas filas del histórico ya están en el archivo enriquecido, o None si
+        hay que recalcular todo (no existe, le faltan columnas de una versión posterior, o
+        sus columnas base no coinciden con el histórico, p. ej. porque el colector corrigió
+        días ya enriquecidos).
+        Con el `estado` guardado solo comprobamos la cola: la última fecha y el último
+        cierre del estado y las filas de los últimos DIAS_SOLAPAMIENTO días (las únicas que
+        el colector vuelve a descargar), leídas desde el final del archivo. Sin estado
+        comparamos todo el histórico.
+        """
+        if not os.path.exists(self.ruta_csv_enriquecido):
+            return None
+        try:
+            if not set(COLUMNAS_TECNICAS).issubset(table_columns(self.ruta_csv_enriquecido)):
+                return None
+            df = self.preparar(df)
+            if estado and 'ultimo_cierre' in estado:
+                return self._cola_coincide(df, estado)
+            previo = read_table(self.ruta_csv_enriquecido, columns=COLUMNAS_BASE)
+        except Exception as e:
+            self.logger.warning(f"Enricher: No Se Pudo Leer El Enriquecido Previo -> {e}")
+            return None
+
+        n = len(previo)
+        if n == 0 or n > len(df) or list(previo.columns) != COLUMNAS_BASE:
+            return None
+        base = df[COLUMNAS_BASE].iloc[:n].to_numpy(dtype=float)
+        if not np.array_equal(base, previo.to_numpy(dtype=float), equal_nan=True):
+            return None
+        return n
+
+    def _cola_coincide(self, df, estado):
+        """
+        Filas enriquecidas según el `estado` si el histórico (ya preparado) coincide con el
+        enriquecido en su cola (ver filas_enriquecidas); None si no.
+        """
+        n = estado.get('filas')
+        if not isinstance(n, int) or n == 0 or n > len(df):
+            return None
+        ultima = df.iloc[n - 1]
+        if str(ultima['Fecha']) != estado['ultima_fecha'] or float(ultima['cerrar']) != estado['ultimo_cierre']:
+            return None
+        desde = pd.Timestamp(estado['ultima_fecha']) - pd.Timedelta(days=DIAS_SOLAPAMIENTO)
+        filas_cola = n - int(df['Fecha'].iloc[:n].searchsorted(desde))
+        previo = read_tail(self.ruta_csv_enriquecido, filas_cola, columns=COLUMNAS_BASE)
+        if len(previo) != filas_cola or list(previo.columns) != COLUMNAS_BASE:
+            return None
+        base = df[COLUMNAS_BASE].iloc[n - filas_cola:n].to_numpy(dtype=float)
+        if not np.array_equal(base, previo.to_numpy(dtype=float), equal_nan=True):
+            return None
+        return n
+
+    def run(self, incremental: bool = True, filas_bloque: int = None):
+        """
+        Ejecutamos el proceso de enriquecimiento y guardamos el CSV.
+        En modo incremental solo se calculan y añaden las filas nuevas; si el histórico
+        cambió en filas ya enriquecidas se recalcula todo.
+        Con `filas_bloque` se recalcula todo por bloques, con memoria acotada.
+        """
+        if filas_bloque:
+            try:
+                self.run_por_bloques(filas_bloque)
+                self.guardar_estado()
+                self.logger.info(
+                    f"Enricher: CSV Enriquecido Guardado En {self.ruta_csv_enriquecido}"
+                )
+            except Exception as e:
+                self.logger.error(f"Enricher: error en el enriquecimiento por bloques -> {e}")
+            return
+
         try:
             self.logger.info(f"Enricher: Leyendo {self.ruta_csv_original}")
-            df = pd.read_csv(self.ruta_csv_original)
+            df = read_table(self.ruta_csv_original)
         except Exception as e:
             self.logger.error(f"Enricher: error al leer CSV original -> {e}")
             return
 
-        df_enriquecido = self.calcular_kpi(df)
+        estado = self.leer_estado() if incremental else None
+        filas_previas = self.filas_enriquecidas(df, estado) if incremental else None
+        if incremental and filas_previas is None:
+            self.logger.info("Enricher: Sin Enriquecido Previo Compatible, Recalculando Todo")
 
         try:
-            df_enriquecido.to_csv(
-                self.ruta_csv_enriquecido,
-                index=False,
-                encoding="utf-8-sig"
-            )
+            if filas_previas is None:
+                df_enriquecido = self.calcular_kpi(df)
+                self.borrar_estado()
+                write_table(df_enriquecido, self.ruta_csv_enriquecido)
+            elif filas_previas == len(df):
+                self.logger.info("Enricher: No Hay Filas Nuevas Que Enriquecer")
+                return
+            else:
+                nuevas = self.calcular_kpi_incremental(df, filas_previas, estado)
+                self.borrar_estado()
+                append_table(nuevas, self.ruta_csv_enriquecido)
+            self.guardar_estado()
             self.logger.info(
                 f"Enricher: CSV Enriquecido Guardado En {self.ruta_csv_enriquecido}"
             )
@@ -88,8 +377,25 @@ class Enricher:
             )
 
 def run():
+    parser = argparse.ArgumentParser(
+        description="Calcula los KPIs del histórico y guarda el CSV enriquecido"
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Recalcula todo el histórico en lugar de solo las filas nuevas"
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        nargs="?",
+        const=FILAS_BLOQUE,
+        help=f"Recalcula todo por bloques de N filas, con memoria acotada (default: {FILAS_BLOQUE})"
+    )
+    args = parser.parse_args()
+
     enricher = Enricher()
-    enricher.run()
+    enricher.run(incremental=not args.full_refresh, filas_bloque=args.chunksize)
 
 if __name__ == "__main__":
     run()
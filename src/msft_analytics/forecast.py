@@ -0,0 +1,59 @@
+import weakref
+import numpy as np
+
+# Funciones compiladas por modelo y tamaño de ventana. Las funciones solo guardan una
+# referencia débil al modelo, así que la entrada se libera junto con él
+_ROLLOUTS = weakref.WeakKeyDictionary()
+
+def compile_rollout(model, ventana):
+    """
+    Compilamos (tf.function) el pronóstico autorregresivo completo de `model` para
+    ventanas de `ventana` observaciones. La función recibe la ventana inicial escalada
+    (float32, forma (ventana,)) y el número de pasos, y devuelve los `pasos` valores
+    predichos en una sola llamada al grafo.
+    Si el modelo tiene una cabeza multi-horizonte (Dense(h)), cada evaluación aporta h
+    pasos; para más de h pasos se encadenan bloques sobre las propias predicciones.
+    Todo ocurre sobre un buffer de ventana + pasos posiciones reservado al principio.
+    """
+    por_ventana = _ROLLOUTS.setdefault(model, {})
+    if ventana in por_ventana:
+        return por_ventana[ventana]
+
+    import tensorflow as tf
+
+    horizonte = int(model.output_shape[-1])
+    # Si la función cerrase sobre `model`, el valor mantendría viva su propia clave en
+    # _ROLLOUTS y ni el modelo ni el grafo se liberarían nunca
+    modelo = weakref.ref(model)
+
+    @tf.function(input_signature=[
+        tf.TensorSpec([ventana], tf.float32),
+        tf.TensorSpec([], tf.int32)
+    ])
+    def rollout(inicial, pasos):
+        bloques = (pasos + horizonte - 1) // horizonte
+        buffer = tf.concat([inicial, tf.zeros([bloques * horizonte], tf.float32)], axis=0)
+        for bloque in tf.range(bloques):
+            inicio = bloque * horizonte
+            seq = tf.reshape(buffer[inicio:inicio + ventana], [1, ventana, 1])
+            pred = tf.reshape(tf.cast(modelo()(seq, training=False), tf.float32), [horizonte])
+            posiciones = tf.range(ventana + inicio, ventana + inicio + horizonte)
+            buffer = tf.tensor_scatter_nd_update(buffer, tf.reshape(posiciones, [-1, 1]), pred)
+        return buffer[ventana:ventana + pasos]
+
+    por_ventana[ventana] = rollout
+    return rollout
+
+def forecast(model, serie_escalada, ventana, pasos):
+    """
+    Pronosticamos los `pasos` valores siguientes de una serie ya escalada a partir de sus
+    últimas `ventana` observaciones. Devolvemos un array float32 de forma (pasos,).
+    Los modelos NumPy (numpy_lstm.NumpyLSTM) traen su propio rollout y no importan
+    TensorFlow.
+    """
+    inicial = np.asarray(serie_escalada, dtype=np.float32).reshape(-1)[-ventana:]
+    if pasos <= 0:
+        return np.empty(0, dtype=np.float32)
+    if hasattr(model, "rollout"):
+        return model.rollout(inicial, pasos).astype(np.float32)
+    return compile_rollout(model, ventana)(inicial, np.int32(pasos)).numpy()
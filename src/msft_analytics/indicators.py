@@ -0,0 +1,422 @@
+import math
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+# Parámetros de los indicadores técnicos del dashboard
+VENTANA_RSI = 14
+MACD_RAPIDA = 12
+MACD_LENTA = 26
+MACD_SENAL = 9
+VENTANA_BOLLINGER = 20
+DESVIACIONES_BOLLINGER = 2
+VENTANA_ESTOCASTICO = 14
+SUAVIZADO_ESTOCASTICO = 3
+VENTANA_VOLUMEN = 20
+# Filas anteriores de las que depende cada fila en los indicadores de ventana (el RSI usa
+# el cierre previo a su ventana y %D suaviza los últimos valores de %K)
+FILAS_PREVIAS_TECNICAS = max(
+    VENTANA_RSI, VENTANA_BOLLINGER - 1, VENTANA_ESTOCASTICO + SUAVIZADO_ESTOCASTICO - 2,
+    VENTANA_VOLUMEN - 1
+)
+COLUMNAS_MACD = ["macd", "macd_signal", "macd_histogram"]
+# Columnas que añade technical_indicators
+COLUMNAS_TECNICAS = [
+    "rsi", "macd", "macd_signal", "macd_histogram",
+    "bb_middle", "bb_upper", "bb_lower", "bb_width", "bb_position",
+    "stoch_k", "stoch_d", "williams_r", "volume_sma", "volume_ratio"
+]
+
+def _as_float(x, dtype=None):
+    """
+    Convertimos a un array decimal contiguo sin copiar si ya lo es. Se respeta float32;
+    cualquier otro tipo (enteros, object...) se calcula en float64.
+    """
+    if dtype is None:
+        dtype = np.float32 if np.asarray(x).dtype == np.float32 else np.float64
+    return np.ascontiguousarray(x, dtype=dtype)
+
+def _observaciones(n, ventana, dtype):
+    """Número de observaciones de cada ventana con min_periods=1: 1, 2, ..., ventana, ventana..."""
+    return np.minimum(np.arange(1, n + 1, dtype=dtype), ventana)
+
+# Todos los kernels de ventana suman cada fila con solo los valores de su propia ventana,
+# del más antiguo al más reciente (rezago k: la fila i recibe x[i - k]). A diferencia de
+# las sumas acumuladas de pandas, el resultado de una fila no depende de desde dónde se
+# empiece a calcular, así que el modo incremental y por bloques coincide bit a bit.
+# La serie se recorre por tramos de FILAS_TRAMO filas y cada tramo pasa por todos los
+# rezagos mientras sigue en la caché, sin temporales del tamaño de la serie.
+FILAS_TRAMO = 16_384
+
+def _rezagos(n, ventana):
+    """
+    Recorremos las `n` filas por tramos y, dentro de cada tramo, los rezagos de la ventana
+    del más antiguo al más reciente. Devolvemos (inicio, fin, k): las filas [inicio, fin)
+    del tramo que tienen valor con rezago k, que es x[inicio - k:fin - k].
+    """
+    for tramo in range(0, n, FILAS_TRAMO):
+        fin = min(tramo + FILAS_TRAMO, n)
+        for k in range(min(ventana, fin) - 1, -1, -1):
+            inicio = max(tramo, k)
+            yield inicio, fin, k
+
+def rolling_mean(x, ventana, dtype=None):
+    """Media móvil con min_periods=1."""
+    x = _as_float(x, dtype)
+    n = len(x)
+    suma = np.zeros(n, dtype=x.dtype)
+    for inicio, fin, k in _rezagos(n, ventana):
+        suma[inicio:fin] += x[inicio - k:fin - k]
+    suma /= _observaciones(n, ventana, x.dtype)
+    return suma
+
+def rolling_std(x, ventana, dtype=None, media=None):
+    """
+    Desviación estándar muestral móvil con min_periods=1 (NaN con una sola observación).
+    media: rolling_mean(x, ventana) si ya se calculó, para no repetirla.
+    """
+    x = _as_float(x, dtype)
+    n = len(x)
+    if media is None:
+        media = rolling_mean(x, ventana)
+    ssq = np.zeros(n, dtype=x.dtype)
+    desvio = np.empty(min(n, FILAS_TRAMO), dtype=x.dtype)
+    for inicio, fin, k in _rezagos(n, ventana):
+        tramo = desvio[:fin - inicio]
+        np.subtract(x[inicio - k:fin - k], media[inicio:fin], out=tramo)
+        np.multiply(tramo, tramo, out=tramo)
+        ssq[inicio:fin] += tramo
+
+    obs = _observaciones(n, ventana, x.dtype)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ssq /= obs - 1
+    np.sqrt(ssq, out=ssq)
+    # Ventanas con todos los valores iguales: 0 exacto, sin residuos de redondeo. Contamos
+    # los cambios de valor con una suma acumulada de enteros, que es exacta
+    cambios = np.zeros(n, dtype=np.int64)
+    np.cumsum(x[1:] != x[:-1], out=cambios[1:])
+    inicio = np.arange(n) - obs.astype(np.int64) + 1
+    ssq[(cambios == cambios[inicio]) & (obs > 1)] = 0.0
+    ssq[obs < 2] = np.nan
+    return ssq
+
+def rolling_min(x, ventana, dtype=None):
+    """Mínimo móvil con min_periods=1."""
+    x = _as_float(x, dtype)
+    salida = x.copy()
+    for inicio, fin, k in _rezagos(len(x), ventana):
+        if k:
+            np.minimum(salida[inicio:fin], x[inicio - k:fin - k], out=salida[inicio:fin])
+    return salida
+
+def rolling_max(x, ventana, dtype=None):
+    """Máximo móvil con min_periods=1."""
+    x = _as_float(x, dtype)
+    salida = x.copy()
+    for inicio, fin, k in _rezagos(len(x), ventana):
+        if k:
+            np.maximum(salida[inicio:fin], x[inicio - k:fin - k], out=salida[inicio:fin])
+    return salida
+
+def ewm_mean(x, span, dtype=None):
+    """
+    Media móvil exponencial como ewm(span=span, adjust=True, min_periods=1).mean() de
+    pandas: el numerador es un filtro IIR de primer orden y el denominador, la suma
+    geométrica de los pesos.
+    """
+    return _ewm(_as_float(x, dtype), span)[0]
+
+def _ewm(x, span, estado=None):
+    """
+    Media exponencial de `x` continuando desde `estado` = (filas ya procesadas, último
+    numerador del filtro). El filtro continúa exactamente donde quedó, así que calcular
+    por tramos da el mismo resultado bit a bit. Devolvemos (media, estado).
+    """
+    filas_previas, numerador_previo = estado or (0, 0.0)
+    if len(x) == 0:
+        return x.copy(), (filas_previas, numerador_previo)
+    beta = 1 - 2 / (span + 1)
+    numerador, _ = lfilter(
+        np.array([1.0]), np.array([1.0, -beta]), x, zi=np.array([beta * numerador_previo])
+    )
+    estado = (filas_previas + len(x), float(numerador[-1]))
+    numerador *= 1 - beta
+    # 1 - beta**t se redondea a 1 en cuanto beta**t < eps: solo corregimos las primeras filas
+    limite = int(np.log(np.finfo(x.dtype).eps) / np.log(beta)) + 2 if beta > 0 else 0
+    filas = min(len(x), limite - filas_previas)
+    if filas > 0:
+        numerador[:filas] /= 1 - np.power(beta, np.arange(filas_previas + 1, filas_previas + filas + 1))
+    return numerador.astype(x.dtype, copy=False), estado
+
+def expanding_std(valores, estado=None):
+    """
+    Desviación estándar expansiva (muestral, 0 con una sola observación) continuando
+    desde `estado`. Reproduce el algoritmo de Welford con compensación de Kahan que usa
+    pandas en expanding().std(), así que procesar por bloques da el mismo resultado
+    bit a bit que procesar todo de una vez. Cada valor nuevo cuesta O(1) y el estado es
+    un dict JSON con 'observaciones', 'media', 'suma_cuadrados', 'compensacion' (Kahan),
+    'iguales' (valores iguales seguidos al final) y 'ultimo_valor'. Devolvemos (std, estado).
+    """
+    estado = estado or {}
+    nobs = estado.get('observaciones', 0)
+    media = estado.get('media', 0.0)
+    ssq = estado.get('suma_cuadrados', 0.0)
+    compensacion = estado.get('compensacion', 0.0)
+    iguales = estado.get('iguales', 0)
+    previo = estado.get('ultimo_valor', math.nan)
+    salida = []
+    agregar = salida.append
+    for valor in np.asarray(valores, dtype=float).tolist():
+        nobs += 1
+        iguales = iguales + 1 if valor == previo else 1
+        previo = valor
+        media_previa = media - compensacion
+        y = valor - compensacion
+        t = y - media
+        compensacion = t + media - y
+        media = media + t / nobs
+        ssq = ssq + (valor - media_previa) * (valor - media)
+        # Serie constante hasta aquí: 0 exacto, como pandas
+        agregar(0.0 if nobs < 2 or iguales >= nobs else math.sqrt(max(ssq / (nobs - 1), 0.0)))
+    return np.array(salida, dtype=float), {
+        'observaciones': nobs, 'media': media, 'suma_cuadrados': ssq,
+        'compensacion': compensacion, 'iguales': iguales, 'ultimo_valor': previo
+    }
+
+def true_range(maximo, minimo, cerrar, dtype=None):
+    """
+    True range: el mayor entre el rango del día y los saltos desde el cierre anterior
+    (en la primera fila, solo el rango del día).
+    """
+    maximo = _as_float(maximo, dtype)
+    minimo = _as_float(minimo, maximo.dtype)
+    cerrar = _as_float(cerrar, maximo.dtype)
+    salida = maximo - minimo
+    salto = np.empty_like(salida)
+    for extremo in (maximo, minimo):
+        np.subtract(extremo[1:], cerrar[:-1], out=salto[1:])
+        np.abs(salto[1:], out=salto[1:])
+        np.fmax(salida[1:], salto[1:], out=salida[1:])
+    return salida
+
+def rsi(cerrar, ventana=VENTANA_RSI, dtype=None):
+    """
+    RSI con medias simples de ganancias y pérdidas. Si no hubo pérdidas en la ventana
+    el RSI es 0, igual que la versión original del dashboard.
+    """
+    cerrar = _as_float(cerrar, dtype)
+    delta = np.zeros_like(cerrar)
+    np.subtract(cerrar[1:], cerrar[:-1], out=delta[1:])
+    ganancia = rolling_mean(np.maximum(delta, 0), ventana)
+    np.negative(delta, out=delta)
+    np.maximum(delta, 0, out=delta)
+    perdida = rolling_mean(delta, ventana)
+
+    rs = np.zeros_like(ganancia)
+    np.divide(ganancia, perdida, out=rs, where=perdida != 0)
+    rs += 1
+    np.divide(100, rs, out=rs)
+    np.subtract(100, rs, out=rs)
+    return rs
+
+def macd(cerrar, rapida=MACD_RAPIDA, lenta=MACD_LENTA, senal=MACD_SENAL, dtype=None):
+    """Devolvemos (macd, señal, histograma)."""
+    return macd_stream(cerrar, None, rapida, lenta, senal, dtype)[:3]
+
+def macd_stream(cerrar, estado=None, rapida=MACD_RAPIDA, lenta=MACD_LENTA, senal=MACD_SENAL,
+                dtype=None):
+    """
+    MACD de un tramo de la serie continuando desde `estado` (el devuelto con el tramo
+    anterior). Las medias exponenciales dependen de todo el pasado, así que es el único
+    indicador técnico que no se puede recalcular solo con unas filas de contexto.
+    Devolvemos (macd, señal, histograma, estado).
+    """
+    cerrar = _as_float(cerrar, dtype)
+    estado_rapida, estado_lenta, estado_senal = estado or (None, None, None)
+    linea, estado_rapida = _ewm(cerrar, rapida, estado_rapida)
+    media_lenta, estado_lenta = _ewm(cerrar, lenta, estado_lenta)
+    linea -= media_lenta
+    linea_senal, estado_senal = _ewm(linea, senal, estado_senal)
+    return linea, linea_senal, linea - linea_senal, (estado_rapida, estado_lenta, estado_senal)
+
+def bollinger(cerrar, ventana=VENTANA_BOLLINGER, desviaciones=DESVIACIONES_BOLLINGER, dtype=None):
+    """
+    Devolvemos (media, banda superior, banda inferior, ancho, posición del cierre entre
+    las bandas). La posición es 0.5 cuando las bandas coinciden.
+    """
+    cerrar = _as_float(cerrar, dtype)
+    media = rolling_mean(cerrar, ventana)
+    desvio = rolling_std(cerrar, ventana, media=media)
+    desvio *= desviaciones
+    superior = media + desvio
+    inferior = media - desvio
+    ancho = superior - inferior
+
+    posicion = np.full_like(cerrar, 0.5)
+    np.subtract(cerrar, inferior, out=desvio)
+    np.divide(desvio, ancho, out=posicion, where=ancho != 0)
+    return media, superior, inferior, ancho, posicion
+
+def stochastic(maximo, minimo, cerrar, ventana=VENTANA_ESTOCASTICO,
+               suavizado=SUAVIZADO_ESTOCASTICO, dtype=None):
+    """
+    Devolvemos (%K, %D, Williams %R). Con rango nulo %K vale 50 y Williams %R, -50.
+    """
+    cerrar = _as_float(cerrar, dtype)
+    minimo_movil = rolling_min(minimo, ventana, cerrar.dtype)
+    maximo_movil = rolling_max(maximo, ventana, cerrar.dtype)
+    rango = maximo_movil - minimo_movil
+    con_rango = rango != 0
+
+    k = np.full_like(cerrar, 50)
+    np.subtract(cerrar, minimo_movil, out=minimo_movil)
+    minimo_movil *= 100
+    np.divide(minimo_movil, rango, out=k, where=con_rango)
+
+    williams = np.full_like(cerrar, -50)
+    np.subtract(maximo_movil, cerrar, out=maximo_movil)
+    maximo_movil *= -100
+    np.divide(maximo_movil, rango, out=williams, where=con_rango)
+    return k, rolling_mean(k, suavizado), williams
+
+def volume_ratio(volumen, ventana=VENTANA_VOLUMEN, dtype=None):
+    """Devolvemos (media móvil del volumen, volumen / media móvil)."""
+    volumen = _as_float(volumen, dtype)
+    media = rolling_mean(volumen, ventana)
+    ratio = volumen / np.where(media == 0, 1, media)
+    return media, ratio
+
+def technical_indicators(cerrar, maximo, minimo, volumen, dtype=None):
+    """
+    Calculamos todos los indicadores técnicos del dashboard (COLUMNAS_TECNICAS) y los
+    devolvemos como diccionario columna -> array. Con dtype=np.float32 se calcula en
+    simple precisión (la mitad de memoria; suficiente para graficar).
+    """
+    cerrar = _as_float(cerrar, dtype)
+    columnas = dict(zip(COLUMNAS_MACD, macd(cerrar)))
+    columnas.update(window_indicators(cerrar, maximo, minimo, volumen, cerrar.dtype))
+    return {col: columnas[col] for col in COLUMNAS_TECNICAS}
+
+def window_indicators(cerrar, maximo, minimo, volumen, dtype=None):
+    """
+    Indicadores técnicos de ventana (todos menos el MACD): cada fila depende solo de las
+    FILAS_PREVIAS_TECNICAS filas anteriores.
+    """
+    cerrar = _as_float(cerrar, dtype)
+    dtype = cerrar.dtype
+    columnas = {"rsi": rsi(cerrar)}
+    (columnas["bb_middle"], columnas["bb_upper"], columnas["bb_lower"],
+     columnas["bb_width"], columnas["bb_position"]) = bollinger(cerrar)
+    columnas["stoch_k"], columnas["stoch_d"], columnas["williams_r"] = stochastic(
+        _as_float(maximo, dtype), _as_float(minimo, dtype), cerrar
+    )
+    columnas["volume_sma"], columnas["volume_ratio"] = volume_ratio(_as_float(volumen, dtype))
+    return columnas
+
+def _indicadores_pandas(df):
+    """
+    Implementación original con pandas (Enricher.calcular_kpi y
+    dashboard.calculate_technical_indicators); solo se usa como referencia en el benchmark.
+    """
+    df = df.copy()
+    # Enricher
+    tasa = df['cerrar'].pct_change().fillna(0) * 100
+    df['media_movil_7d'] = df['cerrar'].rolling(window=7, min_periods=1).mean()
+    df['volatilidad_7d'] = tasa.rolling(window=7, min_periods=1).std()
+    tr1 = df['max'] - df['min']
+    tr2 = (df['max'] - df['cerrar'].shift(1)).abs()
+    tr3 = (df['min'] - df['cerrar'].shift(1)).abs()
+    true_range_pd = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+    df['atr_14d'] = true_range_pd.rolling(window=14, min_periods=1).mean()
+
+    # Dashboard
+    delta = df['cerrar'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14, min_periods=1).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean()
+    rs = gain / loss.replace(0, np.inf)
+    df['rsi'] = 100 - (100 / (1 + rs))
+    exp1 = df['cerrar'].ewm(span=12, min_periods=1).mean()
+    exp2 = df['cerrar'].ewm(span=26, min_periods=1).mean()
+    df['macd'] = exp1 - exp2
+    df['macd_signal'] = df['macd'].ewm(span=9, min_periods=1).mean()
+    df['macd_histogram'] = df['macd'] - df['macd_signal']
+    df['bb_middle'] = df['cerrar'].rolling(window=20, min_periods=1).mean()
+    bb_std = df['cerrar'].rolling(window=20, min_periods=1).std()
+    df['bb_upper'] = df['bb_middle'] + (bb_std * 2)
+    df['bb_lower'] = df['bb_middle'] - (bb_std * 2)
+    df['bb_width'] = df['bb_upper'] - df['bb_lower']
+    bb_range = df['bb_upper'] - df['bb_lower']
+    df['bb_position'] = np.where(bb_range != 0, (df['cerrar'] - df['bb_lower']) / bb_range, 0.5)
+    low_min = df['min'].rolling(window=14, min_periods=1).min()
+    high_max = df['max'].rolling(window=14, min_periods=1).max()
+    stoch_range = high_max - low_min
+    df['stoch_k'] = np.where(stoch_range != 0, 100 * (df['cerrar'] - low_min) / stoch_range, 50)
+    df['stoch_d'] = df['stoch_k'].rolling(window=3, min_periods=1).mean()
+    df['williams_r'] = np.where(stoch_range != 0, -100 * (high_max - df['cerrar']) / stoch_range, -50)
+    df['volume_sma'] = df['volumen'].rolling(window=20, min_periods=1).mean()
+    df['volume_ratio'] = df['volumen'] / df['volume_sma'].replace(0, 1)
+    return df
+
+def _indicadores_numpy(df, dtype=None):
+    """Los mismos indicadores que _indicadores_pandas con los kernels de este módulo."""
+    cerrar = _as_float(df['cerrar'].to_numpy(), dtype)
+    maximo = _as_float(df['max'].to_numpy(), cerrar.dtype)
+    minimo = _as_float(df['min'].to_numpy(), cerrar.dtype)
+    tasa = np.zeros_like(cerrar)
+    np.divide(cerrar[1:], cerrar[:-1], out=tasa[1:])
+    tasa[1:] -= 1
+    tasa *= 100
+
+    columnas = {
+        "media_movil_7d": rolling_mean(cerrar, 7),
+        "volatilidad_7d": rolling_std(tasa, 7),
+        "atr_14d": rolling_mean(true_range(maximo, minimo, cerrar), 14)
+    }
+    columnas.update(technical_indicators(cerrar, maximo, minimo, df['volumen'].to_numpy(), dtype))
+    return columnas
+
+def run():
+    """
+    Benchmark de los kernels de indicadores frente a la implementación con pandas sobre
+    un histórico sintético: tiempo de cada versión y diferencia máxima por columna.
+    """
+    # Importamos aquí para no crear un ciclo con los módulos que usan estos kernels
+    from msft_analytics.sources import generate_ohlcv
+
+    parser = argparse.ArgumentParser(
+        description="Compara los kernels NumPy de indicadores con la versión en pandas"
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Número de barras (default: 1000000)")
+    parser.add_argument("--freq", default="1min", help="Frecuencia de las barras sintéticas (default: 1min)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones; se toma la mejor (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del generador (default: 0)")
+    args = parser.parse_args()
+
+    df = generate_ohlcv(args.rows, freq=args.freq, seed=args.seed)
+
+    def medir(funcion):
+        mejor = np.inf
+        for _ in range(args.repeat):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor, resultado
+
+    t_pandas, referencia = medir(lambda: _indicadores_pandas(df))
+    print(f"{len(df):,} barras")
+    print(f"pandas           {t_pandas * 1000:9.1f} ms")
+    for nombre, dtype in (("numpy float64", np.float64), ("numpy float32", np.float32)):
+        t_numpy, columnas = medir(lambda: _indicadores_numpy(df, dtype))
+        errores = {
+            col: np.nanmax(np.abs(valores - referencia[col].to_numpy())) for col, valores in columnas.items()
+        }
+        peor = max(errores, key=errores.get)
+        print(
+            f"{nombre:16} {t_numpy * 1000:9.1f} ms  x{t_pandas / t_numpy:5.1f}  "
+            f"dif. máx. {errores[peor]:.2e} ({peor})"
+        )
+
+if __name__ == "__main__":
+    run()
@@ -1,153 +1,572 @@
 import os
-import pickle
+import time
+import argparse
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense
-from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.callbacks import Callback, EarlyStopping
+from tensorflow.keras.utils import Sequence
 from msft_analytics.logger import get_logger
+from msft_analytics.forecast import forecast
+from msft_analytics.registry import ModelRegistry, data_fingerprint
+from msft_analytics.trading_calendar import CALENDARIO, CALENDARIOS, forecast_dates, prepare_series
+from msft_analytics import search
+from msft_analytics.storage import default_path, read_table
+
+# Fracción inicial de las muestras para entrenar; el resto es el conjunto de test
+FRACCION_ENTRENAMIENTO = 0.85
+# Fracción final del entrenamiento que se reserva para validación (EarlyStopping)
+FRACCION_VALIDACION = 0.1
+# Hiperparámetros por defecto: épocas máximas, unidades LSTM y tamaño de lote
+EPOCAS = 50
+UNIDADES = 50
+BATCH_SIZE = 16
+# Entrada del entrenamiento: "tf.data" (pipeline con ventanas al vuelo y prefetch) o
+# "sequence" (LotesVentanas)
+ENTRADA = "tf.data"
+# Afinado (warm start): días recientes (filas de la serie: sesiones con el calendario
+# "habiles"), épocas y RMSE máximo del afinado relativo al RMSE de referencia del último
+# entrenamiento completo, antes de considerar que el modelo se ha desviado
+DIAS_AFINADO = 365
+EPOCAS_AFINADO = 5
+UMBRAL_DERIVA = 1.5
+# Afinados encadenados desde el último entrenamiento completo antes de forzar otro
+AFINADOS_MAXIMOS = 20
+
+class LotesVentanas(Sequence):
+    """
+    Lotes (X, y) de ventanas deslizantes para model.fit / model.predict.
+    X e y son las vistas que devuelve Modeller.crear_secuencias: cada lote se copia solo
+    cuando Keras lo pide, así que la memoria no crece con la ventana ni con el histórico.
+    Con shuffle=True el orden de las muestras se baraja en cada época, como hace fit con
+    arrays.
+    """
+
+    def __init__(self, X, y, batch_size=16, shuffle=False, seed=None, **kwargs):
+        super().__init__(**kwargs)
+        self.X = X
+        self.y = y
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.indices = np.arange(len(X))
+        if shuffle:
+            self.rng.shuffle(self.indices)
+
+    def __len__(self):
+        return -(-len(self.indices) // self.batch_size)
+
+    def __getitem__(self, i):
+        lote = self.indices[i * self.batch_size:(i + 1) * self.batch_size]
+        return self.X[lote], self.y[lote]
+
+    def on_epoch_end(self):
+        if self.shuffle:
+            self.rng.shuffle(self.indices)
+
+class AbandonoTemprano(Callback):
+    """
+    Detiene un entrenamiento que va claramente peor que el mejor conocido: a partir de
+    `epocas_minimas`, si la pérdida de validación supera `factor` veces `mejor_val_loss`.
+    Guarda las pérdidas de validación de cada época.
+    """
+
+    def __init__(self, mejor_val_loss=None, factor=2.0, epocas_minimas=5):
+        super().__init__()
+        self.mejor_val_loss = mejor_val_loss
+        self.factor = factor
+        self.epocas_minimas = epocas_minimas
+        self.val_losses = []
+        self.abandonado = False
+
+    def on_epoch_end(self, epoca, logs=None):
+        self.val_losses.append(float((logs or {}).get('val_loss', np.inf)))
+        if (
+            self.mejor_val_loss is not None
+            and epoca + 1 >= self.epocas_minimas
+            and self.val_losses[-1] > self.factor * self.mejor_val_loss
+        ):
+            self.abandonado = True
+            self.model.stop_training = True
+
+class TiemposEpoca(Callback):
+    """Guarda la duración (segundos) de cada época."""
+
+    def __init__(self):
+        super().__init__()
+        self.tiempos = []
+
+    def on_epoch_begin(self, epoca, logs=None):
+        self._inicio = time.perf_counter()
+
+    def on_epoch_end(self, epoca, logs=None):
+        self.tiempos.append(time.perf_counter() - self._inicio)
 
 class Modeller:
     def __init__(self):
         self.logger = get_logger("msft_model")
         self.model_path = os.path.join(os.path.dirname(__file__), "static", "models")
-        self.model_file = os.path.join(self.model_path, "model.pkl")
+        # Registro versionado de modelos (ver registry.py)
+        self.registry = ModelRegistry(os.path.join(self.model_path, "registry"))
 
         if not os.path.exists(self.model_path):
             os.makedirs(self.model_path)
             self.logger.info("Directorio De Modelos Creado.")
 
-    def preparar_datos(self, df: pd.DataFrame):
+    def preparar_datos(self, df: pd.DataFrame, calendario=CALENDARIO):
+        """
+        Serie de cierres indexada por fecha según el calendario: "habiles" (sesiones de
+        bolsa) o "diario" (todos los días, interpolando fines de semana y festivos).
+        """
         df = df.copy()
         df['fecha'] = pd.to_datetime(df['fecha'])
         df.set_index('fecha', inplace=True)
-        df = df.asfreq('D')
-        df['cerrar'] = df['cerrar'].interpolate(method='time')
-        return df
-
-    def crear_secuencias(self, datos, ventana):
-        X, y = [], []
-        for i in range(len(datos) - ventana):
-            X.append(datos[i:i + ventana])
-            y.append(datos[i + ventana])
-        return np.array(X), np.array(y)
-
-    def entrenar(self, df: pd.DataFrame, pasos: int = 7, ventana=30):
+        return prepare_series(df, calendario)
+
+    def crear_secuencias(self, datos, ventana, horizonte=1):
+        """
+        Devolvemos X con forma (m, ventana, 1) e y con forma (m, horizonte), con
+        m = n - ventana - horizonte + 1, como vistas de `datos` (serie de forma (n, 1)), sin
+        copiar: la ventana i es datos[i:i + ventana] y sus objetivos, los `horizonte`
+        valores siguientes.
+        """
+        datos = np.asarray(datos).reshape(-1, 1)
+        muestras = len(datos) - ventana - horizonte + 1
+        if muestras <= 0:
+            return (
+                np.empty((0, ventana, 1), dtype=datos.dtype),
+                np.empty((0, horizonte), dtype=datos.dtype)
+            )
+        # sliding_window_view añade la ventana como último eje: (m, 1, ventana)
+        X = np.lib.stride_tricks.sliding_window_view(datos[:muestras + ventana - 1], ventana, axis=0)
+        y = np.lib.stride_tricks.sliding_window_view(datos[ventana:, 0], horizonte)
+        return X.transpose(0, 2, 1), y
+
+    def entrenar(self, df: pd.DataFrame, pasos: int = 7, ventana=30, horizonte=1,
+                 unidades=UNIDADES, batch_size=BATCH_SIZE, epocas=EPOCAS, entrada=ENTRADA,
+                 calendario=CALENDARIO):
+        """
+        Entrenamos el LSTM y lo registramos como una nueva versión (pesos Keras y NumPy,
+        escalador, ventana, métricas, calendario y huella de los datos), que pasa a ser la
+        actual.
+        horizonte: salidas de la capa final. Con 1 se predice el día siguiente y el
+        pronóstico es autorregresivo; con h > 1 el modelo predice directamente los h días
+        siguientes en una sola evaluación.
+        calendario: "habiles" (ventanas y pasos en sesiones de bolsa) o "diario".
+        """
         try:
-            self.logger.info("Iniciando Entrenamiento Del Modelo LSTM...")
-            df = self.preparar_datos(df)
+            self.logger.info(f"Iniciando Entrenamiento Del Modelo LSTM (Calendario {calendario})...")
+            df = self.preparar_datos(df, calendario)
             y = df['cerrar'].values.reshape(-1, 1)
 
             scaler = MinMaxScaler()
             y_scaled = scaler.fit_transform(y)
 
-            X, y_seq = self.crear_secuencias(y_scaled, ventana)
-            X = X.reshape((X.shape[0], X.shape[1], 1))
+            X, y_seq = self.crear_secuencias(y_scaled, ventana, horizonte)
 
-            train_size = int(len(X) * 0.85)
-            X_train, X_test = X[:train_size], X[train_size:]
-            y_train, y_test = y_seq[:train_size], y_seq[train_size:]
+            train_size = int(len(X) * FRACCION_ENTRENAMIENTO)
+            X_test, y_test = X[train_size:], y_seq[train_size:]
 
-            model = Sequential([
-                LSTM(50, activation='relu', input_shape=(ventana, 1)),
-                Dense(1)
-            ])
-            model.compile(optimizer='adam', loss='mse')
-            model.fit(
-                X_train, y_train,
-                epochs=50, batch_size=16,
-                validation_split=0.1,
-                callbacks=[EarlyStopping(patience=5)],
-                verbose=0
+            # Las muestras de entrenamiento usan la serie hasta el objetivo de la última
+            model = self.ajustar(
+                y_scaled[:train_size + ventana + horizonte - 1], ventana, horizonte,
+                epocas, unidades, batch_size, entrada=entrada
+            )
+            metricas = self.evaluar(model, scaler, X_test, y_test)
+            # Referencia de la deriva: el RMSE sobre el mismo tramo final que puntúa afinar()
+            tramo = min(tramo_afinado(DIAS_AFINADO), len(X_test))
+            referencia = self.evaluar(model, scaler, X_test[-tramo:], y_test[-tramo:])
+            version = self.registry.register(
+                model, scaler, ventana, metricas, data_fingerprint(df),
+                origen={
+                    'modo': 'completo', 'rmse_referencia': float(referencia['rmse']), 'afinados': 0,
+                    'unidades': unidades, 'batch_size': batch_size, 'epocas': epocas
+                },
+                calendario=calendario
             )
+            self.logger.info(f"Modelo Registrado Como Versión {version}")
+            return {**metricas, 'version': version, 'modo': 'completo'}
 
-            # Guardamos el modelo, scaler y ventana
-            with open(self.model_file, "wb") as f:
-                pickle.dump((model, scaler, ventana), f)
-
-            y_pred = model.predict(X_test)
-            y_test_inv = scaler.inverse_transform(y_test.reshape(-1, 1))
-            y_pred_inv = scaler.inverse_transform(y_pred)
-
-            rmse = np.sqrt(mean_squared_error(y_test_inv, y_pred_inv))
-            mae = mean_absolute_error(y_test_inv, y_pred_inv)
-            mape = np.mean(np.abs((y_test_inv - y_pred_inv) / y_test_inv)) * 100
-            r2 = r2_score(y_test_inv, y_pred_inv)
-
-            self.logger.info(f"RMSE: {rmse:.4f}")
-            self.logger.info(f"MAE: {mae:.4f}")
-            self.logger.info(f"MAPE: {mape:.2f}%")
-            self.logger.info(f"R²: {r2:.4f}")
-
-            return {
-                'rmse': rmse,
-                'mae': mae,
-                'mape': mape,
-                'r2': r2,
-                'r2_mayor_85': r2 > 0.85
+        except Exception as e:
+            self.logger.error(f"Error Al Entrenar El Modelo: {e}")
+            return None
+
+    def afinar(self, df: pd.DataFrame, pasos: int = 7, dias_recientes=DIAS_AFINADO,
+               epocas=EPOCAS_AFINADO, umbral_deriva=UMBRAL_DERIVA, calendario=CALENDARIO):
+        """
+        Afinamos (warm start) la versión actual del registro en lugar de entrenar desde cero:
+        partimos de sus pesos, su escalador y el estado de su optimizador y entrenamos unas
+        pocas épocas sobre los últimos `dias_recientes` días, que incluyen las observaciones
+        nuevas.
+        Para detectar la deriva, una copia afinada sin el tramo final de la ventana (como en
+        entrenar()) se puntúa sobre ese tramo y se compara con el RMSE de referencia del
+        último entrenamiento completo, medido sobre el mismo tramo de su test: la deriva
+        acumulada por los afinados encadenados no se pierde. Si el afinado supera
+        `umbral_deriva` veces esa referencia (o no hay modelo, referencia ni datos
+        suficientes, el modelo usa otro calendario o ya se encadenaron AFINADOS_MAXIMOS
+        afinados), se entrena desde cero con entrenar() y el `calendario` pedido. Si no, la
+        versión registrada se afina sobre toda la ventana, hasta la última fecha, y las
+        métricas de la copia se guardan como su validación (no son del modelo guardado).
+        """
+        try:
+            try:
+                base = self.registry.get()
+            except FileNotFoundError:
+                self.logger.info("Sin Modelo Registrado: Entrenamiento Completo")
+                return self.entrenar(df, pasos, calendario=calendario)
+
+            ventana, horizonte = base.ventana, base.horizonte
+            # Los reentrenamientos completos conservan los hiperparámetros de la versión base
+            hiperparametros = {
+                clave: base.origen[clave] for clave in ('unidades', 'batch_size') if clave in base.origen
             }
+            hiperparametros['calendario'] = calendario
+            if base.calendario != calendario:
+                self.logger.info(
+                    f"Versión {base.version} Con Calendario {base.calendario}, No {calendario}: "
+                    f"Entrenamiento Completo"
+                )
+                return self.entrenar(df, pasos, ventana, horizonte, **hiperparametros)
+            referencia = base.rmse_referencia
+            if referencia is None:
+                self.logger.info(f"Versión {base.version} Sin RMSE De Referencia: Entrenamiento Completo")
+                return self.entrenar(df, pasos, ventana, horizonte, **hiperparametros)
+            afinados = base.origen.get('afinados', 0) + 1
+            if afinados > AFINADOS_MAXIMOS:
+                self.logger.info(
+                    f"{AFINADOS_MAXIMOS} Afinados Desde El Último Entrenamiento Completo: Entrenamiento Completo"
+                )
+                return self.entrenar(df, pasos, ventana, horizonte, **hiperparametros)
+
+            self.logger.info(f"Afinando La Versión {base.version} ({dias_recientes} Días Recientes)...")
+            datos = self.preparar_datos(df, calendario)
+            recientes = datos['cerrar'].values[-(dias_recientes + ventana + horizonte - 1):]
+            scaler = base.scaler
+            escalada = scaler.transform(recientes.reshape(-1, 1))
+            X, y_seq = self.crear_secuencias(escalada, ventana, horizonte)
+
+            train_size = int(len(X) * FRACCION_ENTRENAMIENTO)
+            if train_size == 0 or train_size == len(X):
+                self.logger.info("Muy Pocos Datos Recientes Para Afinar: Entrenamiento Completo")
+                return self.entrenar(df, pasos, ventana, horizonte, **hiperparametros)
+            batch_size = hiperparametros.get('batch_size', BATCH_SIZE)
+
+            # Copia afinada sin el tramo final, puntuada sobre ese tramo
+            copia = self.registry.get(base.version).keras_model
+            copia.fit(
+                self.lotes(escalada, ventana, horizonte, 0, train_size, batch_size=batch_size, shuffle=True),
+                epochs=epocas,
+                verbose=0
+            )
+            validacion = self.evaluar(copia, scaler, X[train_size:], y_seq[train_size:])
+            if validacion['rmse'] > umbral_deriva * referencia:
+                self.logger.warning(
+                    f"Deriva Detectada: RMSE Afinado {validacion['rmse']:.4f} > {umbral_deriva} x "
+                    f"{referencia:.4f} (Referencia). Entrenamiento Completo"
+                )
+                return self.entrenar(df, pasos, ventana, horizonte, **hiperparametros)
+
+            # La versión registrada aprende también las sesiones más recientes
+            model = base.keras_model
+            model.fit(
+                self.lotes(escalada, ventana, horizonte, 0, len(X), batch_size=batch_size, shuffle=True),
+                epochs=epocas,
+                verbose=0
+            )
+            version = self.registry.register(
+                model, scaler, ventana, huella_datos=data_fingerprint(datos),
+                origen={
+                    'modo': 'afinado', 'base': base.version, 'rmse_referencia': referencia,
+                    'afinados': afinados,
+                    **{clave: valor for clave, valor in hiperparametros.items() if clave != 'calendario'}
+                },
+                calendario=calendario,
+                validacion=validacion
+            )
+            self.logger.info(f"Modelo Afinado Registrado Como Versión {version}")
+            return {**validacion, 'version': version, 'modo': 'afinado'}
 
         except Exception as e:
-            self.logger.error(f"Error Al Entrenar El Modelo: {e}")
+            self.logger.error(f"Error Al Afinar El Modelo: {e}")
             return None
 
+    def crear_dataset(self, serie, ventana, horizonte=1, inicio=0, fin=None,
+                      batch_size=BATCH_SIZE, shuffle=False, seed=None, cache=False):
+        """
+        Pipeline tf.data de las muestras [inicio, fin) de la serie escalada `serie`, con las
+        mismas ventanas y objetivos que crear_secuencias. El pipeline solo guarda la serie
+        (float32): baraja los índices de las muestras, los agrupa en lotes y construye cada
+        lote al vuelo con un gather, en paralelo y por delante del entrenamiento (prefetch).
+        cache: guarda los lotes ya construidos tras la primera época; solo tiene sentido sin
+        shuffle (p. ej. la validación), porque fijaría el orden de la primera época.
+        """
+        import tensorflow as tf
+
+        serie = tf.constant(np.asarray(serie, dtype=np.float32).reshape(-1))
+        muestras = int(serie.shape[0]) - ventana - horizonte + 1
+        fin = muestras if fin is None else min(fin, muestras)
+        desplazamientos_x = tf.range(ventana, dtype=tf.int64)
+        desplazamientos_y = tf.range(ventana, ventana + horizonte, dtype=tf.int64)
+
+        def ventanas(indices):
+            X = tf.gather(serie, indices[:, None] + desplazamientos_x)[..., None]
+            y = tf.gather(serie, indices[:, None] + desplazamientos_y)
+            return X, y
+
+        ds = tf.data.Dataset.range(inicio, fin)
+        if shuffle:
+            ds = ds.shuffle(max(fin - inicio, 1), seed=seed, reshuffle_each_iteration=True)
+        ds = ds.batch(batch_size).map(ventanas, num_parallel_calls=tf.data.AUTOTUNE)
+        if cache:
+            ds = ds.cache()
+        return ds.prefetch(tf.data.AUTOTUNE)
+
+    def lotes(self, serie, ventana, horizonte, inicio, fin, batch_size=BATCH_SIZE,
+              shuffle=False, entrada=ENTRADA):
+        """
+        Entrada de model.fit para las muestras [inicio, fin) de la serie escalada: el
+        pipeline tf.data (crear_dataset) o LotesVentanas sobre las vistas de
+        crear_secuencias.
+        """
+        if entrada == "tf.data":
+            return self.crear_dataset(
+                serie, ventana, horizonte, inicio, fin, batch_size, shuffle=shuffle, cache=not shuffle
+            )
+        if entrada != "sequence":
+            raise ValueError(f"Entrada desconocida: {entrada}")
+        X, y_seq = self.crear_secuencias(serie, ventana, horizonte)
+        return LotesVentanas(X[inicio:fin], y_seq[inicio:fin], batch_size=batch_size, shuffle=shuffle)
+
+    def ajustar(self, serie, ventana, horizonte=1, epocas=EPOCAS, unidades=UNIDADES,
+                batch_size=BATCH_SIZE, callbacks=None, entrada=ENTRADA):
+        """
+        Construimos el LSTM y lo entrenamos desde cero sobre todas las muestras de la serie
+        escalada `serie`; las últimas FRACCION_VALIDACION de ellas validan el EarlyStopping.
+        callbacks: callbacks de Keras adicionales (p. ej. AbandonoTemprano).
+        entrada: "tf.data" o "sequence" (ver lotes).
+        """
+        muestras = len(serie) - ventana - horizonte + 1
+        # Las muestras [0, fin_entrenamiento) entrenan y las últimas validan el EarlyStopping
+        fin_entrenamiento = int(muestras * (1 - FRACCION_VALIDACION))
+        model = Sequential([
+            LSTM(unidades, activation='relu', input_shape=(ventana, 1)),
+            Dense(horizonte)
+        ])
+        model.compile(optimizer='adam', loss='mse')
+        model.fit(
+            self.lotes(serie, ventana, horizonte, 0, fin_entrenamiento, batch_size, shuffle=True, entrada=entrada),
+            validation_data=self.lotes(serie, ventana, horizonte, fin_entrenamiento, muestras, entrada=entrada),
+            epochs=epocas,
+            callbacks=[EarlyStopping(patience=5), *(callbacks or [])],
+            verbose=0
+        )
+        return model
+
+    def evaluar(self, model, scaler, X_test, y_test):
+        """
+        Métricas de test en la escala original. Con cabeza multi-horizonte se evalúan
+        juntos todos los días predichos.
+        """
+        y_pred = model.predict(LotesVentanas(X_test, y_test, batch_size=256), verbose=0)
+        y_test_inv = scaler.inverse_transform(y_test.reshape(-1, 1))
+        y_pred_inv = scaler.inverse_transform(y_pred.reshape(-1, 1))
+
+        rmse = np.sqrt(mean_squared_error(y_test_inv, y_pred_inv))
+        mae = mean_absolute_error(y_test_inv, y_pred_inv)
+        mape = np.mean(np.abs((y_test_inv - y_pred_inv) / y_test_inv)) * 100
+        r2 = r2_score(y_test_inv, y_pred_inv)
+
+        self.logger.info(f"RMSE: {rmse:.4f}")
+        self.logger.info(f"MAE: {mae:.4f}")
+        self.logger.info(f"MAPE: {mape:.2f}%")
+        self.logger.info(f"R²: {r2:.4f}")
+
+        return {
+            'rmse': rmse,
+            'mae': mae,
+            'mape': mape,
+            'r2': r2,
+            'r2_mayor_85': r2 > 0.85
+        }
+
     def predecir(self, df: pd.DataFrame, pasos: int = 7):
         try:
             self.logger.info(f"Realizando Predicción A {pasos} Días...")
-            df = self.preparar_datos(df)
+            actual = self.registry.get()
+            model, scaler, ventana = actual.load("keras")
+            # La serie y las fechas futuras siguen el calendario con el que se entrenó
+            df = self.preparar_datos(df, actual.calendario)
             y = df['cerrar'].values.reshape(-1, 1)
 
-            with open(self.model_file, "rb") as f:
-                model, scaler, ventana = pickle.load(f)
-
             y_scaled = scaler.transform(y)
-            seq = y_scaled[-ventana:].reshape(1, ventana, 1)
-
-            preds_scaled = []
-            for _ in range(pasos):
-                p = model.predict(seq)[0][0]
-                preds_scaled.append(p)
-                seq = np.append(seq[:, 1:, :], [[[p]]], axis=1)
-
-            preds = scaler.inverse_transform(np.array(preds_scaled).reshape(-1, 1)).flatten()
-            fechas = pd.date_range(
-                start=df.index.max() + pd.Timedelta(days=1),
-                periods=pasos, freq='D'
-            )
+            preds_scaled = forecast(model, y_scaled, ventana, pasos)
+
+            preds = scaler.inverse_transform(preds_scaled.reshape(-1, 1)).flatten()
+            fechas = forecast_dates(df.index.max(), pasos, actual.calendario)
             return pd.DataFrame({'Fecha_Predicha': fechas, 'prediccion': preds})
 
         except Exception as e:
             self.logger.error(f"Error En Predicción: {e}")
             return pd.DataFrame()
 
+def tramo_afinado(dias_recientes=DIAS_AFINADO):
+    """Muestras del tramo final con el que afinar() valida la copia afinada."""
+    return dias_recientes - int(dias_recientes * FRACCION_ENTRENAMIENTO)
+
+def benchmark_entrada(filas=20_000, ventana=30, batch_sizes=(16, 64, 256), epocas=3,
+                      unidades=UNIDADES, seed=0):
+    """
+    Rendimiento del entrenamiento (muestras por segundo) con cada entrada ("sequence" y
+    "tf.data") y tamaño de lote, sobre una serie sintética de `filas` días. Se descarta
+    la primera época (compilación del grafo) y se toma la mediana del resto.
+    """
+    from msft_analytics.sources import generate_ohlcv
+
+    cerrar = generate_ohlcv(filas, seed=seed)['cerrar'].to_numpy(dtype=float)
+    serie = (cerrar - cerrar.min()) / (cerrar.max() - cerrar.min())
+    muestras = len(serie) - ventana
+    modeller = Modeller()
+
+    filas_resultado = []
+    for batch_size in batch_sizes:
+        for entrada in ("sequence", "tf.data"):
+            model = Sequential([
+                LSTM(unidades, activation='relu', input_shape=(ventana, 1)),
+                Dense(1)
+            ])
+            model.compile(optimizer='adam', loss='mse')
+            tiempos = TiemposEpoca()
+            model.fit(
+                modeller.lotes(serie, ventana, 1, 0, muestras, batch_size, shuffle=True, entrada=entrada),
+                epochs=max(epocas, 2),
+                callbacks=[tiempos],
+                verbose=0
+            )
+            filas_resultado.append({
+                'batch_size': batch_size,
+                'entrada': entrada,
+                'muestras_por_segundo': muestras / float(np.median(tiempos.tiempos[1:]))
+            })
+
+    resultado = pd.DataFrame(filas_resultado)
+    base = resultado[resultado['entrada'] == "sequence"].set_index('batch_size')['muestras_por_segundo']
+    resultado['mejora'] = resultado['muestras_por_segundo'] / resultado['batch_size'].map(base)
+    return resultado
+
 def run():
-    print("🔄 Cargando Datos Enriquecidos...")
-    enriched_csv = os.path.join(
-        os.path.dirname(__file__),
-        "static", "data", "historical_enriched.csv"
+    parser = argparse.ArgumentParser(
+        description="Entrena el modelo LSTM y pronostica los próximos días de cierre"
+    )
+    parser.add_argument("--pasos", type=int, default=7, help="Días a pronosticar (default: 7)")
+    parser.add_argument(
+        "--horizonte",
+        type=int,
+        default=1,
+        help="Salidas del modelo: 1 (autorregresivo) o h > 1 para predecir h días de una vez"
+    )
+    parser.add_argument("--ventana", type=int, default=30, help="Días de entrada del LSTM (default: 30)")
+    parser.add_argument("--unidades", type=int, default=UNIDADES, help=f"Unidades LSTM (default: {UNIDADES})")
+    parser.add_argument(
+        "--batch-size", type=int, default=BATCH_SIZE, help=f"Tamaño de lote (default: {BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--entrada", choices=["tf.data", "sequence"], default=ENTRADA,
+        help=f"Entrada del entrenamiento (default: {ENTRADA})"
+    )
+    parser.add_argument(
+        "--calendario", choices=CALENDARIOS, default=CALENDARIO,
+        help=f"Serie en sesiones de bolsa (habiles) o en días naturales interpolados (diario) (default: {CALENDARIO})"
+    )
+    parser.add_argument(
+        "--afinar",
+        action="store_true",
+        help="Afina la versión actual con los datos recientes en lugar de entrenar desde cero "
+             "(reentrena completo si detecta deriva)"
+    )
+    parser.add_argument(
+        "--dias-recientes", type=int, default=DIAS_AFINADO,
+        help=f"Días recientes para el afinado (default: {DIAS_AFINADO})"
     )
-    df = pd.read_csv(enriched_csv)
+    parser.add_argument(
+        "--epocas", type=int,
+        help=f"Épocas máximas (default: {EPOCAS} al entrenar, {EPOCAS_AFINADO} al afinar)"
+    )
+    parser.add_argument(
+        "--umbral-deriva", type=float, default=UMBRAL_DERIVA,
+        help=f"RMSE máximo del afinado relativo al de referencia del último entrenamiento completo (default: {UMBRAL_DERIVA})"
+    )
+    subcomandos = parser.add_subparsers(dest="comando")
+    search.add_arguments(subcomandos.add_parser(
+        "search",
+        help="Búsqueda de hiperparámetros (ventana, unidades, lote, épocas) en paralelo y reanudable"
+    ))
+    benchmark = subcomandos.add_parser(
+        "benchmark", help="Muestras por segundo del entrenamiento con cada entrada y tamaño de lote"
+    )
+    benchmark.add_argument("--filas", type=int, default=20_000, help="Días de la serie sintética (default: 20000)")
+    benchmark.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[16, 64, 256],
+        help="Tamaños de lote (default: 16 64 256)"
+    )
+    # dest propio: el valor por defecto no debe reemplazar el --epocas de msft-modeller
+    benchmark.add_argument(
+        "--epocas", type=int, default=3, dest="benchmark_epocas",
+        help="Épocas por medición; la primera se descarta (default: 3)"
+    )
+    args = parser.parse_args()
+
+    if args.comando == "benchmark":
+        resultado = benchmark_entrada(
+            args.filas, args.ventana, args.batch_sizes, args.benchmark_epocas, args.unidades
+        )
+        print(f"\n⏱️ Rendimiento Del Entrenamiento ({args.filas:,} Días, {os.cpu_count()} Núcleos):")
+        print(resultado.round(2).to_string(index=False))
+        return
+
+    print("🔄 Cargando Datos Enriquecidos...")
+    enriched_csv = os.getenv("MSFT_ENRICHED_CSV", default_path("historical_enriched"))
+    # Solo necesitamos la fecha y el cierre
+    df = read_table(enriched_csv, columns=["Fecha", "fecha", "cerrar"])
 
     if "Fecha" in df.columns:
         df.rename(columns={"Fecha": "fecha"}, inplace=True)
 
     model = Modeller()
-    metrics = model.entrenar(df, pasos=7)
+    if args.comando == "search":
+        search.run_search(args, model.preparar_datos(df, args.calendario))
+        return
+
+    if args.afinar:
+        metrics = model.afinar(
+            df, pasos=args.pasos, dias_recientes=args.dias_recientes,
+            epocas=args.epocas or EPOCAS_AFINADO, umbral_deriva=args.umbral_deriva,
+            calendario=args.calendario
+        )
+    else:
+        metrics = model.entrenar(
+            df, pasos=args.pasos, ventana=args.ventana, horizonte=args.horizonte,
+            unidades=args.unidades, batch_size=args.batch_size, epocas=args.epocas or EPOCAS,
+            entrada=args.entrada, calendario=args.calendario
+        )
 
     if metrics is not None:
         print("✅ Modelo entrenado.")
+        if metrics['modo'] == 'afinado':
+            print("Métricas De Validación Del Afinado (Copia Sin El Tramo Final):")
         print(f"RMSE: {metrics['rmse']:.4f}")
         print(f"MAE: {metrics['mae']:.4f}")
         print(f"MAPE: {metrics['mape']:.2f}%")
         print(f"R²: {metrics['r2']:.4f}")
         print(f"¿R² > 0.85?: {'Sí' if metrics['r2_mayor_85'] else 'No'}")
+        print(f"Versión Registrada: {metrics['version']} ({metrics['modo']})")
     else:
         print("❌ Error Durante El Entrenamiento.")
 
-    pred = model.predecir(df, pasos=7)
-    print("\n📈 Predicción Para Próximos 7 Días (Precio De Cierre):")
+    pred = model.predecir(df, pasos=args.pasos)
+    print(f"\n📈 Predicción Para Próximos {args.pasos} Días (Precio De Cierre):")
     print(pred)
 
 if __name__ == "__main__":
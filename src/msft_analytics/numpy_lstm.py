@@ -0,0 +1,164 @@
+import os
+import pickle
+import argparse
+import numpy as np
+
+# Versión del formato de pesos exportados (.npz)
+FORMATO_PESOS = "msft-lstm-v1"
+ACTIVACIONES = {
+    "relu": lambda x: np.maximum(x, 0.0),
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "linear": lambda x: x
+}
+
+class NumpyScaler:
+    """
+    Equivalente de MinMaxScaler ya ajustado (transform / inverse_transform) sin
+    importar scikit-learn. data_min_ y data_max_ son opcionales: solo se usan para
+    volver a registrar el escalador.
+    """
+
+    def __init__(self, min_, scale_, data_min_=None, data_max_=None):
+        self.min_ = np.asarray(min_, dtype=float)
+        self.scale_ = np.asarray(scale_, dtype=float)
+        self.data_min_ = None if data_min_ is None else np.asarray(data_min_, dtype=float)
+        self.data_max_ = None if data_max_ is None else np.asarray(data_max_, dtype=float)
+
+    def transform(self, X):
+        return np.asarray(X, dtype=float) * self.scale_ + self.min_
+
+    def inverse_transform(self, X):
+        return (np.asarray(X, dtype=float) - self.min_) / self.scale_
+
+class NumpyLSTM:
+    """
+    Inferencia con NumPy de la arquitectura que entrena Modeller.entrenar: una capa LSTM
+    (compuertas i, f, c, o como en Keras) y una Dense de salida. No importa TensorFlow.
+    """
+
+    def __init__(self, lstm_kernel, lstm_recurrent_kernel, lstm_bias, dense_kernel, dense_bias,
+                 activacion="relu", activacion_recurrente="sigmoid"):
+        for nombre in (activacion, activacion_recurrente):
+            if nombre not in ACTIVACIONES:
+                raise ValueError(f"Activación no soportada por NumpyLSTM: {nombre}")
+        self.lstm_kernel = np.asarray(lstm_kernel, dtype=float)
+        self.lstm_recurrent_kernel = np.asarray(lstm_recurrent_kernel, dtype=float)
+        self.lstm_bias = np.asarray(lstm_bias, dtype=float)
+        self.dense_kernel = np.asarray(dense_kernel, dtype=float)
+        self.dense_bias = np.asarray(dense_bias, dtype=float)
+        self.activacion = activacion
+        self.activacion_recurrente = activacion_recurrente
+        self.unidades = self.lstm_recurrent_kernel.shape[0]
+
+    @property
+    def output_shape(self):
+        return (None, self.dense_kernel.shape[1])
+
+    def predict(self, X, verbose=0, batch_size=None):
+        """
+        X: ventanas de forma (muestras, ventana, 1). Devolvemos (muestras, horizonte).
+        verbose y batch_size se aceptan como en Keras, pero todas las ventanas se procesan
+        a la vez.
+        """
+        X = np.asarray(X, dtype=float)
+        act = ACTIVACIONES[self.activacion]
+        act_rec = ACTIVACIONES[self.activacion_recurrente]
+        u = self.unidades
+
+        h = np.zeros((X.shape[0], u))
+        c = np.zeros((X.shape[0], u))
+        # Contribución de la entrada de todos los pasos de una vez
+        entradas = X @ self.lstm_kernel + self.lstm_bias
+        for t in range(X.shape[1]):
+            z = entradas[:, t] + h @ self.lstm_recurrent_kernel
+            i = act_rec(z[:, :u])
+            f = act_rec(z[:, u:2 * u])
+            g = act(z[:, 2 * u:3 * u])
+            o = act_rec(z[:, 3 * u:])
+            c = f * c + i * g
+            h = o * act(c)
+        return h @ self.dense_kernel + self.dense_bias
+
+    def rollout(self, inicial, pasos):
+        """
+        Pronóstico autorregresivo de `pasos` valores desde la ventana inicial escalada,
+        igual que forecast.compile_rollout pero en NumPy, sobre un buffer reservado.
+        """
+        ventana = len(inicial)
+        horizonte = self.dense_kernel.shape[1]
+        bloques = -(-pasos // horizonte)
+        buffer = np.empty(ventana + bloques * horizonte)
+        buffer[:ventana] = inicial
+        for bloque in range(bloques):
+            inicio = bloque * horizonte
+            seq = buffer[inicio:inicio + ventana].reshape(1, ventana, 1)
+            buffer[ventana + inicio:ventana + inicio + horizonte] = self.predict(seq)[0]
+        return buffer[ventana:ventana + pasos]
+
+def export_weights(model, scaler, ventana, ruta):
+    """
+    Exportamos un modelo Keras de Modeller.entrenar (LSTM + Dense) y su MinMaxScaler a un
+    .npz que NumpyLSTM puede cargar sin TensorFlow. La escritura es atómica.
+    """
+    capas = [capa for capa in model.layers if capa.get_weights()]
+    if len(capas) != 2 or len(capas[0].get_weights()) != 3 or len(capas[1].get_weights()) != 2:
+        raise ValueError("Solo se puede exportar la arquitectura LSTM + Dense de Modeller.entrenar")
+    lstm, dense = capas
+    kernel, recurrent_kernel, bias = lstm.get_weights()
+    dense_kernel, dense_bias = dense.get_weights()
+
+    temporal = f"{ruta}.tmp.npz"
+    np.savez(
+        temporal,
+        formato=FORMATO_PESOS,
+        ventana=int(ventana),
+        activacion=lstm.activation.__name__,
+        activacion_recurrente=lstm.recurrent_activation.__name__,
+        lstm_kernel=kernel,
+        lstm_recurrent_kernel=recurrent_kernel,
+        lstm_bias=bias,
+        dense_kernel=dense_kernel,
+        dense_bias=dense_bias,
+        scaler_min=scaler.min_,
+        scaler_scale=scaler.scale_
+    )
+    os.replace(temporal, ruta)
+
+def load_weights(ruta):
+    """
+    Cargamos un .npz exportado y devolvemos (NumpyLSTM, NumpyScaler, ventana), la misma
+    tupla que el model.pkl de Keras.
+    """
+    with np.load(ruta) as pesos:
+        if str(pesos["formato"]) != FORMATO_PESOS:
+            raise ValueError(f"Formato de pesos desconocido en {ruta}: {pesos['formato']}")
+        model = NumpyLSTM(
+            pesos["lstm_kernel"], pesos["lstm_recurrent_kernel"], pesos["lstm_bias"],
+            pesos["dense_kernel"], pesos["dense_bias"],
+            activacion=str(pesos["activacion"]),
+            activacion_recurrente=str(pesos["activacion_recurrente"])
+        )
+        scaler = NumpyScaler(pesos["scaler_min"], pesos["scaler_scale"])
+        ventana = int(pesos["ventana"])
+    return model, scaler, ventana
+
+def run():
+    """
+    Convertimos un model.pkl (model, scaler, ventana) de Keras al formato .npz de NumpyLSTM.
+    """
+    parser = argparse.ArgumentParser(
+        description="Exporta un model.pkl de Keras a pesos .npz para inferencia sin TensorFlow"
+    )
+    parser.add_argument("modelo", help="Ruta del model.pkl")
+    parser.add_argument("--out", help="Ruta del .npz (default: junto al .pkl, con extensión .npz)")
+    args = parser.parse_args()
+
+    with open(args.modelo, "rb") as f:
+        model, scaler, ventana = pickle.load(f)
+    salida = args.out or os.path.splitext(args.modelo)[0] + ".npz"
+    export_weights(model, scaler, ventana, salida)
+    print(f"✅ Pesos Exportados En {salida}")
+
+if __name__ == "__main__":
+    run()
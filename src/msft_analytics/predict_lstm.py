@@ -1,63 +1,78 @@
 import os
-import pickle
+import time
+import argparse
 import pandas as pd
 import numpy as np
 from msft_analytics.logger import get_logger
+from msft_analytics.forecast import forecast
+from msft_analytics.registry import REGISTRY_DIR, ModelRegistry
+from msft_analytics.storage import append_table, default_path, read_table, write_table
+from msft_analytics.trading_calendar import CALENDARIO, forecast_dates, prepare_series
 
 # Logger para inferencia LSTM
 default_logger = get_logger("msft_inference")
 
-# Ruta del modelo LSTM
-RUTA_MODEL = os.path.join("src", "msft_analytics", "static", "models", "model.pkl")
-# Ruta al CSV enriquecido
-CSV_PATH   = os.path.join("src", "msft_analytics", "static", "data", "historical_enriched.csv")
+# Registro versionado de modelos LSTM
+RUTA_REGISTRO = REGISTRY_DIR
+# Ruta al CSV enriquecido (o Parquet/Feather según MSFT_DATA_FORMAT)
+CSV_PATH   = os.getenv("MSFT_ENRICHED_CSV", default_path("historical_enriched"))
+# Predicciones históricas a un paso, alineadas con el enriquecido por 'Fecha'
+RUTA_HISTORICO = os.getenv("MSFT_PREDICTIONS", default_path("historical_predictions"))
+# Ventanas por llamada a predict al puntuar el histórico (acota la memoria: con NumpyLSTM
+# de 50 unidades y ventana 30, ~50 MB por bloque)
+TAMANO_BLOQUE = 1024
 
-def cargar_modelo_lstm(ruta_modelo=RUTA_MODEL, logger=default_logger):
-    """Cargamos la tupla (model, scaler, ventana) del LSTM entrenado."""
+def cargar_modelo_lstm(version=None, motor="numpy", ruta_registro=RUTA_REGISTRO,
+                       logger=default_logger):
+    """
+    Cargamos la tupla (model, scaler, ventana) de una versión del registro (la actual por
+    defecto). Con motor "numpy" solo se leen los pesos y no se importa TensorFlow; con
+    "keras" se reconstruye el modelo Keras.
+    """
     try:
-        logger.info(f"Cargando LSTM Desde: {ruta_modelo}")
-        with open(ruta_modelo, "rb") as f:
-            model, scaler, ventana = pickle.load(f)
+        entrada = ModelRegistry(ruta_registro).get(version)
+        logger.info(f"Cargando LSTM Versión {entrada.version} (Motor {motor})")
+        model, scaler, ventana = entrada.load(motor)
         logger.info(f"LSTM Cargado Correctamente (Ventana={ventana})")
         return model, scaler, ventana
     except Exception as e:
         logger.error(f"Error Cargando Modelo LSTM: {e}")
         raise
 
-def cargar_datos(ruta_csv=CSV_PATH, logger=default_logger):
-    """Leemos el CSV y devolvemos el DataFrame diario con columna 'cerrar'"""
+def cargar_datos(ruta_csv=CSV_PATH, calendario=CALENDARIO, logger=default_logger):
+    """
+    Leemos el CSV y devolvemos el DataFrame con columna 'cerrar' según el calendario:
+    sesiones de bolsa ("habiles") o todos los días interpolados ("diario").
+    """
     try:
         logger.info(f"Leyendo Datos Desde: {ruta_csv}")
-        df = pd.read_csv(ruta_csv)
+        # Solo necesitamos la fecha y el cierre
+        df = read_table(ruta_csv, columns=["Fecha", "fecha", "cerrar"])
         df['fecha'] = pd.to_datetime(df.get("Fecha", df.get("fecha")))
         df.set_index('fecha', inplace=True)
-        df = df.asfreq('D')
-        df['cerrar'] = df['cerrar'].interpolate(method='time')
+        df = prepare_series(df, calendario)
         logger.info("Datos Cargados Y Preprocesados Correctamente")
         return df
     except Exception as e:
         logger.error(f"Error leyendo o procesando CSV: {e}")
         raise
 
-def predecir_lstm(model, scaler, ventana, df, pasos=7, logger=default_logger):
-    """Generamos predicciones de los próximos `pasos` días sobre la columna 'cerrar'"""
+def predecir_lstm(model, scaler, ventana, df, pasos=7, calendario=CALENDARIO,
+                  logger=default_logger):
+    """
+    Generamos predicciones de los próximos `pasos` días sobre la columna 'cerrar', con
+    fechas del mismo `calendario` que la serie.
+    Con Keras todo el pronóstico autorregresivo se ejecuta en una sola llamada a un grafo
+    compilado; con NumpyLSTM, en NumPy.
+    """
     try:
         logger.info(f"Iniciando Predicción Para {pasos} Días")
         y = df['cerrar'].values.reshape(-1,1)
         y_scaled = scaler.transform(y)
-        seq = y_scaled[-ventana:].reshape(1, ventana, 1)
-
-        preds_scaled = []
-        for _ in range(pasos):
-            p = model.predict(seq)[0][0]
-            preds_scaled.append(p)
-            seq = np.append(seq[:,1:,:], [[[p]]], axis=1)
-
-        preds = scaler.inverse_transform(np.array(preds_scaled).reshape(-1,1)).flatten()
-        fechas = pd.date_range(
-            start=df.index.max() + pd.Timedelta(days=1),
-            periods=pasos, freq='D'
-        )
+        preds_scaled = forecast(model, y_scaled, ventana, pasos)
+
+        preds = scaler.inverse_transform(preds_scaled.reshape(-1,1)).flatten()
+        fechas = forecast_dates(df.index.max(), pasos, calendario)
         df_result = pd.DataFrame({'Fecha_Predicha': fechas, 'Prediccion_Cierre': preds})
         logger.info("Predicción Completada Correctamente")
         return df_result
@@ -65,11 +80,119 @@ def predecir_lstm(model, scaler, ventana, df, pasos=7, logger=default_logger):
         logger.error(f"Error Durante La Predicción: {e}")
         return pd.DataFrame()
 
+def puntuar_historico(model, scaler, ventana, df, desde=None, hasta=None, bloque=TAMANO_BLOQUE,
+                      version=None, logger=default_logger):
+    """
+    Predicción a un paso de cada día histórico de `df` (o de los días entre `desde` y
+    `hasta`) a partir de su ventana anterior, con llamadas a predict de `bloque` ventanas.
+    Las ventanas son vistas de la serie escalada y solo se copia un bloque cada vez, así
+    que la memoria no depende de la longitud del histórico. Con cabeza multi-horizonte se
+    toma la primera salida.
+    Devolvemos un DataFrame con 'Fecha' (como en el enriquecido), 'cerrar', 'prediccion',
+    'error' (cerrar - prediccion) y 'version'.
+    """
+    fechas = df.index
+    # La primera fecha puntuable es la que tiene una ventana completa detrás
+    inicio = max(ventana, 0 if desde is None else int(fechas.searchsorted(pd.Timestamp(desde))))
+    fin = len(df) if hasta is None else int(fechas.searchsorted(pd.Timestamp(hasta), side="right"))
+    fin = max(fin, inicio)
+    logger.info(f"Puntuando {fin - inicio} Días Históricos En Bloques De {bloque}")
+
+    escalada = scaler.transform(df['cerrar'].to_numpy(dtype=float).reshape(-1, 1)).ravel()
+    # Fila j: escalada[j:j + ventana], cuyo objetivo es el día j + ventana
+    ventanas = np.lib.stride_tricks.sliding_window_view(escalada, ventana)
+    preds = np.empty(fin - inicio)
+    for a in range(inicio, fin, bloque):
+        b = min(a + bloque, fin)
+        X = ventanas[a - ventana:b - ventana, :, None]
+        preds[a - inicio:b - inicio] = model.predict(X, verbose=0, batch_size=b - a)[:, 0]
+
+    preds = scaler.inverse_transform(preds.reshape(-1, 1)).ravel()
+    reales = df['cerrar'].to_numpy(dtype=float)[inicio:fin]
+    return pd.DataFrame({
+        'Fecha': fechas[inicio:fin].strftime("%Y-%m-%d"),
+        'cerrar': reales,
+        'prediccion': preds,
+        'error': reales - preds,
+        'version': version
+    })
+
+def actualizar_historico(model, scaler, ventana, df, version, ruta=RUTA_HISTORICO, desde=None,
+                         hasta=None, bloque=TAMANO_BLOQUE, completo=True, logger=default_logger):
+    """
+    Guardamos en `ruta` las predicciones históricas de la versión `version`; cada fila
+    conserva la versión que la puntuó. Sin rango, si el archivo ya existe solo se puntúan
+    y añaden los días posteriores a su última fecha, salvo que `version` venga de un
+    entrenamiento completo (`completo`) y el archivo no sea suyo: entonces se reescribe
+    todo con ella. Los afinados diarios solo añaden los días nuevos. Con `desde`/`hasta`
+    se reescribe el rango pedido.
+    Devolvemos las filas puntuadas en esta ejecución.
+    """
+    incremental = desde is None and hasta is None and os.path.exists(ruta)
+    if incremental:
+        previo = read_table(ruta, columns=["Fecha", "version"])
+        incremental = len(previo) > 0 and (not completo or str(previo['version'].iloc[-1]) == version)
+    if incremental:
+        ultima = pd.Timestamp(previo['Fecha'].iloc[-1])
+        nuevas = puntuar_historico(
+            model, scaler, ventana, df, desde=ultima + pd.Timedelta(days=1),
+            bloque=bloque, version=version, logger=logger
+        )
+        if len(nuevas):
+            append_table(nuevas, ruta, decimals=4)
+        logger.info(f"{len(nuevas)} Predicciones Históricas Añadidas A {ruta}")
+        return nuevas
+
+    resultado = puntuar_historico(model, scaler, ventana, df, desde, hasta, bloque, version, logger)
+    write_table(resultado, ruta, decimals=4)
+    logger.info(f"{len(resultado)} Predicciones Históricas Guardadas En {ruta}")
+    return resultado
+
 def run():
-    model, scaler, ventana = cargar_modelo_lstm()
-    df = cargar_datos()
-    df_pred = predecir_lstm(model, scaler, ventana, df, pasos=7)
-    print("\n📈 Predicción LSTM Próximos 7 Días (Precio De Cierre):")
+    parser = argparse.ArgumentParser(description="Pronostica el cierre de MSFT con el LSTM entrenado")
+    parser.add_argument("--pasos", type=int, default=7, help="Días a pronosticar (default: 7)")
+    parser.add_argument("--version", help="Versión del registro (default: la actual)")
+    parser.add_argument(
+        "--keras", action="store_true",
+        help="Usar el modelo Keras (importa TensorFlow) en lugar de los pesos NumPy"
+    )
+    parser.add_argument(
+        "--historico", action="store_true",
+        help="Puntúa los días históricos (predicción a un paso) y los guarda junto al enriquecido"
+    )
+    parser.add_argument("--desde", help="Con --historico: primera fecha a puntuar (default: toda la serie)")
+    parser.add_argument("--hasta", help="Con --historico: última fecha a puntuar (default: la última)")
+    parser.add_argument(
+        "--bloque", type=int, default=TAMANO_BLOQUE,
+        help=f"Con --historico: ventanas por llamada a predict (default: {TAMANO_BLOQUE})"
+    )
+    parser.add_argument(
+        "--out", default=RUTA_HISTORICO,
+        help="Con --historico: dataset de salida (default: static/data/historical_predictions)"
+    )
+    args = parser.parse_args()
+
+    model, scaler, ventana = cargar_modelo_lstm(args.version, "keras" if args.keras else "numpy")
+    # La serie y las fechas futuras siguen el calendario con el que se entrenó el modelo
+    entrada = ModelRegistry(RUTA_REGISTRO).get(args.version)
+    calendario = entrada.calendario
+    df = cargar_datos(calendario=calendario)
+
+    if args.historico:
+        inicio = time.perf_counter()
+        resultado = actualizar_historico(
+            model, scaler, ventana, df, entrada.version, args.out, args.desde, args.hasta, args.bloque,
+            completo=entrada.origen.get('modo') != 'afinado'
+        )
+        segundos = time.perf_counter() - inicio
+        print(f"\n📊 Predicciones Históricas ({len(resultado):,} Días En {segundos:.2f}s) En {args.out}")
+        if len(resultado):
+            rmse = float(np.sqrt(np.mean(resultado['error'] ** 2)))
+            print(f"RMSE: {rmse:.4f}  MAE: {resultado['error'].abs().mean():.4f}")
+        return
+
+    df_pred = predecir_lstm(model, scaler, ventana, df, pasos=args.pasos, calendario=calendario)
+    print(f"\n📈 Predicción LSTM Próximos {args.pasos} Días (Precio De Cierre):")
     print(df_pred)
 
 if __name__ == "__main__":
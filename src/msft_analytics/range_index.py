@@ -0,0 +1,166 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+# Columnas con medias y correlaciones por rango (las de "Análisis Detallado")
+COLUMNAS_ESTADISTICAS = ["cerrar", "volumen", "rsi", "macd", "volatilidad_7d"]
+# Columnas con mínimo y máximo por rango
+COLUMNAS_EXTREMOS = ["cerrar"]
+# Rangos más cortos que esto: correlación directa sobre sus filas (ver RangeStatsIndex.corr)
+FILAS_CALCULO_DIRECTO = 64
+
+class RangeStatsIndex:
+    """
+    Índice de estadísticas por rango de filas de una serie temporal, construido una vez
+    por versión de los datos:
+    - Sumas prefijas de cada columna y de los productos cruzados de cada par de columnas
+      (sumas de cuadrados en la diagonal): medias, varianzas y correlaciones de cualquier
+      rango en O(1). La matriz de productos es simétrica: solo guardamos su triángulo
+      superior, c·(c+1)/2 columnas en lugar de c². Las correlaciones de rangos cortos se
+      calculan sobre sus filas (O(FILAS_CALCULO_DIRECTO)).
+    - Tabla dispersa (sparse table) de mínimos y máximos: el extremo de cualquier rango en
+      O(1) con dos consultas que se solapan.
+    Las columnas se centran en su media global antes de acumular, para que las sumas de
+    cuadrados de valores grandes (p. ej. el volumen) no pierdan precisión. Los datos no
+    deben tener NaN.
+    """
+
+    def __init__(self, index, columnas, extremos=()):
+        """
+        index: DatetimeIndex ordenado. columnas: {nombre: array} con medias y
+        correlaciones. extremos: {nombre: array} con mínimo y máximo.
+        """
+        self.index = pd.DatetimeIndex(index)
+        self.columnas = list(columnas)
+        valores = np.column_stack([np.asarray(v, dtype=float) for v in columnas.values()])
+        self.centro = valores.mean(axis=0)
+        centrados = valores - self.centro
+        n, c = centrados.shape
+        self.centrados = centrados
+        self.sumas = np.zeros((n + 1, c))
+        np.cumsum(centrados, axis=0, out=self.sumas[1:])
+        self.triangulo = np.triu_indices(c)
+        filas, columnas_par = self.triangulo
+        self.productos = np.zeros((n + 1, len(filas)))
+        np.cumsum(centrados[:, filas] * centrados[:, columnas_par], axis=0, out=self.productos[1:])
+        self.extremos = {nombre: _sparse_tables(np.asarray(v, dtype=float)) for nombre, v in dict(extremos).items()}
+
+    @classmethod
+    def from_frame(cls, df, columnas=COLUMNAS_ESTADISTICAS, extremos=COLUMNAS_EXTREMOS):
+        """Índice de las `columnas` y `extremos` de `df` (índice de fechas)."""
+        return cls(
+            df.index,
+            {col: df[col].to_numpy() for col in columnas},
+            {col: df[col].to_numpy() for col in extremos}
+        )
+
+    def bounds(self, inicio=None, fin=None):
+        """Posiciones [a, b) de las filas entre las fechas `inicio` y `fin` (incluidas)."""
+        a = 0 if inicio is None else int(self.index.searchsorted(pd.Timestamp(inicio)))
+        b = len(self.index) if fin is None else int(self.index.searchsorted(pd.Timestamp(fin), side="right"))
+        return a, max(a, b)
+
+    def mean(self, columna, a, b):
+        """Media de `columna` en las filas [a, b)."""
+        j = self.columnas.index(columna)
+        return (self.sumas[b, j] - self.sumas[a, j]) / (b - a) + self.centro[j]
+
+    def min(self, columna, a, b):
+        """Mínimo de `columna` en las filas [a, b)."""
+        return self._extremo(self.extremos[columna][0], a, b, np.minimum)
+
+    def max(self, columna, a, b):
+        """Máximo de `columna` en las filas [a, b)."""
+        return self._extremo(self.extremos[columna][1], a, b, np.maximum)
+
+    def corr(self, a, b):
+        """
+        Matriz de correlación de Pearson de las columnas en las filas [a, b).
+        En rangos de menos de FILAS_CALCULO_DIRECTO filas la covarianza es pequeña frente a
+        las sumas acumuladas de toda la serie y restarlas pierde dígitos (~1e-6 con 2
+        filas): se calcula directamente sobre las filas del rango, centradas en su media.
+        """
+        n = b - a
+        if n < FILAS_CALCULO_DIRECTO:
+            tramo = self.centrados[a:b] - self.centrados[a:b].mean(axis=0)
+            cov = tramo.T @ tramo
+        else:
+            s = self.sumas[b] - self.sumas[a]
+            productos = np.empty((len(s), len(s)))
+            productos[self.triangulo] = self.productos[b] - self.productos[a]
+            productos.T[self.triangulo] = productos[self.triangulo]
+            cov = productos - np.outer(s, s) / n
+        desv = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = np.clip(cov / np.outer(desv, desv), -1.0, 1.0)
+        return pd.DataFrame(corr, index=self.columnas, columns=self.columnas)
+
+    @staticmethod
+    def _extremo(tabla, a, b, combinar):
+        k = int(b - a).bit_length() - 1
+        return float(combinar(tabla[k][a], tabla[k][b - (1 << k)]))
+
+def _sparse_tables(valores):
+    """
+    Tablas dispersas de mínimos y máximos: en el nivel k, la posición i guarda el extremo
+    de valores[i:i + 2^k]. Cada nivel se obtiene del anterior en O(n).
+    """
+    minimos, maximos = [valores], [valores]
+    salto = 1
+    while 2 * salto <= len(valores):
+        minimos.append(np.minimum(minimos[-1][:-salto], minimos[-1][salto:]))
+        maximos.append(np.maximum(maximos[-1][:-salto], maximos[-1][salto:]))
+        salto *= 2
+    return minimos, maximos
+
+def run():
+    """
+    Comparamos el índice con pandas (df.loc[...] + max/min/mean/corr) sobre una serie
+    sintética: tiempo de construcción, tiempo por consulta y diferencia máxima.
+    """
+    from msft_analytics.sources import generate_ohlcv
+
+    parser = argparse.ArgumentParser(description="Benchmark del índice de estadísticas por rango")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Filas de la serie sintética (default: 1000000)")
+    parser.add_argument("--consultas", type=int, default=200, help="Rangos aleatorios a consultar (default: 200)")
+    args = parser.parse_args()
+
+    df = generate_ohlcv(args.rows, freq="1min", seed=0)
+    df = df.set_index(pd.to_datetime(df["Fecha"]))
+    rng = np.random.default_rng(0)
+    # Columnas sustitutas con la misma escala que las del dashboard
+    df["rsi"] = rng.uniform(0, 100, args.rows)
+    df["macd"] = df["cerrar"].diff(12).fillna(0)
+    df["volatilidad_7d"] = df["cerrar"].pct_change().rolling(7, min_periods=1).std().fillna(0) * 100
+
+    inicio = time.perf_counter()
+    indice = RangeStatsIndex.from_frame(df)
+    print(f"🗂️ Índice Construido En {(time.perf_counter() - inicio) * 1000:.1f} ms ({args.rows:,} Filas)")
+
+    rangos = [sorted(rng.integers(0, args.rows, 2)) for _ in range(args.consultas)]
+    rangos = [(a, b + 1) for a, b in rangos if b > a]
+    t_indice = t_pandas = 0.0
+    diferencia = 0.0
+    for a, b in rangos:
+        inicio = time.perf_counter()
+        rapido = [indice.max("cerrar", a, b), indice.min("cerrar", a, b), indice.mean("cerrar", a, b),
+                  indice.mean("volumen", a, b), indice.corr(a, b).to_numpy()]
+        t_indice += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        tramo = df.loc[df.index[a]:df.index[b - 1]].copy()
+        lento = [tramo["cerrar"].max(), tramo["cerrar"].min(), tramo["cerrar"].mean(),
+                 tramo["volumen"].mean(), tramo[COLUMNAS_ESTADISTICAS].corr().to_numpy()]
+        t_pandas += time.perf_counter() - inicio
+
+        for x, y in zip(rapido, lento):
+            escala = np.maximum(np.abs(y), 1.0)
+            diferencia = max(diferencia, float(np.nanmax(np.abs(np.asarray(x) - y) / escala)))
+
+    print(f"Índice: {t_indice / len(rangos) * 1e6:,.0f} µs Por Consulta")
+    print(f"Pandas: {t_pandas / len(rangos) * 1e6:,.0f} µs Por Consulta")
+    print(f"Diferencia Relativa Máxima: {diferencia:.2e}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,316 @@
+import os
+import json
+import shutil
+import hashlib
+import argparse
+from datetime import datetime
+from functools import cached_property
+import numpy as np
+from msft_analytics.numpy_lstm import NumpyScaler, export_weights, load_weights
+
+# Directorio del registro de modelos: una subcarpeta por versión entrenada
+REGISTRY_DIR = os.path.join(os.path.dirname(__file__), "static", "models", "registry")
+# Archivo con la versión en producción ("actual")
+ARCHIVO_ACTUAL = "CURRENT"
+# Archivos de cada versión
+ARCHIVO_METADATOS = "metadata.json"
+ARCHIVO_PESOS = "weights.npz"
+ARCHIVO_KERAS = "model.keras"
+# Versiones que conserva prune() (siempre incluye la actual y la anterior)
+VERSIONES_CONSERVADAS = 3
+
+def data_fingerprint(df):
+    """
+    Huella de los datos de entrenamiento: filas, primera y última fecha y el SHA-256 de
+    la serie de cierres. Dos entrenamientos con la misma huella vieron los mismos datos.
+    """
+    cerrar = np.ascontiguousarray(df['cerrar'].to_numpy(dtype=float))
+    return {
+        'filas': int(len(df)),
+        'desde': str(df.index[0].date()) if len(df) else None,
+        'hasta': str(df.index[-1].date()) if len(df) else None,
+        'sha256': hashlib.sha256(cerrar.tobytes()).hexdigest()
+    }
+
+class ModelEntry:
+    """
+    Una versión del registro. Cada parte se carga solo cuando se pide: los metadatos
+    (ventana, escalador, métricas) son un JSON pequeño, los pesos NumPy no importan
+    TensorFlow y el modelo Keras solo se reconstruye si se necesita.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.version = os.path.basename(ruta)
+
+    @cached_property
+    def metadata(self):
+        with open(os.path.join(self.ruta, ARCHIVO_METADATOS), encoding="utf-8") as f:
+            return json.load(f)
+
+    @property
+    def ventana(self):
+        return self.metadata['ventana']
+
+    @property
+    def horizonte(self):
+        return self.metadata['horizonte']
+
+    @property
+    def calendario(self):
+        """Calendario de la serie con la que se entrenó ("diario" en versiones anteriores)."""
+        return self.metadata.get('calendario', "diario")
+
+    @property
+    def metricas(self):
+        return self.metadata.get('metricas')
+
+    @property
+    def metricas_validacion_afinado(self):
+        """
+        Versiones afinadas: métricas de la copia afinada sin el tramo final, puntuada sobre
+        ese tramo. No son las del modelo guardado, que se afinó también con ese tramo.
+        """
+        return self.metadata.get('metricas_validacion_afinado')
+
+    @property
+    def huella_datos(self):
+        return self.metadata.get('huella_datos')
+
+    @property
+    def origen(self):
+        """
+        Cómo se obtuvo: {'modo': 'completo' | 'afinado', 'base': ..., 'rmse_referencia': ...,
+        'afinados': ...}
+        """
+        return self.metadata.get('origen') or {}
+
+    @property
+    def rmse_referencia(self):
+        """
+        RMSE de referencia del último entrenamiento completo del que desciende esta versión,
+        sobre el tramo final de su test que puntúa el afinado.
+        """
+        return self.origen.get('rmse_referencia', (self.metricas or {}).get('rmse'))
+
+    @cached_property
+    def scaler(self):
+        escalador = self.metadata['escalador']
+        return NumpyScaler(
+            escalador['min_'], escalador['scale_'],
+            escalador.get('data_min_'), escalador.get('data_max_')
+        )
+
+    @cached_property
+    def numpy_model(self):
+        return load_weights(os.path.join(self.ruta, ARCHIVO_PESOS))[0]
+
+    @cached_property
+    def keras_model(self):
+        from tensorflow.keras.models import load_model
+        return load_model(os.path.join(self.ruta, ARCHIVO_KERAS))
+
+    def load(self, motor="numpy"):
+        """
+        Devolvemos la tupla (model, scaler, ventana) con el motor pedido:
+        "numpy" (NumpyLSTM, sin TensorFlow) o "keras".
+        """
+        if motor not in ("numpy", "keras"):
+            raise ValueError(f"Motor desconocido: {motor}")
+        model = self.numpy_model if motor == "numpy" else self.keras_model
+        return model, self.scaler, self.ventana
+
+class ModelRegistry:
+    """
+    Registro versionado de modelos LSTM. Cada entrenamiento crea una versión inmutable con
+    los pesos en formato nativo (Keras y NumPy), los parámetros del escalador, la
+    ventana, las métricas y la huella de los datos. La versión "actual" es un puntero
+    (archivo CURRENT) que se cambia de forma atómica, así que promover, volver atrás o
+    comparar versiones no requiere reentrenar.
+    """
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+
+    def versions(self):
+        """Versiones registradas, de la más antigua a la más reciente."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            nombre for nombre in os.listdir(self.root)
+            if not nombre.startswith(".")
+            and os.path.exists(os.path.join(self.root, nombre, ARCHIVO_METADATOS))
+        )
+
+    def current(self):
+        """Versión actual (None si el registro está vacío)."""
+        ruta = os.path.join(self.root, ARCHIVO_ACTUAL)
+        if not os.path.exists(ruta):
+            return None
+        with open(ruta, encoding="utf-8") as f:
+            return f.read().strip() or None
+
+    def get(self, version=None):
+        """Entrada de una versión (la actual por defecto), sin cargar nada todavía."""
+        version = version or self.current()
+        if version is None:
+            raise FileNotFoundError(f"No hay ningún modelo registrado en {self.root}")
+        ruta = os.path.join(self.root, version)
+        if not os.path.exists(os.path.join(ruta, ARCHIVO_METADATOS)):
+            raise FileNotFoundError(f"La versión {version} no existe en {self.root}")
+        return ModelEntry(ruta)
+
+    def register(self, model, scaler, ventana, metricas=None, huella_datos=None, origen=None,
+                 calendario="diario", promote=True, validacion=None):
+        """
+        Registramos un modelo Keras entrenado como una nueva versión y, si `promote`, la
+        convertimos en la actual. `origen` describe cómo se obtuvo (entrenamiento completo
+        o afinado a partir de otra versión) y `calendario`, la serie con la que se entrenó
+        ("habiles" o "diario"). `validacion`: métricas de validación de un afinado (ver
+        ModelEntry.metricas_validacion_afinado). La versión se escribe en una carpeta temporal
+        que se renombra al terminar: nunca queda una versión a medias. Devolvemos su nombre.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        version = self._nueva_version()
+        temporal = os.path.join(self.root, f".{version}.tmp")
+        os.makedirs(temporal)
+        try:
+            export_weights(model, scaler, ventana, os.path.join(temporal, ARCHIVO_PESOS))
+            model.save(os.path.join(temporal, ARCHIVO_KERAS))
+            metadatos = {
+                'version': version,
+                'creado': datetime.now().isoformat(timespec="seconds"),
+                'ventana': int(ventana),
+                'horizonte': int(model.output_shape[-1]),
+                'calendario': calendario,
+                'escalador': {
+                    'min_': scaler.min_.tolist(),
+                    'scale_': scaler.scale_.tolist(),
+                    'data_min_': _lista(scaler.data_min_),
+                    'data_max_': _lista(scaler.data_max_)
+                },
+                'metricas': _metricas_json(metricas),
+                'metricas_validacion_afinado': _metricas_json(validacion),
+                'huella_datos': huella_datos,
+                'origen': origen,
+                'archivos': {'pesos': ARCHIVO_PESOS, 'keras': ARCHIVO_KERAS}
+            }
+            with open(os.path.join(temporal, ARCHIVO_METADATOS), "w", encoding="utf-8") as f:
+                json.dump(metadatos, f, indent=2)
+            os.replace(temporal, os.path.join(self.root, version))
+        except Exception:
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+
+        if promote:
+            self.promote(version)
+        return version
+
+    def promote(self, version):
+        """Convertimos `version` en la actual (escritura atómica del puntero)."""
+        self.get(version)
+        ruta = os.path.join(self.root, ARCHIVO_ACTUAL)
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(version + "\n")
+        os.replace(temporal, ruta)
+
+    def rollback(self):
+        """Promovemos la versión anterior a la actual y la devolvemos."""
+        versiones = self.versions()
+        actual = self.current()
+        if actual not in versiones or versiones.index(actual) == 0:
+            raise ValueError("No hay una versión anterior a la actual")
+        anterior = versiones[versiones.index(actual) - 1]
+        self.promote(anterior)
+        return anterior
+
+    def prune(self, keep=VERSIONES_CONSERVADAS):
+        """
+        Borramos las versiones más antiguas y conservamos las `keep` más recientes. La actual
+        y la anterior a ella (la de rollback) nunca se borran. Devolvemos las borradas.
+        """
+        versiones = self.versions()
+        protegidas = set(versiones[-keep:]) if keep > 0 else set()
+        actual = self.current()
+        if actual in versiones:
+            protegidas.update(versiones[max(versiones.index(actual) - 1, 0):versiones.index(actual) + 1])
+        borradas = [version for version in versiones if version not in protegidas]
+        for version in borradas:
+            # Renombramos antes de borrar: nunca queda una versión a medias con metadatos
+            temporal = os.path.join(self.root, f".{version}.borrar")
+            os.replace(os.path.join(self.root, version), temporal)
+            shutil.rmtree(temporal)
+        return borradas
+
+    def _nueva_version(self):
+        base = datetime.now().strftime("%Y%m%d-%H%M%S")
+        version, n = base, 1
+        while os.path.exists(os.path.join(self.root, version)):
+            n += 1
+            version = f"{base}-{n}"
+        return version
+
+def _lista(valores):
+    return None if valores is None else np.asarray(valores).tolist()
+
+def _metricas_json(metricas):
+    """Convertimos las métricas (floats y bools de NumPy) a tipos de JSON."""
+    if metricas is None:
+        return None
+    return {
+        nombre: bool(valor) if isinstance(valor, (bool, np.bool_)) else float(valor)
+        for nombre, valor in metricas.items()
+    }
+
+def run():
+    parser = argparse.ArgumentParser(description="Gestiona el registro versionado de modelos LSTM")
+    parser.add_argument("--root", default=REGISTRY_DIR, help="Directorio del registro")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("list", help="Lista las versiones con sus métricas")
+    show = sub.add_parser("show", help="Muestra los metadatos de una versión")
+    show.add_argument("version", nargs="?", help="Versión (default: la actual)")
+    promote = sub.add_parser("promote", help="Convierte una versión en la actual")
+    promote.add_argument("version")
+    sub.add_parser("rollback", help="Vuelve a la versión anterior a la actual")
+    prune = sub.add_parser("prune", help="Borra las versiones antiguas (nunca la actual ni la anterior)")
+    prune.add_argument(
+        "--keep", type=int, default=VERSIONES_CONSERVADAS,
+        help=f"Versiones más recientes que se conservan (default: {VERSIONES_CONSERVADAS})"
+    )
+    importar = sub.add_parser("import", help="Registra un model.pkl (model, scaler, ventana) antiguo")
+    importar.add_argument("modelo", help="Ruta del model.pkl")
+    args = parser.parse_args()
+
+    registro = ModelRegistry(args.root)
+    if args.comando == "list":
+        actual = registro.current()
+        for version in registro.versions():
+            entrada = registro.get(version)
+            metricas = entrada.metricas or {}
+            validacion = entrada.metricas_validacion_afinado or {}
+            if 'rmse' in metricas:
+                rmse = f"RMSE={metricas['rmse']:.4f}"
+            elif 'rmse' in validacion:
+                rmse = f"RMSE validación afinado={validacion['rmse']:.4f}"
+            else:
+                rmse = "sin métricas"
+            print(f"{'*' if version == actual else ' '} {version}  {entrada.calendario:<8} {rmse}")
+    elif args.comando == "show":
+        print(json.dumps(registro.get(args.version).metadata, indent=2, ensure_ascii=False))
+    elif args.comando == "promote":
+        registro.promote(args.version)
+        print(f"✅ Versión Actual: {args.version}")
+    elif args.comando == "rollback":
+        print(f"✅ Versión Actual: {registro.rollback()}")
+    elif args.comando == "prune":
+        borradas = registro.prune(args.keep)
+        print(f"🧹 {len(borradas)} Versiones Borradas: {', '.join(borradas) or 'ninguna'}")
+    else:
+        import pickle
+        with open(args.modelo, "rb") as f:
+            model, scaler, ventana = pickle.load(f)
+        print(f"✅ Modelo Registrado Como {registro.register(model, scaler, ventana)}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import FIRST_COMPLETED, wait
+import numpy as np
+import pandas as pd
+from msft_analytics.logger import get_logger
+from msft_analytics.registry import data_fingerprint
+from msft_analytics.backtest import HILOS_POR_WORKER, default_workers, process_pool
+
+# Logger del modelado
+default_logger = get_logger("msft_model")
+
+# Pruebas completas: un JSON por huella de datos + hiperparámetros + ajustes del abandono
+SEARCH_DIR = os.path.join(os.path.dirname(__file__), "static", "models", "search")
+# Espacio de búsqueda por defecto
+VENTANAS = [20, 30, 60]
+UNIDADES = [32, 50, 64]
+BATCH_SIZES = [16, 32, 64]
+EPOCAS = [50]
+# Abandono temprano: una prueba se detiene si tras EPOCAS_MINIMAS épocas su pérdida de
+# validación supera FACTOR_ABANDONO veces la mejor de las pruebas ya terminadas
+FACTOR_ABANDONO = 2.0
+EPOCAS_MINIMAS = 5
+
+def search_space(ventanas=VENTANAS, unidades=UNIDADES, batch_sizes=BATCH_SIZES, epocas=EPOCAS,
+                 muestras=None, semilla=0):
+    """
+    Combinaciones de hiperparámetros a probar: la rejilla completa o, con `muestras`, un
+    subconjunto aleatorio (búsqueda aleatoria) reproducible con `semilla`.
+    """
+    rejilla = [
+        {'ventana': v, 'unidades': u, 'batch_size': b, 'epocas': e}
+        for v in ventanas for u in unidades for b in batch_sizes for e in epocas
+    ]
+    if muestras is not None and muestras < len(rejilla):
+        elegidas = np.random.default_rng(semilla).choice(len(rejilla), muestras, replace=False)
+        rejilla = [rejilla[i] for i in sorted(elegidas)]
+    return rejilla
+
+def trial_key(huella, parametros):
+    """Clave de una prueba: huella de los datos, hiperparámetros y ajustes del abandono."""
+    contenido = json.dumps({'huella': huella, 'parametros': parametros}, sort_keys=True)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:32]
+
+def hyperparameter_search(df, espacio, horizonte=1, workers=None, hilos=HILOS_POR_WORKER,
+                          semilla=0, factor_abandono=FACTOR_ABANDONO,
+                          epocas_minimas=EPOCAS_MINIMAS, ruta=SEARCH_DIR, logger=default_logger):
+    """
+    Probamos cada combinación de `espacio` sobre la serie diaria `df`: todas entrenan con
+    el mismo 85 % inicial (escalador incluido) y se evalúan en los mismos días del 15 %
+    final, así que sus métricas son comparables.
+    Las pruebas se ejecutan en un pool de procesos que ocupa todos los núcleos; cada una
+    recibe la mejor pérdida de validación conocida al lanzarse y se abandona si va
+    claramente peor. Cada prueba completa se guarda en `ruta` al terminar, así que una
+    búsqueda interrumpida continúa donde se quedó. Las abandonadas (dependen del orden en
+    que terminan las demás) y las fallidas no se guardan: se vuelven a evaluar.
+    Devolvemos un DataFrame con todas las pruebas, de mejor a peor RMSE de test.
+    """
+    serie = df['cerrar'].to_numpy(dtype=float)
+    huella = data_fingerprint(df)
+    os.makedirs(ruta, exist_ok=True)
+
+    resultados, pendientes = [], []
+    for parametros in espacio:
+        parametros = {
+            **parametros, 'horizonte': horizonte, 'semilla': semilla,
+            'factor_abandono': factor_abandono, 'epocas_minimas': epocas_minimas
+        }
+        ruta_prueba = os.path.join(ruta, f"{trial_key(huella, parametros)}.json")
+        if os.path.exists(ruta_prueba):
+            with open(ruta_prueba, encoding="utf-8") as f:
+                resultados.append({**json.load(f), 'cache': True})
+        else:
+            pendientes.append({**parametros, 'ruta': ruta_prueba})
+
+    logger.info(
+        f"Búsqueda: {len(espacio)} Pruebas, {len(resultados)} Ya Evaluadas, {len(pendientes)} Por Evaluar"
+    )
+    if pendientes:
+        workers = min(workers or default_workers(hilos), len(pendientes))
+        cola = iter(pendientes)
+        with process_pool(workers, hilos) as pool:
+            en_curso = {}
+
+            def lanzar():
+                prueba = next(cola, None)
+                if prueba is not None:
+                    futuro = pool.submit(_evaluar_prueba, {
+                        **prueba, 'serie': serie, 'mejor_val_loss': _mejor_val_loss(resultados)
+                    })
+                    en_curso[futuro] = prueba
+
+            # Lanzamos las pruebas de una en una para que cada una conozca el mejor
+            # resultado disponible en ese momento
+            for _ in range(workers):
+                lanzar()
+            while en_curso:
+                terminados, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    en_curso.pop(futuro)
+                    resultado = futuro.result()
+                    resultados.append({**resultado, 'cache': False})
+                    logger.info(f"Prueba {_describir(resultado)}")
+                    lanzar()
+
+    tabla = pd.DataFrame(resultados)
+    return tabla.sort_values(['rmse', 'val_loss'], na_position="last").reset_index(drop=True)
+
+def _mejor_val_loss(resultados):
+    completas = [r['val_loss'] for r in resultados if r['estado'] == "completa"]
+    return min(completas) if completas else None
+
+def _describir(resultado):
+    parametros = (
+        f"ventana={resultado['ventana']} unidades={resultado['unidades']} "
+        f"batch_size={resultado['batch_size']}"
+    )
+    if resultado['estado'] == "abandonada":
+        return f"{parametros}: Abandonada En La Época {resultado['epocas_entrenadas']}"
+    if resultado['estado'] == "fallida":
+        return f"{parametros}: Fallida Sin Épocas De Validación"
+    return f"{parametros}: RMSE {resultado['rmse']:.4f} En {resultado['segundos']:.1f}s"
+
+def _evaluar_prueba(prueba):
+    """
+    Entrenamos y evaluamos una combinación en un proceso del pool y, si se completa,
+    guardamos el resultado en cuanto termina. Sin ninguna época de validación (p. ej.
+    con 0 épocas) la prueba queda como fallida.
+    """
+    from sklearn.preprocessing import MinMaxScaler
+    from tensorflow.keras.utils import set_random_seed
+    from msft_analytics.modeller import FRACCION_ENTRENAMIENTO, AbandonoTemprano, Modeller
+
+    inicio_reloj = time.perf_counter()
+    set_random_seed(prueba['semilla'])
+    modeller = Modeller()
+    ventana, horizonte = prueba['ventana'], prueba['horizonte']
+    serie = prueba['serie'].reshape(-1, 1)
+
+    # El mismo corte para todas las pruebas: los días de test no dependen de la ventana
+    corte = int(len(serie) * FRACCION_ENTRENAMIENTO)
+    scaler = MinMaxScaler().fit(serie[:corte])
+    escalada = scaler.transform(serie)
+    X_test, y_test = modeller.crear_secuencias(escalada[corte - ventana:], ventana, horizonte)
+
+    abandono = AbandonoTemprano(prueba['mejor_val_loss'], prueba['factor_abandono'], prueba['epocas_minimas'])
+    model = modeller.ajustar(
+        escalada[:corte], ventana, horizonte, prueba['epocas'], prueba['unidades'],
+        prueba['batch_size'], callbacks=[abandono]
+    )
+
+    resultado = {
+        clave: prueba[clave]
+        for clave in ('ventana', 'unidades', 'batch_size', 'epocas', 'horizonte', 'semilla')
+    }
+    if not abandono.val_losses:
+        estado = "fallida"
+    else:
+        estado = "abandonada" if abandono.abandonado else "completa"
+    resultado.update({
+        'estado': estado,
+        'epocas_entrenadas': len(abandono.val_losses),
+        'val_loss': min(abandono.val_losses) if abandono.val_losses else None,
+        'rmse': None, 'mae': None, 'mape': None, 'r2': None
+    })
+    if estado == "completa":
+        metricas = modeller.evaluar(model, scaler, X_test, y_test)
+        resultado.update({nombre: float(metricas[nombre]) for nombre in ('rmse', 'mae', 'mape', 'r2')})
+    resultado['segundos'] = time.perf_counter() - inicio_reloj
+    if estado != "completa":
+        return resultado
+
+    temporal = f"{prueba['ruta']}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2)
+    os.replace(temporal, prueba['ruta'])
+    return resultado
+
+def add_arguments(parser):
+    """
+    Opciones del subcomando `msft-modeller search`. Las que también existen en
+    `msft-modeller` (--unidades, --epocas) usan otro `dest`: si no, el valor por defecto
+    del subcomando reemplazaría en silencio el dado antes de `search`.
+    """
+    parser.add_argument("--ventanas", type=int, nargs="+", default=VENTANAS, help=f"Ventanas a probar (default: {VENTANAS})")
+    parser.add_argument(
+        "--unidades", type=int, nargs="+", default=UNIDADES, dest="busqueda_unidades",
+        help=f"Unidades LSTM (default: {UNIDADES})"
+    )
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=BATCH_SIZES,
+        help=f"Tamaños de lote (default: {BATCH_SIZES})"
+    )
+    parser.add_argument(
+        "--epocas", type=int, nargs="+", default=EPOCAS, dest="busqueda_epocas",
+        help=f"Épocas máximas (default: {EPOCAS})"
+    )
+    parser.add_argument(
+        "--muestras", type=int,
+        help="Prueba solo N combinaciones aleatorias de la rejilla (default: todas)"
+    )
+    parser.add_argument("--workers", type=int, help="Procesos en paralelo (default: núcleos / --hilos)")
+    parser.add_argument(
+        "--hilos", type=int, default=HILOS_POR_WORKER,
+        help=f"Hilos de TensorFlow por proceso (default: {HILOS_POR_WORKER})"
+    )
+    parser.add_argument("--semilla", type=int, default=0, help="Semilla de las pruebas (default: 0)")
+    parser.add_argument(
+        "--factor-abandono", type=float, default=FACTOR_ABANDONO,
+        help=f"Abandona una prueba si su pérdida de validación supera N veces la mejor (default: {FACTOR_ABANDONO})"
+    )
+    parser.add_argument(
+        "--epocas-minimas", type=int, default=EPOCAS_MINIMAS,
+        help=f"Épocas antes de poder abandonar una prueba (default: {EPOCAS_MINIMAS})"
+    )
+
+def run_search(args, df):
+    """Ejecutamos `msft-modeller search` sobre la serie diaria ya preparada (Modeller.preparar_datos)."""
+    espacio = search_space(
+        args.ventanas, args.busqueda_unidades, args.batch_sizes, args.busqueda_epocas, args.muestras, args.semilla
+    )
+    tabla = hyperparameter_search(
+        df, espacio, horizonte=args.horizonte, workers=args.workers, hilos=args.hilos,
+        semilla=args.semilla, factor_abandono=args.factor_abandono,
+        epocas_minimas=args.epocas_minimas
+    )
+
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print("\n🔎 Pruebas (De Mejor A Peor RMSE De Test):")
+        print(tabla.drop(columns=["horizonte", "semilla"]).round(4).to_string(index=False))
+    completas = tabla[tabla['estado'] == "completa"]
+    if len(completas):
+        mejor = completas.iloc[0]
+        print(
+            f"\n🏆 Mejor: msft-modeller --ventana {mejor['ventana']} --unidades {mejor['unidades']} "
+            f"--batch-size {mejor['batch_size']} --epocas {mejor['epocas']}"
+        )
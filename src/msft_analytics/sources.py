@@ -0,0 +1,286 @@
+import zlib
+import sqlite3
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from msft_analytics.storage import read_table, write_table
+
+# Columnas que devuelve cualquier fuente de datos
+COLUMNAS_OHLCV = ["Fecha", "abrir", "max", "min", "cerrar", "volumen"]
+# Origen fijo de las series sintéticas (primera sesión de MSFT)
+FECHA_ORIGEN_SINTETICA = "1986-03-13"
+# Sesión bursátil usada para las barras intradía
+APERTURA_SESION = pd.Timedelta(hours=9, minutes=30)
+MINUTOS_SESION = 390
+# Sesiones por bloque de SyntheticSource: la unidad mínima que se genera en cada descarga
+SESIONES_BLOQUE_SINTETICO = 256
+
+class DataSource:
+    """
+    Interfaz de las fuentes de datos de mercado que usa MSFTCollector.
+    `download` devuelve un DataFrame con las columnas Fecha (datetime.date), abrir, max,
+    min, cerrar y volumen para `symbol` entre `start` (incluido) y `end` (excluido),
+    ambos en formato YYYY-MM-DD. Si no hay datos devuelve un DataFrame vacío.
+    Las implementaciones deben poder llamarse desde varios hilos a la vez.
+    """
+    name = "base"
+
+    def download(self, symbol, start, end):
+        raise NotImplementedError
+
+class YahooSource(DataSource):
+    """
+    Descargamos desde Yahoo Finanzas con `Ticker.history`, que a diferencia de
+    `yf.download` no comparte estado global entre llamadas concurrentes.
+    """
+    name = "yahoo"
+
+    def download(self, symbol, start, end):
+        # Importamos aquí para que las fuentes locales funcionen sin yfinance instalado
+        import yfinance as yf
+
+        df = yf.Ticker(symbol).history(start=start, end=end, auto_adjust=False)
+        if df.empty:
+            return pd.DataFrame(columns=COLUMNAS_OHLCV)
+
+        df = df.reset_index().rename(columns={
+            "Date": "Fecha", "Open": "abrir", "High": "max",
+            "Low": "min", "Close": "cerrar", "Volume": "volumen"
+        })
+        df["Fecha"] = pd.to_datetime(df["Fecha"]).dt.date
+        return df[COLUMNAS_OHLCV]
+
+class ReplaySource(DataSource):
+    """
+    Reproducimos un histórico local: un CSV/Parquet/Feather con el formato de historical.csv
+    (año, mes, día, ...; opcionalmente Fecha y simbolo) o una copia de historical.db.
+    Si el archivo no distingue símbolos, se devuelve la misma serie para cualquiera.
+    """
+    name = "replay"
+
+    def __init__(self, path):
+        self.path = path
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def download(self, symbol, start, end):
+        df = self._load(symbol)
+        fechas = pd.to_datetime(df["Fecha"])
+        mascara = (fechas >= pd.Timestamp(start)) & (fechas < pd.Timestamp(end))
+        return df.loc[mascara, COLUMNAS_OHLCV].reset_index(drop=True)
+
+    def _load(self, symbol):
+        with self._lock:
+            if symbol not in self._cache:
+                self._cache[symbol] = self._read(symbol)
+            return self._cache[symbol]
+
+    def _read(self, symbol):
+        if self.path.endswith((".db", ".sqlite", ".sqlite3")):
+            conn = sqlite3.connect(self.path)
+            try:
+                columnas = [fila[1] for fila in conn.execute("PRAGMA table_info(msft_data)")]
+                if "simbolo" in columnas:
+                    df = pd.read_sql(
+                        "SELECT * FROM msft_data WHERE simbolo = ?", conn, params=(symbol,)
+                    )
+                else:
+                    df = pd.read_sql("SELECT * FROM msft_data", conn)
+            finally:
+                conn.close()
+        else:
+            df = read_table(self.path)
+            if "simbolo" in df.columns:
+                df = df[df["simbolo"] == symbol]
+
+        if "Fecha" not in df.columns:
+            df["Fecha"] = pd.to_datetime(
+                df[["año", "mes", "día"]].rename(columns={"año": "year", "mes": "month", "día": "day"})
+            )
+        df["Fecha"] = pd.to_datetime(df["Fecha"]).dt.date
+        return df.sort_values("Fecha").reset_index(drop=True)
+
+class SyntheticSource(DataSource):
+    """
+    Generamos barras diarias OHLCV sintéticas y reproducibles (movimiento browniano
+    geométrico) a partir de una semilla. Cada símbolo tiene su propia serie, que siempre
+    parte del mismo origen, así que rangos distintos devuelven valores coherentes entre sí.
+    Solo se genera el rango pedido: la serie se divide en bloques de
+    SESIONES_BLOQUE_SINTETICO sesiones, cada uno con su propia semilla. El retorno total de
+    cada bloque sale de una secuencia aparte (un número por bloque) y los retornos diarios
+    del bloque se condicionan a ese total (puente browniano), así que el nivel de precio al
+    empezar un bloque se obtiene sin generar los días anteriores.
+    """
+    name = "synthetic"
+
+    def __init__(self, seed=0, price=100.0, drift=0.0003, volatility=0.02):
+        self.seed = seed
+        self.price = price
+        self.drift = drift
+        self.volatility = volatility
+
+    def download(self, symbol, start, end):
+        origen = pd.Timestamp(FECHA_ORIGEN_SINTETICA)
+        inicio = max(pd.Timestamp(start), origen)
+        # Posiciones [a, b) de las sesiones pedidas contando desde el origen
+        a = int(np.busday_count(origen.date(), inicio.date()))
+        b = int(np.busday_count(origen.date(), pd.Timestamp(end).date()))
+        if b <= a:
+            return pd.DataFrame(columns=COLUMNAS_OHLCV)
+
+        semilla = (self.seed, zlib.crc32(symbol.encode("utf-8")))
+        primero, ultimo = a // SESIONES_BLOQUE_SINTETICO, (b - 1) // SESIONES_BLOQUE_SINTETICO
+        # Retorno logarítmico total de cada bloque y nivel (log) al empezar cada uno
+        totales = np.random.default_rng(semilla).normal(
+            self.drift * SESIONES_BLOQUE_SINTETICO,
+            self.volatility * np.sqrt(SESIONES_BLOQUE_SINTETICO),
+            ultimo + 1
+        )
+        niveles = np.log(self.price) + np.concatenate([[0.0], np.cumsum(totales)])
+
+        df = pd.concat(
+            [self._bloque(semilla, k, niveles[k], totales[k]) for k in range(primero, ultimo + 1)],
+            ignore_index=True
+        )
+        desfase = primero * SESIONES_BLOQUE_SINTETICO
+        df = df.iloc[a - desfase:b - desfase].reset_index(drop=True)
+        df["Fecha"] = df["Fecha"].dt.date
+        return df
+
+    def _bloque(self, semilla, k, nivel, total):
+        """
+        Barras del bloque `k`: retornos diarios con media `total` / sesiones y suma exacta
+        `total` (restar la media de normales i.i.d. da su distribución condicionada a la
+        suma), partiendo del nivel logarítmico `nivel`.
+        """
+        rng = np.random.default_rng((*semilla, k))
+        retornos = rng.normal(0.0, self.volatility, SESIONES_BLOQUE_SINTETICO)
+        retornos += total / SESIONES_BLOQUE_SINTETICO - retornos.mean()
+        cerrar = np.exp(nivel + np.cumsum(retornos))
+        fechas = pd.DatetimeIndex(np.busday_offset(
+            np.datetime64(FECHA_ORIGEN_SINTETICA, "D"),
+            np.arange(k * SESIONES_BLOQUE_SINTETICO, (k + 1) * SESIONES_BLOQUE_SINTETICO)
+        ))
+        return _ohlcv(fechas, cerrar, np.exp(nivel), rng, self.volatility, 1)
+
+def generate_ohlcv(rows, freq="B", seed=0, start=FECHA_ORIGEN_SINTETICA, price=100.0,
+                   drift=0.0003, volatility=0.02):
+    """
+    Generamos `rows` barras OHLCV con semilla fija.
+    freq: "B" para barras diarias (días hábiles) o una frecuencia intradía de pandas
+    ("1min", "5min", "1h", ...) para barras dentro de la sesión 09:30-16:00.
+    drift / volatility: media y desviación del retorno logarítmico diario; en intradía
+    se escalan al tamaño de la barra.
+    """
+    if rows <= 0:
+        return pd.DataFrame(columns=COLUMNAS_OHLCV)
+
+    fechas, barras_dia = _generate_dates(rows, freq, start)
+    rng = np.random.default_rng(seed)
+
+    drift_barra = drift / barras_dia
+    vol_barra = volatility / np.sqrt(barras_dia)
+
+    cerrar = rng.normal(drift_barra, vol_barra, rows)
+    np.cumsum(cerrar, out=cerrar)
+    np.exp(cerrar, out=cerrar)
+    cerrar *= price
+    return _ohlcv(fechas, cerrar, price, rng, vol_barra, barras_dia)
+
+def _ohlcv(fechas, cerrar, cierre_previo, rng, vol_barra, barras_dia):
+    """
+    Completamos las barras a partir de los cierres: apertura cerca del cierre anterior
+    (`cierre_previo` para la primera), máximo y mínimo alrededor del cuerpo y volumen.
+    """
+    rows = len(cerrar)
+    abrir = np.empty(rows)
+    abrir[0] = cierre_previo
+    abrir[1:] = cerrar[:-1]
+    abrir *= np.exp(rng.normal(0.0, vol_barra / 4, rows))
+
+    # El rango de la barra se reparte por encima y por debajo del cuerpo
+    rango = np.abs(rng.normal(0.0, vol_barra, rows)) * cerrar
+    maximo = np.maximum(abrir, cerrar) + rango * rng.random(rows)
+    minimo = np.minimum(abrir, cerrar) - rango * rng.random(rows)
+    np.maximum(minimo, 0.01, out=minimo)
+
+    volumen = rng.lognormal(np.log(2e7 / barras_dia), 0.5, rows).astype(np.int64)
+
+    return pd.DataFrame({
+        "Fecha": fechas,
+        "abrir": abrir,
+        "max": maximo,
+        "min": minimo,
+        "cerrar": cerrar,
+        "volumen": volumen
+    })
+
+def _generate_dates(rows, freq, start):
+    """
+    Devolvemos las marcas de tiempo de `rows` barras y cuántas barras hay por sesión.
+    """
+    inicio = pd.Timestamp(start).normalize()
+    if freq.upper() in ("B", "D"):
+        paso, barras_dia = None, 1
+    else:
+        paso = pd.Timedelta(freq)
+        barras_dia = max(1, int(pd.Timedelta(minutes=MINUTOS_SESION) / paso))
+    sesiones = -(-rows // barras_dia)
+
+    # Cada 5 sesiones hábiles ocupan 7 días naturales
+    if sesiones * 7 // 5 + 7 > (pd.Timestamp.max - inicio).days:
+        raise ValueError(
+            f"{rows} barras con frecuencia {freq} desde {start} exceden el rango de fechas "
+            f"de pandas; usa una frecuencia intradía o menos barras."
+        )
+
+    dias = pd.bdate_range(inicio, periods=sesiones)
+    if paso is None:
+        return dias, 1
+
+    desfases = APERTURA_SESION + paso * np.arange(barras_dia)
+    fechas = dias.repeat(barras_dia) + np.tile(desfases, len(dias))
+    return fechas[:rows], barras_dia
+
+def make_source(name, path=None, seed=0):
+    """
+    Creamos una fuente por nombre: yahoo, replay (requiere `path`) o synthetic.
+    """
+    if name == "yahoo":
+        return YahooSource()
+    if name == "replay":
+        if not path:
+            raise ValueError("La fuente replay necesita la ruta de un CSV o SQLite local.")
+        return ReplaySource(path)
+    if name == "synthetic":
+        return SyntheticSource(seed=seed)
+    raise ValueError(f"Fuente de datos desconocida: {name}")
+
+def run():
+    """
+    Generamos un histórico sintético con el formato de historical.csv para pruebas de
+    carga del pipeline sin red. En intradía se añade la columna Fecha con la hora.
+    """
+    parser = argparse.ArgumentParser(
+        description="Genera un histórico OHLCV sintético con el formato de historical.csv"
+    )
+    parser.add_argument("--rows", type=int, default=10_000, help="Número de barras (default: 10000)")
+    parser.add_argument("--freq", default="B", help="B (diario) o frecuencia intradía: 1min, 5min, 1h...")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del generador (default: 0)")
+    parser.add_argument("--start", default=FECHA_ORIGEN_SINTETICA, help="Fecha de la primera barra")
+    parser.add_argument("--out", required=True, help="Ruta de salida (CSV, Parquet o Feather según la extensión)")
+    args = parser.parse_args()
+
+    df = generate_ohlcv(args.rows, freq=args.freq, seed=args.seed, start=args.start)
+    df.insert(0, "día", df["Fecha"].dt.day)
+    df.insert(0, "mes", df["Fecha"].dt.month)
+    df.insert(0, "año", df["Fecha"].dt.year)
+    if args.freq.upper() in ("B", "D"):
+        df = df.drop(columns="Fecha")
+
+    write_table(df, args.out, decimals=4)
+    print(f"✅ {len(df):,} Barras Sintéticas Guardadas En {args.out}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,270 @@
+import io
+import os
+import pandas as pd
+
+# Directorio data dentro de static
+DATA_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "static", "data")
+# Formato por defecto de los datasets: csv, parquet o feather (Arrow IPC)
+FORMATO_DATOS = os.getenv("MSFT_DATA_FORMAT", "csv").lower()
+EXTENSIONES = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+# Tipos compactos para las columnas enteras conocidas; el resto conserva su tipo
+TIPOS_COLUMNAS = {
+    "año": "int16",
+    "mes": "int8",
+    "día": "int8",
+    "dia_semana": "int8",
+    "volumen": "int64"
+}
+
+def default_path(nombre):
+    """
+    Devolvemos la ruta por defecto de un dataset de static/data según MSFT_DATA_FORMAT,
+    p. ej. default_path("historical") -> static/data/historical.parquet
+    """
+    return os.path.join(DATA_DIR, nombre + EXTENSIONES.get(FORMATO_DATOS, ".csv"))
+
+def storage_format(path):
+    """
+    Deducimos el formato por la extensión del archivo.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return "parquet"
+    if ext in (".feather", ".arrow"):
+        return "feather"
+    return "csv"
+
+def read_table(path, columns=None):
+    """
+    Leemos un dataset en CSV, Parquet o Feather.
+    columns: columnas a cargar (las que no existan en el archivo se ignoran); en los
+    formatos columnares solo se leen esas columnas del disco.
+    Los archivos columnares se leen con memory map.
+    """
+    formato = storage_format(path)
+    if formato == "csv":
+        usecols = None if columns is None else (lambda col: col in columns)
+        return pd.read_csv(path, usecols=usecols, encoding="utf-8-sig")
+
+    pa, pq, feather = _import_pyarrow()
+    if formato == "parquet":
+        if columns is not None:
+            disponibles = pq.read_schema(path, memory_map=True).names
+            columns = [col for col in columns if col in disponibles]
+        tabla = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        tabla = feather.read_table(path, memory_map=True)
+        if columns is not None:
+            tabla = tabla.select([col for col in columns if col in tabla.column_names])
+    return tabla.to_pandas()
+
+def read_tail(path, rows, columns=None):
+    """
+    Leemos las últimas `rows` filas de un dataset sin recorrer el resto: en CSV leemos el
+    archivo desde el final por bloques; en Parquet, solo los últimos row groups, y en
+    Feather, solo los últimos lotes.
+    columns: como en read_table.
+    """
+    formato = storage_format(path)
+    if formato == "csv":
+        nombres = table_columns(path)
+        with open(path, "rb") as f:
+            posicion = f.seek(0, os.SEEK_END)
+            contenido = b""
+            # Necesitamos rows + 1 saltos: la primera línea leída puede estar cortada (o ser la cabecera)
+            while posicion > 0 and contenido.count(b"\n") <= rows:
+                bloque = min(1 << 16, posicion)
+                posicion -= bloque
+                f.seek(posicion)
+                contenido = f.read(bloque) + contenido
+        lineas = contenido.splitlines()[1:][-rows:] if rows > 0 else []
+        df = pd.read_csv(io.BytesIO(b"\n".join(lineas)), header=None, names=nombres, encoding="utf-8")
+        return df if columns is None else df[[col for col in columns if col in df.columns]]
+
+    pa, pq, feather = _import_pyarrow()
+    if formato == "parquet":
+        archivo = pq.ParquetFile(path, memory_map=True)
+        if columns is not None:
+            columns = [col for col in columns if col in archivo.schema_arrow.names]
+        grupos, filas = [], 0
+        for i in reversed(range(archivo.num_row_groups)):
+            if filas >= rows:
+                break
+            grupos.insert(0, i)
+            filas += archivo.metadata.row_group(i).num_rows
+        tabla = archivo.read_row_groups(grupos, columns=columns)
+    else:
+        lector = pa.ipc.open_file(pa.memory_map(path))
+        lotes, filas = [], 0
+        for i in reversed(range(lector.num_record_batches)):
+            if filas >= rows:
+                break
+            lotes.insert(0, lector.get_batch(i))
+            filas += lotes[0].num_rows
+        tabla = pa.Table.from_batches(lotes, schema=lector.schema)
+        if columns is not None:
+            tabla = tabla.select([col for col in columns if col in tabla.column_names])
+    return tabla.slice(max(tabla.num_rows - rows, 0)).to_pandas()
+
+def table_columns(path):
+    """
+    Devolvemos los nombres de columna de un dataset leyendo solo su cabecera o esquema.
+    """
+    formato = storage_format(path)
+    if formato == "csv":
+        return list(pd.read_csv(path, nrows=0, encoding="utf-8-sig").columns)
+
+    pa, pq, feather = _import_pyarrow()
+    if formato == "parquet":
+        return pq.read_schema(path, memory_map=True).names
+    return pa.ipc.open_file(pa.memory_map(path)).schema.names
+
+def write_table(df, path, decimals=None):
+    """
+    Guardamos un dataset en CSV, Parquet (zstd) o Feather (lz4) según la extensión.
+    decimals: redondeo de las columnas decimales (en CSV se aplica como float_format).
+    La escritura es atómica: se escribe en un temporal y se renombra, así los lectores
+    nunca ven un archivo a medio escribir.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    formato = storage_format(path)
+    temporal = f"{path}.tmp"
+
+    if formato == "csv":
+        float_format = f"%.{decimals}f" if decimals is not None else None
+        df.to_csv(temporal, index=False, encoding="utf-8-sig", float_format=float_format)
+    else:
+        pa, pq, feather = _import_pyarrow()
+        df = _apply_types(df, decimals)
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        if formato == "parquet":
+            pq.write_table(tabla, temporal, compression="zstd")
+        else:
+            feather.write_feather(tabla, temporal, compression="lz4")
+
+    os.replace(temporal, path)
+
+def append_table(df, path, decimals=None):
+    """
+    Añadimos filas al final de un dataset existente (o lo creamos si no existe).
+    En CSV se escriben solo las filas nuevas; Parquet y Feather no admiten añadir,
+    así que se reescribe el archivo completo.
+    """
+    if not os.path.exists(path):
+        write_table(df, path, decimals)
+        return
+
+    if storage_format(path) == "csv":
+        float_format = f"%.{decimals}f" if decimals is not None else None
+        # Sin BOM: el archivo ya lo tiene al principio
+        df.to_csv(
+            path, mode="a", header=False, index=False,
+            encoding="utf-8", float_format=float_format
+        )
+    else:
+        previo = read_table(path)
+        write_table(pd.concat([previo, df[previo.columns]], ignore_index=True), path, decimals)
+
+def iter_table(path, chunksize, columns=None):
+    """
+    Leemos un dataset por bloques de `chunksize` filas sin cargarlo entero en memoria.
+    """
+    formato = storage_format(path)
+    if formato == "csv":
+        usecols = None if columns is None else (lambda col: col in columns)
+        yield from pd.read_csv(path, usecols=usecols, encoding="utf-8-sig", chunksize=chunksize)
+        return
+
+    pa, pq, feather = _import_pyarrow()
+    if formato == "parquet":
+        archivo = pq.ParquetFile(path, memory_map=True)
+        if columns is not None:
+            columns = [col for col in columns if col in archivo.schema_arrow.names]
+        for lote in archivo.iter_batches(batch_size=chunksize, columns=columns):
+            yield lote.to_pandas()
+    else:
+        lector = pa.ipc.open_file(pa.memory_map(path))
+        for i in range(lector.num_record_batches):
+            lote = lector.get_batch(i)
+            if columns is not None:
+                lote = lote.select([col for col in columns if col in lote.schema.names])
+            for inicio in range(0, lote.num_rows, chunksize):
+                yield lote.slice(inicio, chunksize).to_pandas()
+
+class TableWriter:
+    """
+    Escribimos un dataset por bloques (CSV, Parquet o Feather según la extensión).
+    Se usa como context manager; el archivo final solo aparece si todo terminó bien.
+    """
+
+    def __init__(self, path, decimals=None):
+        self.path = path
+        self.decimals = decimals
+        self.formato = storage_format(path)
+        self.temporal = f"{path}.tmp"
+        self.filas = 0
+        self._escritor = None
+        self._esquema = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        return self
+
+    def write(self, df):
+        if self.formato == "csv":
+            float_format = f"%.{self.decimals}f" if self.decimals is not None else None
+            primero = self.filas == 0
+            df.to_csv(
+                self.temporal, mode="w" if primero else "a", header=primero, index=False,
+                encoding="utf-8-sig" if primero else "utf-8", float_format=float_format
+            )
+        else:
+            pa, pq, feather = _import_pyarrow()
+            tabla = pa.Table.from_pandas(
+                _apply_types(df, self.decimals), schema=self._esquema, preserve_index=False
+            )
+            if self._escritor is None:
+                self._esquema = tabla.schema
+                if self.formato == "parquet":
+                    self._escritor = pq.ParquetWriter(self.temporal, self._esquema, compression="zstd")
+                else:
+                    self._escritor = pa.ipc.new_file(
+                        self.temporal, self._esquema,
+                        options=pa.ipc.IpcWriteOptions(compression="lz4")
+                    )
+            self._escritor.write_table(tabla)
+        self.filas += len(df)
+
+    def __exit__(self, tipo, valor, traza):
+        if self._escritor is not None:
+            self._escritor.close()
+        if tipo is None and os.path.exists(self.temporal):
+            os.replace(self.temporal, self.path)
+        elif os.path.exists(self.temporal):
+            os.remove(self.temporal)
+        return False
+
+def _apply_types(df, decimals=None):
+    """
+    Aplicamos tipos compactos a las columnas enteras y el redondeo a las decimales.
+    """
+    df = df.copy()
+    for col, tipo in TIPOS_COLUMNAS.items():
+        if col in df.columns and not df[col].isna().any():
+            df[col] = df[col].astype(tipo)
+    if decimals is not None:
+        decimales = df.select_dtypes("float").columns
+        df[decimales] = df[decimales].round(decimals)
+    return df
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import pyarrow.feather as feather
+    except ImportError as e:
+        raise ImportError(
+            "Los formatos Parquet/Feather requieren pyarrow: "
+            "pip install 'proyecto-integrado-v-datos-msft-analytics[parquet]'"
+        ) from e
+    return pa, pq, feather
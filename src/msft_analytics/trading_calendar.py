@@ -0,0 +1,114 @@
+import os
+import argparse
+from functools import lru_cache
+import pandas as pd
+from pandas.tseries.holiday import (
+    MO, AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMemorialDay,
+    USPresidentsDay, USThanksgivingDay, nearest_workday, sunday_to_monday
+)
+
+# Calendario de la serie: "habiles" (solo sesiones de bolsa) o "diario" (todos los días,
+# interpolando fines de semana y festivos, como las versiones anteriores)
+CALENDARIO = os.getenv("MSFT_CALENDAR", "habiles").lower()
+CALENDARIOS = ("habiles", "diario")
+# Festivos de la bolsa suministrados localmente (CSV con columna 'fecha'); si no existe se
+# usan las reglas de NYSE de CalendarioNYSE más CIERRES_EXTRAORDINARIOS
+RUTA_FESTIVOS = os.getenv(
+    "MSFT_HOLIDAYS",
+    os.path.join(os.path.dirname(__file__), "static", "data", "holidays.csv")
+)
+# Cierres de NYSE fuera de las reglas (duelos nacionales, 11-S, huracán Sandy)
+CIERRES_EXTRAORDINARIOS = [
+    "1994-04-27", "2001-09-11", "2001-09-12", "2001-09-13", "2001-09-14", "2004-06-11",
+    "2007-01-02", "2012-10-29", "2012-10-30", "2018-12-05", "2025-01-09"
+]
+
+class CalendarioNYSE(AbstractHolidayCalendar):
+    """
+    Festivos regulares de NYSE (Martin Luther King desde 1998, Juneteenth desde 2022).
+    Los cierres extraordinarios están en CIERRES_EXTRAORDINARIOS.
+    """
+    rules = [
+        Holiday("Año Nuevo", month=1, day=1, observance=sunday_to_monday),
+        Holiday("Martin Luther King", month=1, day=1, offset=pd.DateOffset(weekday=MO(3)), start_date="1998-01-01"),
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-06-19", observance=nearest_workday),
+        Holiday("Independencia", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Navidad", month=12, day=25, observance=nearest_workday)
+    ]
+
+@lru_cache(maxsize=None)
+def holidays(ruta=RUTA_FESTIVOS):
+    """
+    Festivos de la bolsa: los del CSV local `ruta` si existe, o las reglas de NYSE
+    (1980-2040) y sus cierres extraordinarios si no.
+    """
+    if ruta and os.path.exists(ruta):
+        fechas = pd.read_csv(ruta, encoding="utf-8-sig")['fecha']
+        return pd.DatetimeIndex(pd.to_datetime(fechas)).normalize().sort_values()
+    return _festivos_nyse("1980-01-01", "2040-12-31").index
+
+def business_day(ruta=RUTA_FESTIVOS):
+    """Desplazamiento de pandas de una sesión de bolsa (lunes a viernes sin festivos)."""
+    return pd.offsets.CustomBusinessDay(holidays=holidays(ruta))
+
+def trading_days(inicio, fin, ruta=RUTA_FESTIVOS):
+    """Sesiones de bolsa entre `inicio` y `fin`, ambos incluidos."""
+    return pd.date_range(inicio, fin, freq=business_day(ruta))
+
+def prepare_series(df, calendario=CALENDARIO, ruta=RUTA_FESTIVOS):
+    """
+    Regularizamos la serie diaria `df` (índice de fechas, columna 'cerrar') según el
+    calendario:
+    - "diario": todos los días naturales; fines de semana y festivos se interpolan.
+    - "habiles": las fechas observadas más las sesiones de bolsa que falten en los datos,
+      que se interpolan; no se añaden fines de semana ni festivos.
+    """
+    if calendario not in CALENDARIOS:
+        raise ValueError(f"Calendario desconocido: {calendario} (opciones: {', '.join(CALENDARIOS)})")
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    if calendario == "diario":
+        df = df.asfreq('D')
+    else:
+        df = df.reindex(df.index.union(trading_days(df.index.min(), df.index.max(), ruta)))
+        df.index.name = "fecha"
+    df['cerrar'] = df['cerrar'].interpolate(method='time')
+    return df
+
+def forecast_dates(ultima_fecha, pasos, calendario=CALENDARIO, ruta=RUTA_FESTIVOS):
+    """Fechas de los `pasos` días pronosticados tras `ultima_fecha` según el calendario."""
+    ultima_fecha = pd.Timestamp(ultima_fecha)
+    if calendario == "diario":
+        return pd.date_range(start=ultima_fecha + pd.Timedelta(days=1), periods=pasos, freq='D')
+    return pd.date_range(start=ultima_fecha + business_day(ruta), periods=pasos, freq=business_day(ruta))
+
+def _festivos_nyse(inicio, fin):
+    """Serie fecha -> nombre con los festivos y cierres extraordinarios de NYSE."""
+    festivos = CalendarioNYSE().holidays(start=inicio, end=fin, return_name=True)
+    cierres = pd.DatetimeIndex(CIERRES_EXTRAORDINARIOS)
+    cierres = cierres[(cierres >= inicio) & (cierres <= fin)]
+    return pd.concat([festivos, pd.Series("Cierre extraordinario", index=cierres)]).sort_index()
+
+def run():
+    """
+    Exportamos los festivos de NYSE de un rango de años a un CSV editable, que luego puede
+    usarse como calendario local (MSFT_HOLIDAYS o static/data/holidays.csv).
+    """
+    parser = argparse.ArgumentParser(description="Exporta los festivos de NYSE a un CSV editable")
+    parser.add_argument("--desde", type=int, default=1986, help="Primer año (default: 1986)")
+    parser.add_argument("--hasta", type=int, default=2030, help="Último año (default: 2030)")
+    parser.add_argument("--out", default=RUTA_FESTIVOS, help="CSV de salida (default: static/data/holidays.csv)")
+    args = parser.parse_args()
+
+    festivos = _festivos_nyse(f"{args.desde}-01-01", f"{args.hasta}-12-31")
+    pd.DataFrame({'fecha': festivos.index.date, 'nombre': festivos.values}).to_csv(
+        args.out, index=False, encoding="utf-8-sig"
+    )
+    print(f"✅ {len(festivos)} Festivos Guardados En {args.out}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,104 @@
+"""
+Gráficos del dashboard: los helpers de charts.py construyen las figuras fuera de
+Streamlit (go.Scatter/go.Bar en SVG y go.Scattergl con arrays tipados en WebGL, con las
+mismas fechas y valores), y el dashboard se ejecuta sin errores en ambos modos con el
+enriquecido y el registro del repositorio.
+"""
+import os
+import json
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+from msft_analytics.charts import (
+    UMBRAL_WEBGL, bars, compact_x, compact_y, date_axes, payload_stats,
+    render_benchmark_html, scatter, use_webgl
+)
+
+RUTA_DASHBOARD = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "msft_analytics", "dashboard.py"
+)
+
+@pytest.fixture(scope="module")
+def serie():
+    n = 5000
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'cerrar': 100 + rng.normal(0, 1, n).cumsum(),
+        'volumen': rng.integers(1_000_000, 50_000_000, n).astype(float)
+    }, index=pd.bdate_range("2000-01-03", periods=n))
+
+def figura(serie, webgl):
+    fig = go.Figure()
+    fig.add_trace(scatter(serie.index, serie['cerrar'], webgl, mode="lines", name="Cierre"))
+    fig.add_trace(bars(serie.index, serie['volumen'], webgl, marker_color="#0078d4", name="Volumen"))
+    return date_axes(fig, webgl)
+
+def test_use_webgl():
+    assert not use_webgl(UMBRAL_WEBGL)
+    assert use_webgl(UMBRAL_WEBGL + 1)
+    assert use_webgl(10, "webgl")
+    assert not use_webgl(10_000_000, "svg")
+    with pytest.raises(ValueError):
+        use_webgl(10, "canvas")
+
+def test_compactos():
+    fechas = pd.DatetimeIndex(["1970-01-01", "2024-02-29 13:45:00"])
+    x = compact_x(fechas)
+    assert x.dtype == np.float64
+    np.testing.assert_array_equal(pd.to_datetime(x, unit="ms"), fechas)
+    assert compact_y([1.5, 2.25]).dtype == np.float32
+
+def test_svg(serie):
+    fig = figura(serie, webgl=False)
+    linea, barras = fig.data
+    assert isinstance(linea, go.Scatter) and isinstance(barras, go.Bar)
+    assert fig.layout.xaxis.type is None
+    np.testing.assert_array_equal(linea.y, serie['cerrar'])
+
+def test_webgl_con_arrays_tipados(serie):
+    fig = figura(serie, webgl=True)
+    linea, area = fig.data
+    assert isinstance(linea, go.Scattergl) and isinstance(area, go.Scattergl)
+    assert (area.fill, area.line.shape) == ("tozeroy", "hv")
+    assert fig.layout.xaxis.type == "date"
+    # Mismos puntos que en SVG, con las fechas en milisegundos y los valores en float32
+    np.testing.assert_array_equal(pd.to_datetime(linea.x, unit="ms"), serie.index)
+    np.testing.assert_allclose(linea.y, serie['cerrar'], rtol=1e-6)
+    # Plotly los serializa como arrays binarios (base64) en lugar de listas de números
+    datos = json.loads(fig.to_json())['data']
+    assert all(isinstance(traza[eje], dict) and 'bdata' in traza[eje] for traza in datos for eje in "xy")
+    assert datos[0]['y']['dtype'] == "f4"
+
+def test_webgl_pesa_menos_que_svg(serie):
+    tamano_svg, ms_svg = payload_stats(figura(serie, webgl=False))
+    tamano_webgl, ms_webgl = payload_stats(figura(serie, webgl=True))
+    assert tamano_webgl < tamano_svg
+    assert ms_svg >= 0 and ms_webgl >= 0
+
+def test_render_benchmark_html(serie):
+    figuras = {'SVG': figura(serie.iloc[:100], False), 'WebGL': figura(serie.iloc[:100], True)}
+    html = render_benchmark_html(figuras)
+    assert html.startswith("<!DOCTYPE html>")
+    assert 'id="fig-0"' in html and 'id="fig-1"' in html and 'id="fig-2"' not in html
+    assert "Plotly.newPlot" in html
+    # El JSON de cada figura va embebido tal cual
+    inicio = html.index("const figuras = ") + len("const figuras = ")
+    embebidas = json.JSONDecoder().raw_decode(html[inicio:])[0]
+    assert embebidas == {nombre: fig.to_json() for nombre, fig in figuras.items()}
+
+@pytest.mark.parametrize("modo", ["webgl", "svg"])
+def test_dashboard_sin_errores(modo):
+    testing = pytest.importorskip("streamlit.testing.v1")
+    app = testing.AppTest.from_file(RUTA_DASHBOARD, default_timeout=300)
+    app.run()
+    app.sidebar.selectbox[0].set_value(modo).run()
+    assert not app.exception
+    assert not app.error
+    graficos = [json.loads(grafico.proto.spec) for grafico in app.get("plotly_chart")]
+    assert graficos
+    tipos = {traza.get('type', "scatter") for grafico in graficos for traza in grafico['data']}
+    if modo == "webgl":
+        assert "scattergl" in tipos
+    else:
+        assert "scattergl" not in tipos
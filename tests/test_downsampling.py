@@ -0,0 +1,73 @@
+"""
+La pirámide de reducción de puntos (DownsamplePyramid) debe conservar, en cualquier rango
+de fechas, el mínimo y el máximo de cada columna y la primera y la última fila, sin pasar
+del presupuesto de puntos. Cada nivel se compara con el min/max por cubo de pandas
+(groupby de las filas en cubos de 2^k).
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from msft_analytics.downsampling import COLUMNAS_PIRAMIDE, DownsamplePyramid
+
+@pytest.fixture(scope="module", params=[5, 777, 20_000], ids=["5filas", "777filas", "20000filas"])
+def datos(request):
+    n = request.param
+    rng = np.random.default_rng(n)
+    df = pd.DataFrame({
+        'cerrar': 100 + rng.normal(0, 1, n).cumsum(),
+        # Valores repetidos: los empates no deben perder el extremo
+        'volumen': rng.integers(0, 50, n).astype(float),
+        'tasa_variacion': rng.standard_t(3, n),
+        'otra': rng.normal(0, 1, n)
+    }, index=pd.date_range("1990-01-01", periods=n, freq="D"))
+    return df, DownsamplePyramid.from_frame(df)
+
+def rangos(n, cantidad=200, semilla=0):
+    """Rangos [a, b) aleatorios, más el completo y los de una sola fila en los bordes."""
+    rng = np.random.default_rng(semilla)
+    extremos = np.sort(rng.integers(0, n, (cantidad, 2)), axis=1)
+    return [(0, n), (0, 1), (n - 1, n)] + [(int(a), int(b) + 1) for a, b in extremos]
+
+def test_niveles_igual_que_groupby(datos):
+    df, piramide = datos
+    n = len(df)
+    columnas = df[COLUMNAS_PIRAMIDE]
+    for k, nivel in enumerate(piramide.niveles):
+        assert (np.diff(nivel) > 0).all() and nivel[0] == 0 and nivel[-1] == n - 1
+        cubos = columnas.groupby(np.arange(n) // 2 ** k)
+        seleccion = columnas.iloc[nivel].groupby(nivel // 2 ** k)
+        pd.testing.assert_frame_equal(seleccion.min(), cubos.min())
+        pd.testing.assert_frame_equal(seleccion.max(), cubos.max())
+
+@pytest.mark.parametrize("puntos", [50, 200, 1000])
+def test_conserva_extremos_y_bordes_del_rango(datos, puntos):
+    df, piramide = datos
+    for a, b in rangos(len(df)):
+        seleccion = piramide.select(df.index[a], df.index[b - 1], puntos)
+        assert (np.diff(seleccion) > 0).all()
+        assert seleccion[0] == a and seleccion[-1] == b - 1
+        rango, dibujado = df.iloc[a:b][COLUMNAS_PIRAMIDE], df.iloc[seleccion][COLUMNAS_PIRAMIDE]
+        pd.testing.assert_series_equal(dibujado.min(), rango.min())
+        pd.testing.assert_series_equal(dibujado.max(), rango.max())
+
+@pytest.mark.parametrize("puntos", [200, 1000])
+def test_respeta_el_presupuesto(datos, puntos):
+    df, piramide = datos
+    for a, b in rangos(len(df), semilla=1):
+        seleccion = piramide.select(df.index[a], df.index[b - 1], puntos)
+        assert len(seleccion) <= puntos
+        # Si el rango cabe entero, se dibujan todas sus filas
+        if b - a <= puntos:
+            np.testing.assert_array_equal(seleccion, np.arange(a, b))
+
+def test_fechas_fuera_del_indice(datos):
+    df, piramide = datos
+    np.testing.assert_array_equal(
+        piramide.select(df.index[0] - pd.Timedelta(days=30), df.index[-1] + pd.Timedelta(days=30)),
+        piramide.select()
+    )
+    assert len(piramide.select("1900-01-01", "1900-12-31")) == 0
+    pd.testing.assert_frame_equal(
+        piramide.frame(df, df.index[1], df.index[-2], 1000),
+        df.iloc[piramide.select(df.index[1], df.index[-2], 1000)]
+    )
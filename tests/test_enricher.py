@@ -0,0 +1,153 @@
+"""
+El enriquecimiento incremental y por bloques debe dar exactamente (bit a bit) el mismo
+resultado que recalcular todo el histórico, en todos los formatos de almacenamiento.
+"""
+import logging
+import os
+import pandas as pd
+import pytest
+from msft_analytics import enricher as modulo_enricher
+from msft_analytics.enricher import COLUMNAS_BASE, FILAS_CONTEXTO, Enricher
+from msft_analytics.sources import generate_ohlcv
+from msft_analytics.storage import read_table, write_table
+
+FILAS = 300
+# Cortes: dentro de las filas de contexto, a mitad y a una fila del final
+CORTES = [3, FILAS // 2, FILAS - 1]
+FORMATOS = ["csv", "parquet", "feather"]
+
+@pytest.fixture(autouse=True)
+def logger_silencioso(monkeypatch):
+    """Sin escribir en los logs de static/logs."""
+    monkeypatch.setattr(modulo_enricher, "get_logger", lambda nombre: logging.getLogger("test_enricher"))
+
+@pytest.fixture(scope="module")
+def historico():
+    """Histórico diario sintético con las columnas del CSV original."""
+    df = generate_ohlcv(FILAS, seed=3)
+    fechas = pd.to_datetime(df['Fecha'])
+    df['año'], df['mes'], df['día'] = fechas.dt.year, fechas.dt.month, fechas.dt.day
+    return df[COLUMNAS_BASE]
+
+def rutas(tmp_path, formato):
+    if formato != "csv":
+        pytest.importorskip("pyarrow")
+    return str(tmp_path / f"historical.{formato}"), str(tmp_path / f"historical_enriched.{formato}")
+
+def enriquecer(origen, destino, **kwargs):
+    Enricher(origen, destino).run(**kwargs)
+    return read_table(destino)
+
+@pytest.fixture(scope="module")
+def completo(tmp_path_factory, historico):
+    """Resultado de recalcular todo, por formato."""
+    resultados = {}
+
+    def calcular(formato):
+        if formato not in resultados:
+            origen, destino = rutas(tmp_path_factory.mktemp("completo"), formato)
+            write_table(historico, origen)
+            resultados[formato] = enriquecer(origen, destino, incremental=False)
+        return resultados[formato]
+    return calcular
+
+@pytest.mark.parametrize("formato", FORMATOS)
+@pytest.mark.parametrize("corte", CORTES)
+@pytest.mark.parametrize("con_estado", [True, False])
+def test_incremental_identico_al_completo(tmp_path, monkeypatch, historico, completo, formato, corte,
+                                          con_estado):
+    origen, destino = rutas(tmp_path, formato)
+    write_table(historico.iloc[:corte], origen)
+    enriquecer(origen, destino, incremental=False)
+
+    enricher = Enricher(origen, destino)
+    assert os.path.exists(enricher.ruta_estado)
+    if not con_estado:
+        enricher.borrar_estado()
+
+    completo(formato)
+    # Solo se añaden las filas nuevas: un recálculo completo fallaría (run lo registra y no guarda)
+    def sin_recalculo(self, df):
+        raise AssertionError("Se recalculó todo el histórico")
+    monkeypatch.setattr(Enricher, "calcular_kpi", sin_recalculo)
+
+    write_table(historico, origen)
+    resultado = enriquecer(origen, destino, incremental=True)
+    pd.testing.assert_frame_equal(resultado, completo(formato), check_exact=True)
+
+@pytest.mark.parametrize("formato", FORMATOS)
+@pytest.mark.parametrize("filas_bloque", [FILAS_CONTEXTO - 1, 64, FILAS])
+def test_por_bloques_identico_al_completo(tmp_path, historico, completo, formato, filas_bloque):
+    origen, destino = rutas(tmp_path, formato)
+    write_table(historico, origen)
+    resultado = enriquecer(origen, destino, filas_bloque=filas_bloque)
+    pd.testing.assert_frame_equal(resultado, completo(formato), check_exact=True)
+
+@pytest.mark.parametrize("corte", CORTES)
+def test_estado_continua_los_acumulados(historico, corte):
+    """En memoria: continuar desde el estado da las mismas filas que calcular todo."""
+    previo = Enricher.__new__(Enricher)
+    previo.logger = logging.getLogger("test_enricher")
+    previo.calcular_kpi(historico.iloc[:corte])
+
+    total = Enricher.__new__(Enricher)
+    total.logger = previo.logger
+    esperado = total.calcular_kpi(historico).iloc[corte:].reset_index(drop=True)
+
+    nuevas = previo.calcular_kpi_incremental(historico, corte, previo.estado)
+    pd.testing.assert_frame_equal(nuevas, esperado, check_exact=True)
+    assert previo.estado == total.estado
+
+def test_estado_de_version_anterior_no_es_valido(tmp_path, historico, completo):
+    """Un estado con el acumulador de Welford como lista posicional se descarta."""
+    origen, destino = rutas(tmp_path, "csv")
+    write_table(historico.iloc[:FILAS // 2], origen)
+    enriquecer(origen, destino, incremental=False)
+
+    enricher = Enricher(origen, destino)
+    estado = enricher.leer_estado()
+    estado['desviacion_estandar_acumulada'] = list(estado['desviacion_estandar_acumulada'].values())
+    del estado['ultimo_cierre']
+    enricher.estado = estado
+    enricher.guardar_estado()
+
+    write_table(historico, origen)
+    assert not enricher._estado_valido(enricher.leer_estado(), enricher.preparar(historico), FILAS // 2)
+    pd.testing.assert_frame_equal(enriquecer(origen, destino, incremental=True), completo("csv"), check_exact=True)
+    assert isinstance(Enricher(origen, destino).leer_estado()['desviacion_estandar_acumulada'], dict)
+
+@pytest.mark.parametrize("formato", FORMATOS)
+def test_con_estado_solo_lee_la_cola(tmp_path, monkeypatch, historico, completo, formato):
+    """Con estado, la comprobación del enriquecido previo no lee el archivo completo."""
+    origen, destino = rutas(tmp_path, formato)
+    write_table(historico.iloc[:FILAS // 2], origen)
+    enriquecer(origen, destino, incremental=False)
+    write_table(historico, origen)
+    esperado = completo(formato)
+
+    read_table_original = modulo_enricher.read_table
+    def sin_leer_el_enriquecido(ruta, columns=None):
+        assert ruta != destino, "Se leyó el enriquecido completo"
+        return read_table_original(ruta, columns)
+    monkeypatch.setattr(modulo_enricher, "read_table", sin_leer_el_enriquecido)
+    # El error de lectura se registraría y forzaría un recálculo completo: lo impedimos
+    def sin_recalculo(self, df):
+        raise AssertionError("Se recalculó todo el histórico")
+    monkeypatch.setattr(Enricher, "calcular_kpi", sin_recalculo)
+
+    Enricher(origen, destino).run(incremental=True)
+    monkeypatch.undo()
+    pd.testing.assert_frame_equal(read_table(destino), esperado, check_exact=True)
+
+@pytest.mark.parametrize("formato", FORMATOS)
+def test_correccion_en_el_solapamiento_recalcula_todo(tmp_path, historico, completo, formato):
+    """Si el colector corrige un día ya enriquecido de la cola, se recalcula todo."""
+    origen, destino = rutas(tmp_path, formato)
+    previo = historico.iloc[:FILAS // 2].copy()
+    previo.loc[previo.index[-2], 'cerrar'] += 1.0
+    write_table(previo, origen)
+    enriquecer(origen, destino, incremental=False)
+
+    write_table(historico, origen)
+    resultado = enriquecer(origen, destino, incremental=True)
+    pd.testing.assert_frame_equal(resultado, completo(formato), check_exact=True)
@@ -0,0 +1,100 @@
+"""
+La inferencia NumPy (NumpyLSTM) debe dar las mismas predicciones que el modelo Keras del
+que se exportan los pesos, y el pronóstico compilado (forecast.compile_rollout) el mismo
+resultado que llamar al modelo una vez por paso. Keras calcula en float32: la tolerancia
+es 1e-5 sobre valores escalados a [0, 1].
+"""
+import gc
+import weakref
+import numpy as np
+import pytest
+from msft_analytics.forecast import forecast
+from msft_analytics.numpy_lstm import NumpyScaler, export_weights, load_weights
+
+tf = pytest.importorskip("tensorflow")
+from tensorflow.keras.layers import LSTM, Dense
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.utils import set_random_seed
+
+TOLERANCIA = 1e-5
+VENTANA = 12
+UNIDADES = 8
+
+def construir_modelo(horizonte, semilla=0):
+    """Misma arquitectura que Modeller.ajustar, con pesos aleatorios."""
+    set_random_seed(semilla)
+    return Sequential([
+        LSTM(UNIDADES, activation='relu', input_shape=(VENTANA, 1)),
+        Dense(horizonte)
+    ])
+
+@pytest.fixture(scope="module")
+def escalador():
+    from sklearn.preprocessing import MinMaxScaler
+    return MinMaxScaler().fit(np.linspace(10.0, 500.0, 100).reshape(-1, 1))
+
+@pytest.fixture(scope="module", params=[1, 3], ids=["horizonte1", "horizonte3"])
+def modelos(request, tmp_path_factory, escalador):
+    """(modelo Keras, NumpyLSTM con sus pesos exportados) para cada horizonte."""
+    keras_model = construir_modelo(request.param)
+    ruta = str(tmp_path_factory.mktemp("pesos") / "weights.npz")
+    export_weights(keras_model, escalador, VENTANA, ruta)
+    numpy_model, _, ventana = load_weights(ruta)
+    assert ventana == VENTANA
+    return keras_model, numpy_model
+
+@pytest.fixture(scope="module")
+def serie():
+    """Serie escalada tipo paseo aleatorio en [0, 1]."""
+    pasos = np.random.default_rng(1).normal(0, 1, 200).cumsum()
+    return ((pasos - pasos.min()) / (pasos.max() - pasos.min())).astype(np.float32)
+
+def bucle_por_pasos(model, serie, pasos):
+    """Referencia: una llamada a predict por bloque, añadiendo cada predicción a la ventana."""
+    historia = list(serie[-VENTANA:])
+    horizonte = model.output_shape[-1]
+    while len(historia) < VENTANA + pasos:
+        ventana = np.array(historia[-VENTANA:], dtype=np.float32).reshape(1, VENTANA, 1)
+        historia.extend(np.asarray(model.predict(ventana, verbose=0)).reshape(horizonte))
+    return np.array(historia[VENTANA:VENTANA + pasos])
+
+def test_predict_igual_que_keras(modelos, serie):
+    keras_model, numpy_model = modelos
+    X = np.lib.stride_tricks.sliding_window_view(serie, VENTANA)[:, :, None]
+    np.testing.assert_allclose(
+        numpy_model.predict(X), keras_model.predict(X, verbose=0), rtol=0, atol=TOLERANCIA
+    )
+
+def test_escalador_igual_que_sklearn(escalador):
+    numpy_scaler = NumpyScaler(escalador.min_, escalador.scale_)
+    valores = np.array([[10.0], [123.4], [500.0], [600.0]])
+    np.testing.assert_allclose(numpy_scaler.transform(valores), escalador.transform(valores))
+    np.testing.assert_allclose(
+        numpy_scaler.inverse_transform(escalador.transform(valores)), valores
+    )
+
+@pytest.mark.parametrize("pasos", [1, 7, 10])
+def test_rollout_compilado_igual_que_bucle(modelos, serie, pasos):
+    keras_model, _ = modelos
+    np.testing.assert_allclose(
+        forecast(keras_model, serie, VENTANA, pasos), bucle_por_pasos(keras_model, serie, pasos),
+        rtol=0, atol=TOLERANCIA
+    )
+
+@pytest.mark.parametrize("pasos", [1, 7, 10])
+def test_rollout_numpy_igual_que_keras(modelos, serie, pasos):
+    keras_model, numpy_model = modelos
+    resultado = forecast(numpy_model, serie, VENTANA, pasos)
+    assert resultado.shape == (pasos,) and resultado.dtype == np.float32
+    np.testing.assert_allclose(
+        resultado, forecast(keras_model, serie, VENTANA, pasos), rtol=0, atol=TOLERANCIA
+    )
+
+def test_rollout_no_retiene_el_modelo(serie):
+    """La función compilada guardada en _ROLLOUTS no debe mantener vivo al modelo."""
+    model = construir_modelo(1, semilla=1)
+    forecast(model, serie, VENTANA, 3)
+    referencia = weakref.ref(model)
+    del model
+    gc.collect()
+    assert referencia() is None
@@ -0,0 +1,81 @@
+"""
+El índice de estadísticas por rango (RangeStatsIndex) debe dar las mismas medias,
+mínimos, máximos y correlaciones que pandas sobre el mismo corte de filas, en rangos
+aleatorios de cualquier longitud: mínimos y máximos exactos, medias y correlaciones con
+una tolerancia de 1e-9 (relativa a max(|valor|, 1)).
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from msft_analytics.range_index import (
+    COLUMNAS_ESTADISTICAS, FILAS_CALCULO_DIRECTO, RangeStatsIndex
+)
+
+TOLERANCIA = 1e-9
+
+@pytest.fixture(scope="module")
+def datos():
+    """Serie con las escalas del dashboard: precio, volumen ~1e7, RSI, MACD y volatilidad."""
+    n = 10_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'cerrar': np.abs(100 + rng.normal(0, 1, n).cumsum()) + 1,
+        'volumen': rng.integers(1_000_000, 100_000_000, n).astype(float),
+        'rsi': rng.uniform(0, 100, n),
+        'macd': rng.normal(0, 2, n),
+        'volatilidad_7d': rng.gamma(2, 1, n)
+    }, index=pd.bdate_range("1986-03-13", periods=n))
+    return df, RangeStatsIndex.from_frame(df)
+
+def rangos(n, semilla=0):
+    """Rangos [a, b) de longitudes de 1 fila a toda la serie, en posiciones aleatorias."""
+    rng = np.random.default_rng(semilla)
+    largos = [1, 2, 3, 5, FILAS_CALCULO_DIRECTO - 1, FILAS_CALCULO_DIRECTO, 100, 1000, n]
+    resultado = [(0, n)]
+    for largo in largos:
+        for a in rng.integers(0, n - largo + 1, 20):
+            resultado.append((int(a), int(a) + largo))
+    return resultado
+
+def assert_cerca(valor, referencia):
+    escala = np.maximum(np.abs(referencia), 1.0)
+    np.testing.assert_array_less(np.abs(np.asarray(valor) - referencia) / escala, TOLERANCIA)
+
+def test_media_minimo_y_maximo_igual_que_pandas(datos):
+    df, indice = datos
+    for a, b in rangos(len(df)):
+        tramo = df.iloc[a:b]
+        for columna in COLUMNAS_ESTADISTICAS:
+            assert_cerca(indice.mean(columna, a, b), tramo[columna].mean())
+        assert indice.min("cerrar", a, b) == tramo["cerrar"].min()
+        assert indice.max("cerrar", a, b) == tramo["cerrar"].max()
+
+def test_correlacion_igual_que_pandas(datos):
+    df, indice = datos
+    for a, b in rangos(len(df), semilla=1):
+        if b - a < 2:
+            continue
+        correlacion = indice.corr(a, b)
+        referencia = df.iloc[a:b][COLUMNAS_ESTADISTICAS].corr()
+        assert list(correlacion.index) == list(correlacion.columns) == COLUMNAS_ESTADISTICAS
+        assert_cerca(correlacion.to_numpy(), referencia.to_numpy())
+        np.testing.assert_array_equal(correlacion.to_numpy(), correlacion.to_numpy().T)
+
+def test_correlacion_de_una_fila_es_nan(datos):
+    _, indice = datos
+    assert indice.corr(10, 11).isna().all().all()
+
+def test_bounds_igual_que_loc(datos):
+    df, indice = datos
+    rng = np.random.default_rng(2)
+    for desplazamientos in np.sort(rng.integers(-30, 15_000, (100, 2)), axis=1):
+        inicio, fin = df.index[0] + pd.to_timedelta(desplazamientos, unit="D")
+        a, b = indice.bounds(inicio, fin)
+        tramo = df.loc[inicio:fin]
+        assert b - a == len(tramo)
+        if len(tramo):
+            assert (df.index[a], df.index[b - 1]) == (tramo.index[0], tramo.index[-1])
+    assert indice.bounds() == (0, len(df))
+    # Un rango invertido queda vacío en lugar de tener longitud negativa
+    a, b = indice.bounds(df.index[100], df.index[50])
+    assert a == b
@@ -0,0 +1,156 @@
+"""
+Registro versionado de modelos: register crea una versión completa (pesos NumPy que dan
+las mismas predicciones que el modelo Keras, con tolerancia 1e-5, y metadatos) y la
+promueve; promote y rollback mueven el puntero CURRENT sin tocar las versiones, y prune
+conserva las más recientes, la actual y la anterior. Una versión que falla al
+registrarse no deja carpetas a medias.
+"""
+import os
+import json
+import numpy as np
+import pytest
+from msft_analytics.registry import ARCHIVO_ACTUAL, ModelRegistry
+
+tf = pytest.importorskip("tensorflow")
+from tensorflow.keras.layers import LSTM, Dense
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.utils import set_random_seed
+
+TOLERANCIA = 1e-5
+VENTANA = 10
+
+@pytest.fixture(scope="module")
+def escalador():
+    from sklearn.preprocessing import MinMaxScaler
+    return MinMaxScaler().fit(np.linspace(20.0, 400.0, 50).reshape(-1, 1))
+
+@pytest.fixture(scope="module")
+def modelo():
+    set_random_seed(0)
+    return Sequential([LSTM(6, activation='relu', input_shape=(VENTANA, 1)), Dense(2)])
+
+@pytest.fixture
+def registro(tmp_path):
+    return ModelRegistry(str(tmp_path / "registry"))
+
+def registrar(registro, modelo, escalador, n, **kwargs):
+    return [registro.register(modelo, escalador, VENTANA, **kwargs) for _ in range(n)]
+
+def restos(registro):
+    """Carpetas temporales (.<version>.tmp / .<version>.borrar) que hayan quedado."""
+    return [nombre for nombre in os.listdir(registro.root) if nombre.startswith(".")]
+
+def test_registro_vacio(registro):
+    assert registro.versions() == []
+    assert registro.current() is None
+    with pytest.raises(FileNotFoundError):
+        registro.get()
+
+def test_register_guarda_y_promueve(registro, modelo, escalador):
+    huella = {'filas': 50, 'desde': "2020-01-01", 'hasta': "2020-02-19", 'sha256': "abc"}
+    version = registro.register(
+        modelo, escalador, VENTANA, metricas={'rmse': np.float32(1.5), 'mae': 1.0},
+        huella_datos=huella, origen={'modo': 'completo', 'rmse_referencia': 1.25},
+        calendario="habiles"
+    )
+    assert registro.versions() == [version]
+    assert registro.current() == version
+    assert restos(registro) == []
+
+    entrada = registro.get()
+    assert entrada.version == version
+    assert (entrada.ventana, entrada.horizonte, entrada.calendario) == (VENTANA, 2, "habiles")
+    assert entrada.metricas == {'rmse': 1.5, 'mae': 1.0}
+    assert entrada.metricas_validacion_afinado is None
+    assert entrada.huella_datos == huella
+    assert entrada.rmse_referencia == 1.25
+    # Los metadatos son JSON válido sin tipos de NumPy
+    with open(os.path.join(entrada.ruta, "metadata.json"), encoding="utf-8") as f:
+        assert json.load(f)['metricas']['rmse'] == 1.5
+
+def test_pesos_numpy_igual_que_keras(registro, modelo, escalador):
+    registro.register(modelo, escalador, VENTANA)
+    entrada = registro.get()
+    X = np.random.default_rng(0).random((20, VENTANA, 1), dtype=np.float32)
+    numpy_model, numpy_scaler, ventana = entrada.load("numpy")
+    keras_model, _, _ = entrada.load("keras")
+    assert ventana == VENTANA
+    np.testing.assert_allclose(
+        numpy_model.predict(X), modelo.predict(X, verbose=0), rtol=0, atol=TOLERANCIA
+    )
+    np.testing.assert_allclose(
+        keras_model.predict(X, verbose=0), modelo.predict(X, verbose=0), rtol=0, atol=TOLERANCIA
+    )
+    valores = np.array([[20.0], [123.4], [400.0]])
+    np.testing.assert_allclose(numpy_scaler.transform(valores), escalador.transform(valores))
+    with pytest.raises(ValueError):
+        entrada.load("torch")
+
+def test_validacion_del_afinado(registro, modelo, escalador):
+    base = registro.register(modelo, escalador, VENTANA, metricas={'rmse': 2.0})
+    registro.register(
+        modelo, escalador, VENTANA,
+        origen={'modo': 'afinado', 'base': base, 'rmse_referencia': 1.8, 'afinados': 1},
+        validacion={'rmse': np.float64(1.9), 'deriva': np.bool_(False)}
+    )
+    entrada = registro.get()
+    assert entrada.metricas is None
+    assert entrada.metricas_validacion_afinado == {'rmse': 1.9, 'deriva': False}
+    assert entrada.origen['base'] == base
+    assert entrada.rmse_referencia == 1.8
+    # Sin 'rmse_referencia' en el origen (versiones anteriores) se usa el RMSE de test
+    assert registro.get(base).rmse_referencia == 2.0
+
+def test_register_sin_promover(registro, modelo, escalador):
+    primera = registro.register(modelo, escalador, VENTANA)
+    segunda = registro.register(modelo, escalador, VENTANA, promote=False)
+    assert registro.versions() == [primera, segunda]
+    assert registro.current() == primera
+
+def test_versiones_en_el_mismo_segundo(registro, modelo, escalador):
+    versiones = registrar(registro, modelo, escalador, 3)
+    assert len(set(versiones)) == 3
+    assert registro.versions() == versiones
+
+def test_promote_y_rollback(registro, modelo, escalador):
+    v1, v2, v3 = registrar(registro, modelo, escalador, 3)
+    assert registro.current() == v3
+    assert registro.rollback() == v2
+    assert registro.rollback() == v1
+    assert registro.current() == v1
+    with pytest.raises(ValueError):
+        registro.rollback()
+
+    registro.promote(v3)
+    assert registro.current() == v3
+    assert registro.versions() == [v1, v2, v3]
+    assert not os.path.exists(os.path.join(registro.root, ARCHIVO_ACTUAL + ".tmp"))
+    with pytest.raises(FileNotFoundError):
+        registro.promote("no-existe")
+    assert registro.current() == v3
+
+def test_prune_conserva_recientes_actual_y_anterior(registro, modelo, escalador):
+    versiones = registrar(registro, modelo, escalador, 6)
+    # La actual es la segunda: se conservan ella, la primera (anterior) y las 2 últimas
+    registro.promote(versiones[1])
+    borradas = registro.prune(keep=2)
+    assert borradas == versiones[2:4]
+    assert registro.versions() == versiones[:2] + versiones[4:]
+    assert registro.current() == versiones[1]
+    assert restos(registro) == []
+
+    assert registro.prune(keep=0) == versiones[4:]
+    assert registro.versions() == versiones[:2]
+    assert registro.rollback() == versiones[0]
+
+def test_register_fallido_no_deja_restos(registro, modelo, escalador):
+    version = registro.register(modelo, escalador, VENTANA)
+    # Solo se exporta la arquitectura LSTM + Dense
+    otro = Sequential([
+        LSTM(4, return_sequences=True, input_shape=(VENTANA, 1)), LSTM(4), Dense(1)
+    ])
+    with pytest.raises(ValueError):
+        registro.register(otro, escalador, VENTANA)
+    assert registro.versions() == [version]
+    assert registro.current() == version
+    assert restos(registro) == []
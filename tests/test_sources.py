@@ -0,0 +1,69 @@
+"""
+La fuente sintética (SyntheticSource) genera solo el rango pedido y debe ser coherente:
+el mismo día tiene las mismas barras en cualquier descarga que lo incluya (también
+cruzando bloques), cada símbolo tiene su serie y los precios no saltan entre bloques.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from msft_analytics.sources import (
+    COLUMNAS_OHLCV, FECHA_ORIGEN_SINTETICA, SESIONES_BLOQUE_SINTETICO, SyntheticSource, generate_ohlcv
+)
+
+@pytest.fixture(scope="module")
+def fuente():
+    return SyntheticSource(seed=7)
+
+@pytest.fixture(scope="module")
+def historico(fuente):
+    return fuente.download("MSFT", "1980-01-01", "2001-01-01")
+
+def test_columnas_y_dias_habiles(historico):
+    assert list(historico.columns) == COLUMNAS_OHLCV
+    fechas = pd.DatetimeIndex(historico['Fecha'])
+    np.testing.assert_array_equal(fechas, pd.bdate_range(FECHA_ORIGEN_SINTETICA, "2000-12-31"))
+    assert (historico['min'] <= historico[['abrir', 'cerrar']].min(axis=1)).all()
+    assert (historico['max'] >= historico[['abrir', 'cerrar']].max(axis=1)).all()
+    assert (historico['volumen'] > 0).all()
+
+@pytest.mark.parametrize("inicio, fin", [
+    ("1986-03-13", "1986-03-14"),
+    ("1990-06-01", "1990-06-08"),
+    ("1993-01-01", "1999-07-15"),
+    ("2000-12-01", "2001-01-01")
+])
+def test_rangos_coherentes_con_el_historico(fuente, historico, inicio, fin):
+    tramo = fuente.download("MSFT", inicio, fin)
+    fechas = pd.to_datetime(historico['Fecha'])
+    esperado = historico[(fechas >= inicio) & (fechas < fin)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(tramo, esperado)
+
+def test_sin_saltos_entre_bloques(historico):
+    retornos = np.diff(np.log(historico['cerrar'].to_numpy()))
+    bordes = retornos[SESIONES_BLOQUE_SINTETICO - 1::SESIONES_BLOQUE_SINTETICO]
+    # Los retornos que cruzan de un bloque al siguiente son como los demás
+    assert np.abs(bordes).max() < 6 * retornos.std()
+    assert 0.015 < retornos.std() < 0.025
+
+def test_reproducible_y_por_simbolo(fuente, historico):
+    pd.testing.assert_frame_equal(SyntheticSource(seed=7).download("MSFT", "1980-01-01", "2001-01-01"), historico)
+    otra = fuente.download("AAPL", "1980-01-01", "2001-01-01")
+    assert not np.allclose(otra['cerrar'], historico['cerrar'])
+    assert not np.allclose(SyntheticSource(seed=8).download("MSFT", "1990-01-01", "1991-01-01")['cerrar'],
+                           fuente.download("MSFT", "1990-01-01", "1991-01-01")['cerrar'])
+
+def test_rangos_vacios(fuente):
+    assert fuente.download("MSFT", "1970-01-01", "1986-03-13").empty
+    assert fuente.download("MSFT", "2001-01-06", "2001-01-08").empty
+    assert fuente.download("MSFT", "2001-02-01", "2001-01-01").empty
+
+def test_run_escribe_con_write_table(tmp_path, monkeypatch):
+    salida = tmp_path / "sintetico.csv"
+    monkeypatch.setattr("sys.argv", ["msft-synthetic", "--rows", "50", "--seed", "2", "--out", str(salida)])
+    from msft_analytics.sources import run
+    run()
+    df = pd.read_csv(salida, encoding="utf-8-sig")
+    esperado = generate_ohlcv(50, seed=2)
+    assert list(df.columns[:3]) == ["año", "mes", "día"]
+    np.testing.assert_allclose(df['cerrar'], esperado['cerrar'], atol=5e-5)
+    assert not (tmp_path / "sintetico.csv.tmp").exists()